@@ -1,23 +1,114 @@
-from fastapi import FastAPI, HTTPException
-from mbs_scraper import MBSScraper
+from dotenv import load_dotenv
+
+# Read .env before the modules below pick up their settings
+load_dotenv()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from driver_pool import get_pool, shutdown_pool
+from jobs import BACKFILL_MAX_PAGES, JobQueue
+from feed_cache import ARTICLES_MAX_AGE, ARTICLES_MAX_PAGE_SIZE, ARTICLES_PAGE_SIZE, FeedCache
+from datetime import datetime
+import metrics
+import asyncio
 import os
 
-app = FastAPI()
+job_queue = JobQueue()
+feed_cache = FeedCache()
+# Even a failed incremental run may have written rows, so any finished job refreshes its feed
+job_queue.on_finish(lambda job: feed_cache.invalidate(job.scraper))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the driver pool in the background so startup isn't held up by Chrome
+    warming = asyncio.get_running_loop().run_in_executor(None, get_pool().warm)
+    job_queue.start()
+    yield
+    await run_in_threadpool(job_queue.stop)
+    await run_in_threadpool(shutdown_pool)
+    # A driver still starting is quit by the shut-down pool as soon as it is up
+    await warming
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def root():
     return {"status": "ok"}
 
-@app.post("/scrape")
-async def scrape():
+@app.post("/scrape", status_code=202)
+async def scrape(scraper: str = "mbs"):
+    # Verify secret token if needed
     try:
-        # Verify secret token if needed
-        scraper = MBSScraper()
-        scraper.update_database()
-        return {"status": "success", "message": "Scraping completed"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        job, coalesced = job_queue.submit(scraper)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown scraper: {scraper}")
+    return {"status": job.status, "job_id": job.id, "scraper": scraper, "coalesced": coalesced}
+
+@app.post("/backfill", status_code=202)
+async def backfill(scraper: str = "mbs", since: str = None, max_pages: int = BACKFILL_MAX_PAGES, restart: bool = False):
+    # Resumes from the scraper's checkpoint unless restart is set
+    if since is not None:
+        try:
+            datetime.strptime(since, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"since must be YYYY-MM-DD, got {since}")
+    params = {"since": since, "max_pages": max_pages, "restart": restart}
+    try:
+        job, coalesced = job_queue.submit(scraper, kind="backfill", params=params)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown scraper: {scraper}")
+    return {"status": job.status, "job_id": job.id, "scraper": scraper, "coalesced": coalesced}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/articles/{feed}")
+async def articles(request: Request, feed: str, limit: int = Query(ARTICLES_PAGE_SIZE, ge=1, le=ARTICLES_MAX_PAGE_SIZE),
+                   offset: int = Query(0, ge=0), fields: str = None, canonical: bool = False):
+    # Served from memory; the database is only read after a scrape finishes or the cache expires
+    try:
+        page = await run_in_threadpool(feed_cache.page, feed, limit, offset, fields, canonical)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown feed: {feed}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    encoding = page.negotiate(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": page.etag(encoding),
+        "Vary": "Accept-Encoding",
+        "Cache-Control": f"public, max-age={ARTICLES_MAX_AGE}",
+    }
+    if page.matches(request.headers.get("if-none-match")):
+        metrics.FEED_REQUESTS.inc(feed=feed, outcome="not_modified")
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    body = await run_in_threadpool(page.encode, encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/articles/{feed}/{article_id}")
+async def article(feed: str, article_id: int):
+    # Article bodies are not cached; each request reads the one row it needs
+    try:
+        row = await run_in_threadpool(feed_cache.article, feed, article_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown feed: {feed}")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Article not found")
+    return row
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000))) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from cancellation import RunCancelled, raise_if_cancelled
+from db_writer import BatchWriter
+from dedupe import Deduplicator
+from incremental import IncrementalSync
+from jobs import BACKFILL_MAX_PAGES
+from supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+# Rows buffered before a bulk write and checkpoint
+BACKFILL_BATCH = int(os.getenv('BACKFILL_BATCH', '100'))
+# Where checkpoint files live, one per scraper
+BACKFILL_STATE_DIR = os.getenv(
+    'BACKFILL_STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backfill_state'))
+
+
+def state_path(scraper: str, directory: str = BACKFILL_STATE_DIR) -> str:
+    return os.path.join(directory, f"{scraper}.json")
+
+
+class BackfillError(Exception):
+    """A listing page could not be read; the checkpoint is kept so the next run resumes there."""
+
+
+class Backfill:
+    """Walk a scraper's listing pages back in time and load every article.
+
+    Pages are read newest first until ``since`` or ``max_pages`` is reached,
+    article bodies are fetched concurrently through the scraper's fetcher,
+    and rows are upserted in batches with ``backfilled`` set so incremental
+    runs keep them. Articles on the first page, or already stored by a
+    scrape, stay unflagged, and a page that yields no content is skipped
+    rather than written over a stored row. After each batch of ``batch_size`` rows the next page
+    to read is saved to a JSON checkpoint; a later run with the same
+    checkpoint resumes there. Only a page that verifiably lists nothing
+    finishes the backfill; one that cannot be read raises ``BackfillError``.
+    """
+
+    def __init__(self, scraper, name: str, since: Optional[datetime] = None,
+                 max_pages: int = BACKFILL_MAX_PAGES, batch_size: int = BACKFILL_BATCH,
+                 path: Optional[str] = None, restart: bool = False):
+        self.scraper = scraper
+        self.name = name
+        self.since = since
+        self.max_pages = max_pages
+        self.batch_size = max(1, batch_size)
+        self.path = path or state_path(name)
+        self.state = self._load(restart)
+
+    def _load(self, restart: bool) -> Dict[str, Any]:
+        fresh = {'scraper': self.name, 'next_page': 1, 'last_page_urls': [], 'rows_written': 0,
+                 'rows_failed': 0, 'rows_skipped': 0, 'finished': False, 'stopped': None}
+        if restart or not os.path.exists(self.path):
+            return fresh
+        with open(self.path) as f:
+            state = json.load(f)
+        if state.get('finished'):
+            logger.info(f"Previous {self.name} backfill finished ({state.get('stopped')}); starting over")
+            return fresh
+        logger.info(f"Resuming {self.name} backfill at page {state['next_page']} "
+                    f"({state['rows_written']} rows already written)")
+        return state
+
+    def checkpoint(self):
+        """Write the state file atomically so a crash never leaves it half-written"""
+        self.state['updated_at'] = datetime.now().isoformat()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def _flush(self, writer: BatchWriter, next_page: int, page_urls: List[str]):
+        """Write buffered rows, then move the checkpoint past the pages they came from"""
+        writer.flush()
+        self.state['rows_written'] = self._written_before + writer.rows_written
+        self.state['rows_failed'] = self._failed_before + writer.rows_failed
+        self.state['next_page'] = next_page
+        self.state['last_page_urls'] = page_urls
+        self.checkpoint()
+
+    def _finish(self, reason: str):
+        self.state['finished'] = True
+        self.state['stopped'] = reason
+        self.checkpoint()
+        logger.info(f"{self.name} backfill finished: {reason}")
+
+    def run(self) -> Dict[str, Any]:
+        """Backfill until the date or page limit, returning the final state"""
+        scraper = self.scraper
+        sync = IncrementalSync(get_supabase(), scraper.TABLE, timer=scraper.timer)
+        sync.load()
+        writer = BatchWriter(get_supabase(), scraper.TABLE, timer=scraper.timer)
+        dedupe = Deduplicator(get_supabase(), timer=scraper.timer)
+        dedupe.load()
+        self._written_before = self.state['rows_written']
+        self._failed_before = self.state['rows_failed']
+        page = self.state['next_page']
+        previous_urls = self.state['last_page_urls']
+        buffered = 0
+        start = time.monotonic()
+
+        while True:
+            raise_if_cancelled(scraper.cancel)
+            if page > self.max_pages:
+                self._flush(writer, page, previous_urls)
+                self._finish(f"reached the {self.max_pages} page limit")
+                break
+
+            url = scraper.page_url(page)
+            try:
+                with scraper.timer.stage('list_page'):
+                    listings = scraper.scrape_listing_page(url)
+            except RunCancelled:
+                raise
+            except Exception as e:
+                # Keep the checkpoint so a later run resumes at this page rather than starting over
+                self._flush(writer, page, previous_urls)
+                self.state['stopped'] = f"listing page {page} could not be read: {e}"
+                self.checkpoint()
+                raise BackfillError(f"Stopping {self.name} backfill: {self.state['stopped']}") from e
+            urls = [listing['url'] for listing in listings]
+            if not listings:
+                self._flush(writer, page, previous_urls)
+                self._finish(f"page {page} has no articles")
+                break
+            if urls == previous_urls:
+                # A site that ignores the page parameter serves the same page again
+                self._flush(writer, page, previous_urls)
+                self._finish(f"page {page} repeats the previous page")
+                break
+
+            in_range = listings
+            if self.since is not None:
+                in_range = [listing for listing in listings
+                            if (scraper.listing_date(listing) or datetime.max) >= self.since]
+
+            with scraper.timer.stage('article_fetch'):
+                rows = scraper.fetch_rows(in_range)
+            for listing, row in zip(in_range, rows):
+                if not row.get('content'):
+                    # A failed fetch must not blank a stored article
+                    self.state['rows_skipped'] = self.state.get('rows_skipped', 0) + 1
+                    logger.warning(f"Skipping {row['url']}: no content extracted")
+                    continue
+                # Keep the original publication date rather than the time of the backfill
+                published = scraper.listing_date(listing)
+                if published is not None:
+                    row['date'] = published.isoformat()
+                # Rows on the live listing, or stored from it, must still expire when they leave it
+                known = sync.known.get(row['url'])
+                row['backfilled'] = page > 1 and (known is None or bool(known.get('backfilled')))
+                writer.add(dedupe.assign(sync.fingerprint(row)))
+                buffered += 1
+            logger.info(f"{self.name} backfill page {page}: {len(rows)} articles "
+                        f"({self._written_before + writer.rows_written} written so far, "
+                        f"{time.monotonic() - start:.0f}s)")
+
+            if len(in_range) < len(listings):
+                self._flush(writer, page + 1, urls)
+                self._finish(f"reached articles older than {self.since:%Y-%m-%d}")
+                break
+
+            page += 1
+            previous_urls = urls
+            if buffered >= self.batch_size:
+                self._flush(writer, page, urls)
+                buffered = 0
+
+        return self.state
+
+
+def run_backfill(name: str, since: Optional[datetime] = None, max_pages: int = BACKFILL_MAX_PAGES,
+                 restart: bool = False, pool=None, cancel: Optional[threading.Event] = None,
+                 path: Optional[str] = None):
+    """Backfill one registered scraper; returns the scraper (for its timings) and the final state"""
+    from jobs import load_scraper
+    from driver_pool import get_pool
+
+    with load_scraper(name)(pool=pool or get_pool(), cancel=cancel) as scraper:
+        scraper.counts = {'fetched': 0}
+        backfill = Backfill(scraper, name, since=since, max_pages=max_pages, restart=restart, path=path)
+        return scraper, backfill.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load older articles by walking listing pages back in time")
+    parser.add_argument('scraper', choices=['mbs', 'trending'])
+    parser.add_argument('--since', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        help='stop at articles older than this date (YYYY-MM-DD)')
+    parser.add_argument('--max-pages', type=int, default=BACKFILL_MAX_PAGES, help='stop after this many listing pages')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint and start from page 1')
+    parser.add_argument('--state', help='checkpoint file (default: backfill_state/<scraper>.json)')
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from driver_pool import shutdown_pool
+    try:
+        scraper, state = run_backfill(args.scraper, since=args.since, max_pages=args.max_pages,
+                                      restart=args.restart, path=args.state)
+        logger.info(f"Backfill state: {json.dumps(state)}")
+        logger.info(f"Stage timings: {scraper.timer.summary()}")
+    finally:
+        shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Compare headless Chrome page loads with the full and lean browser profiles.
+
+Each profile runs in a fresh process with a single pooled driver that
+loads every page in the fixture manifest, replayed locally by default or
+from the live sites with ``--live``. Reports the time until ``get``
+returns, requests and kilobytes the page transferred (from the Resource
+Timing API) and the resident memory of the Chrome process tree.
+
+    python benchmarks/bench_browser.py [--live] [--repeat 2] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import multiprocessing
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+PROFILES = ['full', 'lean']
+
+# Transfer size of the document and every subresource the page loaded
+TRANSFER_SCRIPT = """
+const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+return [entries.length, entries.reduce((total, e) => total + (e.transferSize || e.encodedBodySize || 0), 0)];
+"""
+
+
+def page_urls(live: bool, server=None) -> List[str]:
+    with open(os.path.join(FIXTURES_DIR, 'manifest.json')) as f:
+        manifest = json.load(f)
+    urls = [meta['url'] for meta in manifest.values() if 'url' in meta]
+    return urls if live else [server.url_for(url) for url in urls]
+
+
+def run_profile(profile: str, options: Dict, results):
+    """Child process: load every page with one driver in ``profile``"""
+    import logging
+    logging.disable(logging.CRITICAL if options['quiet'] else logging.NOTSET)
+
+    from replay_server import ReplayServer
+    from driver_pool import DriverPool
+
+    server = None if options['live'] else ReplayServer(default_latency=options['latency'])
+    if server is not None:
+        server.start()
+    pool = DriverPool(size=1, profile=profile)
+    try:
+        urls = page_urls(options['live'], server)
+        start = time.monotonic()
+        pool.warm(1)
+        startup = time.monotonic() - start
+
+        loads, requests, kilobytes, peak_mb = [], 0, 0.0, 0.0
+        with pool.driver() as driver:
+            for _ in range(options['repeat']):
+                for url in urls:
+                    start = time.monotonic()
+                    driver.get(url)
+                    loads.append(time.monotonic() - start)
+                    count, size = driver.execute_script(TRANSFER_SCRIPT)
+                    requests += count
+                    kilobytes += size / 1024
+                    peak_mb = max(peak_mb, driver.memory_mb() or 0.0)
+
+        pages = len(loads)
+        results.put({
+            'profile': profile,
+            'pages': pages,
+            'startup_s': round(startup, 2),
+            'load_ms': round(sum(loads) * 1000 / pages, 1),
+            'max_load_ms': round(max(loads) * 1000, 1),
+            'requests_per_page': round(requests / pages, 1),
+            'kb_per_page': round(kilobytes / pages, 1),
+            'chrome_rss_mb': round(peak_mb, 1),
+        })
+    finally:
+        pool.shutdown()
+        if server is not None:
+            server.stop()
+
+
+def print_report(rows: List[Dict]):
+    header = f"{'profile':<9}{'pages':>6}{'start s':>9}{'load ms':>9}{'max ms':>9}{'req/page':>10}{'KB/page':>9}{'RSS MB':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['profile']:<9}{row['pages']:>6}{row['startup_s']:>9.2f}{row['load_ms']:>9.1f}"
+              f"{row['max_load_ms']:>9.1f}{row['requests_per_page']:>10.1f}{row['kb_per_page']:>9.1f}"
+              f"{row['chrome_rss_mb']:>8.1f}")
+
+    by_profile = {row['profile']: row for row in rows}
+    if 'full' in by_profile and 'lean' in by_profile:
+        full, lean = by_profile['full'], by_profile['lean']
+        print()
+        for key, label in (('load_ms', 'load time'), ('kb_per_page', 'transfer'), ('chrome_rss_mb', 'memory')):
+            if full[key]:
+                print(f"lean vs full {label}: {100 * (lean[key] - full[key]) / full[key]:+.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile', choices=PROFILES, action='append',
+                        help='profile to run (repeatable; default: both)')
+    parser.add_argument('--live', action='store_true', help='load the recorded URLs from the live sites')
+    parser.add_argument('--latency', type=float, default=0.0, help='replay latency per request in seconds')
+    parser.add_argument('--repeat', type=int, default=1, help='passes over the page list')
+    parser.add_argument('--json', help='also write results to this file')
+    parser.add_argument('--verbose', action='store_true', help='show driver pool logs')
+    args = parser.parse_args()
+
+    options = {
+        'live': args.live,
+        'latency': args.latency,
+        'repeat': max(1, args.repeat),
+        'quiet': not args.verbose,
+    }
+
+    # A fresh process per profile keeps Chrome caches and memory figures independent
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    rows = []
+    for profile in args.profile or PROFILES:
+        process = context.Process(target=run_profile, args=(profile, options, results))
+        process.start()
+        process.join()
+        try:
+            rows.append(results.get(timeout=5))
+        except queue.Empty:
+            print(f"{profile} profile run failed (exit code {process.exitcode})", file=sys.stderr)
+
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': options, 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
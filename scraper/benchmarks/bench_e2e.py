@@ -0,0 +1,163 @@
+"""End-to-end scraper benchmark against local stand-ins.
+
+Each scraper runs in a fresh process against a replay server serving the
+recorded fixtures, with an in-process fake of the Supabase table API, so
+nothing touches mortgagenewsdaily.com, the source sites or a live
+database. Every scraper is run twice against the same fake database: a
+cold run into empty tables and a warm run that shows what an incremental
+re-scrape costs.
+
+    python benchmarks/bench_e2e.py --latency 0.2 --host-latency www.cnbc.com=1.5 \\
+        --fail www.marketwatch.com=0.5 --db-latency 0.05 --mode incremental
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import multiprocessing
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+SCRAPERS = ['mbs', 'trending']
+LISTING_URLS = {
+    'mbs': 'https://www.mortgagenewsdaily.com/topic/mbs',
+    'trending': 'https://www.mortgagenewsdaily.com/aroundtheweb',
+}
+
+
+class NoBrowserPool:
+    """Driver pool stand-in for runs without Chrome; any fallback to the browser fails fast."""
+
+    def render(self, url: str, class_name: str, timeout: int) -> str:
+        raise RuntimeError(f"Browser disabled for this benchmark run ({url})")
+
+
+def parse_host_values(values: List[str]) -> Dict[str, float]:
+    parsed = {}
+    for value in values or []:
+        host, _, number = value.partition('=')
+        parsed[host] = float(number)
+    return parsed
+
+
+def run_benchmark(name: str, options: Dict, results):
+    """Child process: replay server, fake database and two runs of one scraper"""
+    import logging
+    logging.disable(logging.CRITICAL if options['quiet'] else logging.NOTSET)
+
+    from replay_server import ReplayServer
+    from fake_supabase import FakeSupabase
+    import mbs_scraper
+    import trending_scraper
+    from driver_pool import DriverPool
+    from supabase_client import set_supabase
+
+    fake = FakeSupabase(latency=options['db_latency'])
+    set_supabase(fake)
+    pool = DriverPool(profile=options['browser_profile']) if options['browser'] else NoBrowserPool()
+
+    server = ReplayServer(latency=options['host_latency'], default_latency=options['latency'],
+                          failure_rate=options['fail'], default_failure_rate=options['fail_rate'])
+    with server:
+        base_url = server.url_for(LISTING_URLS[name])
+        for run in ('cold', 'warm'):
+            server.reset_stats()
+            fake.reset_stats()
+            if name == 'mbs':
+                scraper = mbs_scraper.MBSScraper(pool=pool, base_url=base_url)
+            else:
+                scraper = trending_scraper.TrendingScraper(pool=pool, base_url=base_url)
+
+            start = time.monotonic()
+            with scraper:
+                scraper.update_database(mode=options['mode'])
+            wall = time.monotonic() - start
+
+            pages = sum(server.requests.values())
+            rows = fake.rows_written
+            results.put({
+                'scraper': name,
+                'run': run,
+                'mode': options['mode'],
+                'wall_s': round(wall, 3),
+                'pages': pages,
+                'pages_per_s': round(pages / wall, 2) if wall else None,
+                'rows': rows,
+                'rows_per_s': round(rows / wall, 2) if wall else None,
+                'db_calls': dict(fake.calls),
+                'kb_served': round(server.bytes_sent / 1024, 1),
+                # ru_maxrss is in kilobytes on Linux
+                'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                'stages': {stage: round(seconds, 3) for stage, seconds in scraper.timer.stages.items()},
+            })
+
+    if options['browser']:
+        pool.shutdown()
+
+
+def print_report(rows: List[Dict]):
+    header = f"{'scraper':<10}{'run':<6}{'wall s':>8}{'pages':>7}{'pages/s':>9}{'rows':>6}{'rows/s':>8}{'KB':>8}{'RSS MB':>8}  stages"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        stages = ', '.join(f"{stage}={seconds:.2f}" for stage, seconds in row['stages'].items())
+        print(f"{row['scraper']:<10}{row['run']:<6}{row['wall_s']:>8.2f}{row['pages']:>7}"
+              f"{row['pages_per_s']:>9.1f}{row['rows']:>6}{row['rows_per_s']:>8.1f}"
+              f"{row['kb_served']:>8.0f}{row['peak_rss_mb']:>8.1f}  {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scraper', choices=SCRAPERS, action='append',
+                        help='scraper to run (repeatable; default: all)')
+    parser.add_argument('--mode', default='incremental', choices=['incremental', 'full', 'publish'])
+    parser.add_argument('--latency', type=float, default=0.05, help='default per-request latency in seconds')
+    parser.add_argument('--host-latency', action='append', metavar='HOST=SECONDS',
+                        help='latency for one host (repeatable)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='default probability of a 503')
+    parser.add_argument('--fail', action='append', metavar='HOST=RATE',
+                        help='probability of a 503 for one host (repeatable)')
+    parser.add_argument('--db-latency', type=float, default=0.02, help='seconds per fake database call')
+    parser.add_argument('--browser', action='store_true', help='allow falling back to headless Chrome')
+    parser.add_argument('--browser-profile', default='lean', choices=['lean', 'full'],
+                        help='Chrome profile for --browser runs')
+    parser.add_argument('--json', help='also write results to this file')
+    parser.add_argument('--verbose', action='store_true', help='show scraper logs')
+    args = parser.parse_args()
+
+    options = {
+        'mode': args.mode,
+        'latency': args.latency,
+        'host_latency': parse_host_values(args.host_latency),
+        'fail_rate': args.fail_rate,
+        'fail': parse_host_values(args.fail),
+        'db_latency': args.db_latency,
+        'browser': args.browser,
+        'browser_profile': args.browser_profile,
+        'quiet': not args.verbose,
+    }
+
+    # A fresh process per scraper keeps peak RSS figures independent
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    rows = []
+    for name in args.scraper or SCRAPERS:
+        process = context.Process(target=run_benchmark, args=(name, options, results))
+        process.start()
+        for _ in range(2):
+            rows.append(results.get())
+        process.join()
+
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': options, 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
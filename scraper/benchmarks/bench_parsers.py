@@ -0,0 +1,73 @@
+"""Compare article extraction time per source across parser backends.
+
+Runs every extractor against the saved fixture pages with the original
+full-document html.parser path and each installed fast backend, and
+checks that the extracted text matches the original path.
+
+    python benchmarks/bench_parsers.py [--iterations 50] [--fixtures DIR]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extractors  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixtures(directory: str):
+    with open(os.path.join(directory, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for name, meta in manifest.items():
+        if 'source' not in meta:
+            continue  # listing pages have no extractor
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            yield name, meta, f.read()
+
+
+def time_call(func, iterations: int) -> float:
+    """Mean milliseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    backends = [b for b in extractors.BACKENDS if extractors.resolve_backend(b) == b]
+    columns = ['full html.parser'] + backends
+    print(f"{'fixture':<24}{'source':<22}{'KB':>6}" + ''.join(f"{c:>18}" for c in columns))
+
+    totals = {c: 0.0 for c in columns}
+    for name, meta, html in load_fixtures(args.fixtures):
+        extractor = extractors.get_extractor(meta['source'], meta.get('url'))
+        baseline = extractor.extract_full(html)
+
+        timings = [time_call(lambda: extractor.extract_full(html), args.iterations)]
+        for backend in backends:
+            text = extractor.extract(html, backend)
+            if text != baseline:
+                print(f"  warning: {backend} output differs from html.parser for {name}")
+            timings.append(time_call(lambda: extractor.extract(html, backend), args.iterations))
+
+        for column, ms in zip(columns, timings):
+            totals[column] += ms
+        row = f"{name:<24}{meta['source']:<22}{len(html) / 1024:>6.0f}"
+        print(row + ''.join(f"{ms:>15.2f} ms" for ms in timings))
+
+    base = totals[columns[0]]
+    print(f"{'total':<52}" + ''.join(f"{totals[c]:>15.2f} ms" for c in columns))
+    print(f"{'speedup':<52}" + ''.join(f"{base / totals[c]:>17.1f}x" for c in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""Work queue throughput with 1..N worker processes.
+
+The coordinator lists both scrapers' pages from the replay server and
+queues every article in a fresh SQLite work queue. Then N worker processes,
+each with its own HTTP session and fake database, drain it together. Workers
+wait on a shared start signal so process start-up is not timed. With
+``--crash`` one extra worker claims a batch and exits without acking; its
+tasks should still end up done once their lease runs out. Workers share
+each host's request rate, so past the point where one host's limit is the
+bottleneck more workers add no throughput.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --latency 0.2 [--crash]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_e2e import LISTING_URLS, NoBrowserPool  # noqa: E402
+
+
+def worker_process(path: str, options: Dict, start, results):
+    """Child process: drain the queue with one worker"""
+    import logging
+    logging.disable(logging.CRITICAL if options['quiet'] else logging.NOTSET)
+
+    from fake_supabase import FakeSupabase
+    from supabase_client import set_supabase
+    from jobs import load_scraper
+    from work_queue import SQLiteQueue, Worker
+
+    set_supabase(FakeSupabase(latency=options['db_latency']))
+    worker = Worker(SQLiteQueue(path), batch=options['batch'], lease_seconds=options['lease'],
+                    factory=lambda name: load_scraper(name)(pool=NoBrowserPool()))
+    start.wait()
+    began = time.time()
+    worker.run(drain=True, poll=0.2)
+    results.put({'began': began, 'ended': time.time(), 'stats': dict(worker.stats)})
+
+
+def crashing_worker(path: str, options: Dict):
+    """Child process: claim a batch, then die without acking it"""
+    from work_queue import SQLiteQueue
+
+    SQLiteQueue(path).claim('crashed-worker', options['batch'], options['lease'])
+    os._exit(1)
+
+
+def enqueue_all(server, path: str) -> int:
+    """Queue every article listed on both replayed listing pages"""
+    import logging
+    from jobs import load_scraper
+    from work_queue import SQLiteQueue
+
+    queue = SQLiteQueue(path)
+    added = 0
+    for name, url in LISTING_URLS.items():
+        logging.disable(logging.CRITICAL)
+        with load_scraper(name)(pool=NoBrowserPool(), base_url=server.url_for(url)) as scraper:
+            articles = scraper.scrape_listing_page(scraper.base_url)
+        logging.disable(logging.NOTSET)
+        added += queue.enqueue(f'bench-{name}', name, [{'url': a['url'], 'article': a} for a in articles])
+    return added
+
+
+def run(workers: int, options: Dict, server) -> Dict:
+    path = os.path.join(tempfile.mkdtemp(), 'queue.db')
+    tasks = enqueue_all(server, path)
+    context = multiprocessing.get_context('spawn')
+    if options['crash']:
+        crashed = context.Process(target=crashing_worker, args=(path, options))
+        crashed.start()
+        crashed.join()
+
+    start, results = context.Event(), context.Queue()
+    processes = [context.Process(target=worker_process, args=(path, options, start, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    # Give every worker time to import and open its queue before releasing them together
+    time.sleep(options['warmup'])
+    start.set()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    from work_queue import SQLiteQueue
+    wall = max(r['ended'] for r in reports) - min(r['began'] for r in reports)
+    totals: Dict[str, int] = {}
+    for report in reports:
+        for outcome, count in report['stats'].items():
+            totals[outcome] = totals.get(outcome, 0) + count
+    return {
+        'workers': workers,
+        'tasks': tasks,
+        'wall_s': round(wall, 2),
+        'tasks_per_s': round(tasks / wall, 1) if wall else None,
+        'outcomes': totals,
+        'queue': SQLiteQueue(path).counts(),
+    }
+
+
+def print_report(rows: List[Dict]):
+    header = f"{'workers':>8}{'tasks':>7}{'wall s':>8}{'tasks/s':>9}{'speedup':>9}  outcomes / final queue"
+    print(header)
+    print('-' * len(header))
+    base = rows[0]['tasks_per_s'] if rows else None
+    for row in rows:
+        speedup = row['tasks_per_s'] / base if base and row['tasks_per_s'] else 0.0
+        print(f"{row['workers']:>8}{row['tasks']:>7}{row['wall_s']:>8.2f}{row['tasks_per_s']:>9.1f}{speedup:>9.2f}"
+              f"  {row['outcomes']} / {row['queue']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='worker counts to compare')
+    parser.add_argument('--latency', type=float, default=0.2, help='replay latency per request in seconds')
+    parser.add_argument('--db-latency', type=float, default=0.02, help='seconds per fake database call')
+    parser.add_argument('--batch', type=int, default=4, help='tasks claimed at once')
+    parser.add_argument('--lease', type=int, default=10, help='lease seconds')
+    parser.add_argument('--crash', action='store_true', help='add a worker that dies holding a batch')
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds to let workers start before timing')
+    parser.add_argument('--json', help='also write results to this file')
+    parser.add_argument('--verbose', action='store_true', help='show worker logs')
+    args = parser.parse_args()
+
+    options = {
+        'latency': args.latency,
+        'db_latency': args.db_latency,
+        'batch': args.batch,
+        'lease': args.lease,
+        'crash': args.crash,
+        'warmup': args.warmup,
+        'quiet': not args.verbose,
+    }
+
+    from replay_server import ReplayServer
+    rows = []
+    with ReplayServer(default_latency=args.latency) as server:
+        for workers in args.workers:
+            rows.append(run(workers, options, server))
+
+    print_report(rows)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': options, 'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""In-process stand-in for the parts of the Supabase table API the scrapers use.
+
+Supports ``table(name).select/insert/upsert/update/delete`` with the ``eq``,
+``neq``, ``in_``, ``gte``, ``order``, ``limit`` and ``range`` modifiers and
+``execute()``, plus ``rpc('publish_articles', ...)`` with the semantics of
+the function in ``publish_setup.sql``. Bulk writes whose rows have
+different keys are rejected, as PostgREST does. Every ``execute`` can be delayed to model a PostgREST
+round trip, and calls and written rows are counted for reporting.
+"""
+import time
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+
+class FakeResponse:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    def __init__(self, client: 'FakeSupabase', table: str):
+        self.client = client
+        self.table = table
+        self.action = 'select'
+        self.payload: List[Dict[str, Any]] = []
+        self.on_conflict: Optional[str] = None
+        self.columns: Optional[List[str]] = None
+        self.filters = []
+        self.order_by = None
+        self.bounds = None
+
+    def select(self, columns: str = '*', count: Optional[str] = None):
+        self.action = 'select'
+        self.columns = None if columns == '*' else [c.strip() for c in columns.split(',')]
+        return self
+
+    def insert(self, rows):
+        self.action = 'insert'
+        self.payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict: str = 'id'):
+        self.action = 'upsert'
+        self.payload = rows if isinstance(rows, list) else [rows]
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self.action = 'update'
+        self.payload = [values]
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc: bool = False):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, size: int):
+        self.bounds = (0, size - 1)
+        return self
+
+    def range(self, start: int, end: int):
+        self.bounds = (start, end)
+        return self
+
+    def _matches(self, row) -> bool:
+        return all(check(row) for check in self.filters)
+
+    def execute(self) -> FakeResponse:
+        return self.client._execute(self)
+
+
+class FakeRpc:
+    def __init__(self, client: 'FakeSupabase', name: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> FakeResponse:
+        return self.client._rpc(self)
+
+
+class FakeSupabase:
+    """Thread-safe in-memory tables keyed by name."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.calls = Counter()
+        self.rows_written = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.rows_written = 0
+
+    def _rpc(self, call: FakeRpc) -> FakeResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        if call.name != 'publish_articles':
+            raise ValueError(f"Unknown function {call.name}")
+        target = call.params['target']
+        with self._lock:
+            self.calls['rpc'] += 1
+            staged = self.tables.get(f"{target}_staging", [])
+            live = self.tables.get(target, [])
+            if len(staged) < call.params.get('min_rows', 1) or len(staged) < len(live) * call.params.get('min_ratio', 0):
+                raise ValueError(f"Refusing to publish {len(staged)} staged rows into {target}")
+            if any(not row.get('title') or not row.get('url') for row in staged):
+                raise ValueError(f"Refusing to publish {target}: staged rows lack a title or url")
+            self.tables[target] = [dict(row) for row in staged]
+            self.tables[f"{target}_staging"] = []
+            return FakeResponse(len(staged))
+
+    def _execute(self, query: FakeQuery) -> FakeResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls[query.action] += 1
+            rows = self.tables.setdefault(query.table, [])
+
+            if query.action == 'select':
+                selected = [row for row in rows if query._matches(row)]
+                if query.order_by:
+                    column, desc = query.order_by
+                    selected.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+                if query.bounds:
+                    selected = selected[query.bounds[0]:query.bounds[1] + 1]
+                if query.columns:
+                    selected = [{c: row.get(c) for c in query.columns} for row in selected]
+                else:
+                    selected = [dict(row) for row in selected]
+                return FakeResponse(selected, len(selected))
+
+            if query.action == 'update':
+                updated = []
+                for row in rows:
+                    if query._matches(row):
+                        row.update(query.payload[0])
+                        updated.append(dict(row))
+                return FakeResponse(updated)
+
+            if query.action == 'delete':
+                deleted = [row for row in rows if query._matches(row)]
+                self.tables[query.table] = [row for row in rows if not query._matches(row)]
+                return FakeResponse(deleted)
+
+            if len({frozenset(row) for row in query.payload}) > 1:
+                # PostgREST requires every object in a bulk write to have the same keys
+                raise ValueError("PGRST102: All object keys must match")
+            written = []
+            for new in query.payload:
+                existing = None
+                if query.action == 'upsert':
+                    key = query.on_conflict
+                    existing = next((row for row in rows if row.get(key) == new.get(key)), None)
+                if existing is not None:
+                    existing.update(new)
+                    written.append(dict(existing))
+                else:
+                    row = dict(new)
+                    row.setdefault('id', self._next_id)
+                    self._next_id += 1
+                    rows.append(row)
+                    written.append(dict(row))
+            self.rows_written += len(written)
+            return FakeResponse(written)
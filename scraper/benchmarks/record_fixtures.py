@@ -0,0 +1,55 @@
+"""Record live pages as replay fixtures.
+
+Fetches each URL once and saves it under the fixtures directory, adding
+or updating its manifest entry. ``--serves`` gives the URL pattern the
+recorded page should answer when replayed (defaults to the URL itself).
+
+    python benchmarks/record_fixtures.py https://www.cnbc.com/... --name cnbc.html \\
+        --source CNBC --serves 'https://www.cnbc.com/*'
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetcher import ConcurrentFetcher  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('url')
+    parser.add_argument('--name', required=True, help='fixture file name')
+    parser.add_argument('--source', help='source name, for pages with an extractor')
+    parser.add_argument('--serves', help='URL pattern this page answers when replayed')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    with ConcurrentFetcher() as fetcher:
+        result = fetcher.fetch(args.url)
+    if not result.ok:
+        sys.exit(f"Could not fetch {args.url}: {result.error}")
+
+    with open(os.path.join(args.fixtures, args.name), 'w', encoding='utf-8') as f:
+        f.write(result.text)
+
+    manifest_path = os.path.join(args.fixtures, 'manifest.json')
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    entry = {'url': args.url}
+    if args.source:
+        entry['source'] = args.source
+    if args.serves:
+        entry['serves'] = args.serves
+    manifest[args.name] = entry
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    print(f"Recorded {args.url} as {args.name} ({len(result.text) / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""Local HTTP server that replays recorded pages for offline scraper runs.
+
+Each recorded host gets its own local origin: a page recorded for
+``https://host/path`` is served at ``http://127.0.0.1:<port>/path`` on a
+port reserved for that host, so per-host connection limits, rate limits
+and circuit breakers see as many hosts as a live run would. Links in served
+HTML are rewritten to point back at the replay origins, so a scraper that
+starts from a replayed listing page never leaves the machine. Pages carry an ETag and honour
+If-None-Match. Per-host latency and failure injection make it possible to
+reproduce slow or flaky sources.
+"""
+import os
+import re
+import json
+import time
+import random
+import fnmatch
+import hashlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+ABSOLUTE_LINK = re.compile(r'''(href|src)=(["'])https?://([^/"']+)''')
+ROOT_LINK = re.compile(r'''(href|src)=(["'])/(?!/)''')
+
+
+class ReplayServer:
+    """Serve fixture pages with configurable per-host latency and failures.
+
+    ``latency`` and ``failure_rate`` map a host name to seconds of added
+    delay and the probability of answering 503; ``default_latency`` and
+    ``default_failure_rate`` apply to every other host.
+    """
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, latency: Optional[Dict[str, float]] = None,
+                 default_latency: float = 0.0, failure_rate: Optional[Dict[str, float]] = None,
+                 default_failure_rate: float = 0.0, seed: int = 0):
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency or {}
+        self.default_latency = default_latency
+        self.failure_rate = failure_rate or {}
+        self.default_failure_rate = default_failure_rate
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+        with open(os.path.join(fixtures_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        # Exact URLs win over wildcard patterns
+        self.exact = {meta['url']: name for name, meta in manifest.items() if 'url' in meta}
+        self.patterns = [(meta['serves'], name) for name, meta in manifest.items() if 'serves' in meta]
+        self._pages: Dict[str, str] = {}
+
+        # One listening server per recorded host, created on first use
+        self._servers: Dict[str, ThreadingHTTPServer] = {}
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+    def origin_for(self, host: str) -> str:
+        """Local origin that stands in for ``host``"""
+        with self._lock:
+            httpd = self._servers.get(host)
+            if httpd is None:
+                httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler(host))
+                httpd.daemon_threads = True
+                self._servers[host] = httpd
+                if self._running:
+                    self._serve(httpd)
+        return f"http://127.0.0.1:{httpd.server_port}"
+
+    def url_for(self, url: str) -> str:
+        """Local URL that replays a recorded one"""
+        host, _, path = re.sub(r'^https?://', '', url).partition('/')
+        return f"{self.origin_for(host)}/{path}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _serve(self, httpd: ThreadingHTTPServer):
+        thread = threading.Thread(target=httpd.serve_forever, name='replay-server', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def start(self):
+        with self._lock:
+            self._running = True
+            for httpd in self._servers.values():
+                self._serve(httpd)
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            servers = list(self._servers.values())
+        for httpd in servers:
+            httpd.shutdown()
+            httpd.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests.clear()
+            self.bytes_sent = 0
+
+    def _lookup(self, url: str) -> Optional[str]:
+        name = self.exact.get(url)
+        if name is None:
+            for pattern, candidate in self.patterns:
+                if fnmatch.fnmatchcase(url, pattern):
+                    name = candidate
+                    break
+        return name
+
+    def _page(self, name: str, host: str) -> bytes:
+        key = f"{host}/{name}"
+        if key not in self._pages:
+            with open(os.path.join(self.fixtures_dir, name), encoding='utf-8') as f:
+                html = f.read()
+            html = ABSOLUTE_LINK.sub(lambda m: f"{m.group(1)}={m.group(2)}{self.origin_for(m.group(3))}", html)
+            html = ROOT_LINK.sub(rf'\1=\2{self.origin_for(host)}/', html)
+            self._pages[key] = html
+        return self._pages[key].encode('utf-8')
+
+    def _handler(self, host: str):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                path = self.path.lstrip('/')
+                with server._lock:
+                    server.requests[host] += 1
+                    fail = server.random.random() < server.failure_rate.get(host, server.default_failure_rate)
+
+                delay = server.latency.get(host, server.default_latency)
+                if delay:
+                    time.sleep(delay)
+
+                name = server._lookup(f"https://{host}/{path}")
+                if fail or name is None:
+                    self.send_error(503 if fail else 404)
+                    return
+
+                body = server._page(name, host)
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                with server._lock:
+                    server.bytes_sent += len(body)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
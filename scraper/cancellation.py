@@ -0,0 +1,22 @@
+import threading
+from typing import Optional
+
+
+class RunCancelled(Exception):
+    """Raised inside a scrape run once its cancel event has been set."""
+
+
+def raise_if_cancelled(cancel: Optional[threading.Event]):
+    """Stop the current run if it has been cancelled, e.g. by a deadline"""
+    if cancel is not None and cancel.is_set():
+        raise RunCancelled("Run cancelled")
+
+
+def start_deadline(cancel: threading.Event, seconds: Optional[float]) -> Optional[threading.Timer]:
+    """Set ``cancel`` after ``seconds``; returns the timer so a finished run can stop it"""
+    if not seconds:
+        return None
+    timer = threading.Timer(seconds, cancel.set)
+    timer.daemon = True
+    timer.start()
+    return timer
@@ -0,0 +1,62 @@
+import os
+import gzip
+import base64
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Longest article body stored in the content column, in characters; 0 for no limit
+CONTENT_MAX_CHARS = int(os.getenv('CONTENT_MAX_CHARS', '50000'))
+# What happens to the rest of a longer body: "truncate" drops it, "compress"
+# also keeps the full body gzipped (base64) in content_gzip
+CONTENT_OVERFLOW = os.getenv('CONTENT_OVERFLOW', 'truncate')
+
+OVERFLOW_MODES = ['truncate', 'compress']
+
+# A truncated body is cut at the last word break this close to the limit
+WORD_BREAK_WINDOW = 200
+
+
+def compress_content(content: str) -> str:
+    """Gzipped, base64-encoded body for the content_gzip column"""
+    return base64.b64encode(gzip.compress(content.encode('utf-8'), compresslevel=6)).decode('ascii')
+
+
+def decompress_content(value: str) -> str:
+    """Inverse of ``compress_content``"""
+    return gzip.decompress(base64.b64decode(value)).decode('utf-8')
+
+
+def truncate(content: str, max_chars: int) -> str:
+    """``content`` cut to at most ``max_chars``, at a word break when there is one nearby"""
+    if len(content) <= max_chars:
+        return content
+    cut = content[:max_chars]
+    space = cut.rfind(' ', max_chars - WORD_BREAK_WINDOW)
+    return cut[:space] if space > 0 else cut
+
+
+def limit_content(row: Dict[str, Any], max_chars: int = CONTENT_MAX_CHARS,
+                  overflow: str = CONTENT_OVERFLOW, page_truncated: bool = False) -> Dict[str, Any]:
+    """Apply the stored content limit to a row in place.
+
+    Sets ``content_bytes`` to the UTF-8 size of the extracted body and
+    ``truncated`` to whether ``content`` was cut, here or already when its
+    page hit the fetch size cap (``page_truncated``); with the compress mode
+    a body cut here is also kept whole in ``content_gzip``.
+    """
+    if overflow not in OVERFLOW_MODES:
+        raise ValueError(f"Unknown content overflow mode: {overflow}")
+    content = row.get('content') or ''
+    row['content_bytes'] = len(content.encode('utf-8'))
+    cut = bool(max_chars) and len(content) > max_chars
+    row['truncated'] = cut or page_truncated
+    if overflow == 'compress':
+        row['content_gzip'] = None
+    if cut:
+        logger.info(f"Truncating content of {row.get('url')} from {len(content)} to {max_chars} characters")
+        if overflow == 'compress':
+            row['content_gzip'] = compress_content(content)
+        row['content'] = truncate(content, max_chars)
+    return row
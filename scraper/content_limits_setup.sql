@@ -0,0 +1,20 @@
+-- Content size columns written by content_limits.py.
+-- Apply after supabase_setup.sql (and publish_setup.sql, if used).
+
+-- content_bytes is the UTF-8 size of the extracted body before any
+-- truncation; truncated says whether content holds only the start of it
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS content_bytes INTEGER;
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS truncated BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS content_bytes INTEGER;
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS truncated BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Full body of a truncated article, gzipped and base64-encoded (CONTENT_OVERFLOW=compress)
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS content_gzip TEXT;
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS content_gzip TEXT;
+
+ALTER TABLE IF EXISTS trending_articles_staging ADD COLUMN IF NOT EXISTS content_bytes INTEGER;
+ALTER TABLE IF EXISTS trending_articles_staging ADD COLUMN IF NOT EXISTS truncated BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE IF EXISTS trending_articles_staging ADD COLUMN IF NOT EXISTS content_gzip TEXT;
+ALTER TABLE IF EXISTS mbs_articles_staging ADD COLUMN IF NOT EXISTS content_bytes INTEGER;
+ALTER TABLE IF EXISTS mbs_articles_staging ADD COLUMN IF NOT EXISTS truncated BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE IF EXISTS mbs_articles_staging ADD COLUMN IF NOT EXISTS content_gzip TEXT;
@@ -0,0 +1,132 @@
+import os
+import time
+import random
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+import httpx
+from postgrest.exceptions import APIError
+from timing import StageTimer
+from metrics import DB_RETRIES, DB_ROWS, DB_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Write batching and retry settings, overridable from the environment
+CHUNK_SIZE = int(os.getenv('DB_CHUNK_SIZE', '100'))
+MAX_RETRIES = int(os.getenv('DB_MAX_RETRIES', '4'))
+RETRY_BACKOFF = float(os.getenv('DB_RETRY_BACKOFF', '0.5'))
+
+# PostgREST / Postgres error codes worth retrying: rate limiting, gateway
+# errors, serialization failures, deadlocks and statement timeouts
+TRANSIENT_CODES = {'429', '500', '502', '503', '504', '40001', '40P01', '57014'}
+
+
+def is_transient(error: Exception) -> bool:
+    """True for network and server-side errors that may succeed on retry"""
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    if isinstance(error, APIError):
+        return str(error.code) in TRANSIENT_CODES
+    return False
+
+
+class BatchWriter:
+    """Collect rows and write them to a table in bulk upserts.
+
+    Rows are buffered and flushed ``chunk_size`` at a time with a single
+    upsert keyed on ``on_conflict``. Transient failures are retried with
+    jittered exponential backoff; each chunk logs its row count and latency.
+    """
+
+    def __init__(self, client, table: str, chunk_size: int = CHUNK_SIZE,
+                 on_conflict: str = 'url', max_retries: int = MAX_RETRIES,
+                 backoff: float = RETRY_BACKOFF, timer: Optional[StageTimer] = None):
+        self.client = client
+        self.table = table
+        self.chunk_size = max(1, chunk_size)
+        self.on_conflict = on_conflict
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timer = timer or StageTimer()
+
+        self._buffer: List[Dict[str, Any]] = []
+        self.chunks = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.write_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    @property
+    def pending(self) -> int:
+        """Rows buffered but not yet written"""
+        return len(self._buffer)
+
+    def add(self, row: Dict[str, Any]):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def write(self, rows: Iterable[Dict[str, Any]]):
+        """Buffer many rows and flush whatever is left"""
+        for row in rows:
+            self.add(row)
+        self.flush()
+
+    def flush(self):
+        """Write every buffered row"""
+        while self._buffer:
+            chunk, self._buffer = self._buffer[:self.chunk_size], self._buffer[self.chunk_size:]
+            with self.timer.stage('db_write'):
+                self._write_chunk(chunk)
+
+    def _write_chunk(self, chunk: List[Dict[str, Any]]):
+        # Postgres rejects an upsert that touches the same key twice, so keep
+        # only the last row for each key within a chunk
+        rows = list({row[self.on_conflict]: row for row in chunk}.values())
+
+        # PostgREST rejects a bulk upsert whose rows have different keys
+        # (PGRST102), so rows with different columns go out separately.
+        # Missing keys are not filled with nulls: an omitted column keeps its
+        # stored value or default, an explicit null would overwrite it.
+        groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(frozenset(row), []).append(row)
+        for group in groups.values():
+            self._upsert(group)
+
+    def _upsert(self, rows: List[Dict[str, Any]]):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                self.client.table(self.table).upsert(rows, on_conflict=self.on_conflict).execute()
+                break
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries or not is_transient(e):
+                    self.rows_failed += len(rows)
+                    DB_ROWS.inc(len(rows), table=self.table, outcome='failed')
+                    logger.error(f"Failed to write {len(rows)} rows to {self.table} after {attempt} attempt(s): {e}")
+                    return
+                DB_RETRIES.inc(table=self.table)
+                delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                logger.warning(f"Transient error writing to {self.table}, retrying in {delay:.2f}s: {e}")
+                time.sleep(delay)
+
+        elapsed = time.monotonic() - start
+        self.chunks += 1
+        self.rows_written += len(rows)
+        self.write_seconds += elapsed
+        DB_WRITE_SECONDS.observe(elapsed, table=self.table)
+        DB_ROWS.inc(len(rows), table=self.table, outcome='written')
+        logger.debug(f"Wrote chunk {self.chunks} to {self.table}: {len(rows)} rows in {elapsed:.2f}s")
+
+    def summary(self) -> str:
+        return (f"{self.rows_written} rows in {self.chunks} chunks to {self.table} "
+                f"({self.write_seconds:.2f}s, {self.rows_failed} failed)")
@@ -0,0 +1,249 @@
+import os
+import re
+import hashlib
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Articles within this many bits of each other are the same story
+DEDUPE_MAX_DISTANCE = int(os.getenv('DEDUPE_MAX_DISTANCE', '6'))
+# Stored rows newer than this are clustered against
+DEDUPE_WINDOW_DAYS = float(os.getenv('DEDUPE_WINDOW_DAYS', '14'))
+# Texts shorter than this many words are too thin to fingerprint
+DEDUPE_MIN_TOKENS = int(os.getenv('DEDUPE_MIN_TOKENS', '40'))
+# Store duplicates without their content; readers follow cluster_id to the canonical row.
+# A duplicate promoted after its canonical row is removed gets its page fetched again
+DEDUPE_DROP_CONTENT = os.getenv('DEDUPE_DROP_CONTENT', '1') not in ('', '0', 'false', 'False')
+
+# Tables whose rows are clustered together, so a story in both feeds is stored once
+DEDUPE_TABLES = ['mbs_articles', 'trending_articles']
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+PAGE_SIZE = 1000
+# Cluster ids per in_() filter when reading whole clusters
+CLUSTER_BATCH = 100
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over word 3-shingles, or None for texts too short to compare"""
+    tokens = TOKEN_RE.findall((text or '').lower())
+    if len(tokens) < DEDUPE_MIN_TOKENS:
+        return None
+    shingles = Counter(' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1))
+    # Tally shingle weight per byte value of the hash, then per bit, instead of touching all 64 bits per shingle
+    byte_weights = [Counter() for _ in range(SIMHASH_BITS // 8)]
+    for shingle, weight in shingles.items():
+        digest = hashlib.blake2b(shingle.encode('utf-8'), digest_size=SIMHASH_BITS // 8).digest()
+        for position, value in enumerate(digest):
+            byte_weights[position][value] += weight
+    total = sum(shingles.values())
+    fingerprint = 0
+    for position, weights in enumerate(byte_weights):
+        for bit in range(8):
+            # Set where the shingles with this bit set outweigh the rest
+            if 2 * sum(weight for value, weight in weights.items() if value >> bit & 1) > total:
+                fingerprint |= 1 << (8 * position + bit)
+    return fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def cluster_key(url: str) -> str:
+    """Cluster id named after the cluster's canonical URL"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+class SimHashIndex:
+    """LSH index over SimHash fingerprints.
+
+    Fingerprints are cut into ``max_distance + 1`` bands. Two fingerprints
+    within ``max_distance`` bits must agree exactly on at least one band,
+    so looking up each band of a query finds every near neighbour while
+    comparing against only a handful of candidates.
+    """
+
+    def __init__(self, max_distance: int = DEDUPE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = SIMHASH_BITS // bands
+        self.bands = [(i * width, width if i < bands - 1 else SIMHASH_BITS - i * width) for i in range(bands)]
+        self.buckets: Dict[Tuple[int, int], List[Tuple[int, str, str]]] = defaultdict(list)
+
+    def _keys(self, fingerprint: int):
+        for i, (shift, width) in enumerate(self.bands):
+            yield i, fingerprint >> shift & ((1 << width) - 1)
+
+    def add(self, fingerprint: int, url: str, cluster_id: str):
+        for key in self._keys(fingerprint):
+            self.buckets[key].append((fingerprint, url, cluster_id))
+
+    def nearest(self, fingerprint: int, exclude_url: Optional[str] = None) -> Optional[Tuple[int, str, str]]:
+        """Closest indexed entry within the distance limit as ``(distance, url, cluster_id)``"""
+        best = None
+        for key in self._keys(fingerprint):
+            for other, url, cluster_id in self.buckets.get(key, ()):
+                if url == exclude_url:
+                    continue
+                distance = hamming(fingerprint, other)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, url, cluster_id)
+        return best
+
+
+class Deduplicator:
+    """Assign near-duplicate articles to story clusters at ingest time.
+
+    Every row gets a ``simhash`` fingerprint of its extracted text, a
+    ``cluster_id`` and an ``is_canonical`` flag. A row joins the cluster of
+    the closest article seen earlier in the run or stored in either article
+    table in the last ``window_days``; otherwise it starts a cluster of its
+    own and is its canonical row. With ``drop_content`` duplicates are
+    stored without content.
+
+    Cluster ids are named after the canonical URL, so when the canonical
+    row is expired or truncated away, ``promote_orphans`` makes a surviving
+    copy canonical and renames the cluster after it.
+    """
+
+    def __init__(self, client, timer: Optional[StageTimer] = None, exclude: Optional[str] = None,
+                 max_distance: int = DEDUPE_MAX_DISTANCE, window_days: float = DEDUPE_WINDOW_DAYS,
+                 drop_content: bool = DEDUPE_DROP_CONTENT):
+        self.client = client
+        self.timer = timer or StageTimer()
+        # A table about to be replaced wholesale is not clustered against
+        self.tables = [table for table in DEDUPE_TABLES if table != exclude]
+        self.window_days = window_days
+        self.drop_content = drop_content
+        self.index = SimHashIndex(max_distance)
+        self.stats = {'clusters': 0, 'duplicates': 0, 'unhashed': 0}
+
+    def load(self):
+        """Index the fingerprints of recent rows in the article tables"""
+        cutoff = (datetime.now() - timedelta(days=self.window_days)).isoformat()
+        loaded = 0
+        with self.timer.stage('dedupe'):
+            for table in self.tables:
+                offset = 0
+                while True:
+                    try:
+                        response = self.client.table(table) \
+                            .select('url,simhash,cluster_id') \
+                            .gte('date', cutoff) \
+                            .order('url') \
+                            .range(offset, offset + PAGE_SIZE - 1) \
+                            .execute()
+                    except Exception as e:
+                        # Clustering within the run still works without history
+                        logger.warning(f"Could not load fingerprints from {table}: {e}")
+                        break
+                    for row in response.data:
+                        if row.get('simhash') and row.get('cluster_id'):
+                            self.index.add(int(row['simhash'], 16), row['url'], row['cluster_id'])
+                            loaded += 1
+                    if len(response.data) < PAGE_SIZE:
+                        break
+                    offset += PAGE_SIZE
+        logger.info(f"Loaded {loaded} recent fingerprints from {', '.join(self.tables)}")
+
+    def assign(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Set a row's fingerprint and cluster, and index it for the rest of the run"""
+        with self.timer.stage('dedupe'):
+            fingerprint = simhash(row.get('content') or f"{row.get('title') or ''} {row.get('description') or ''}")
+            if fingerprint is None:
+                self.stats['unhashed'] += 1
+                row.update(simhash=None, cluster_id=cluster_key(row['url']), is_canonical=True)
+                return row
+
+            match = self.index.nearest(fingerprint, exclude_url=row['url'])
+            cluster_id = match[2] if match else cluster_key(row['url'])
+            # A re-scraped canonical row matches its own duplicates and stays canonical
+            is_canonical = cluster_id == cluster_key(row['url'])
+            row.update(simhash=f"{fingerprint:016x}", cluster_id=cluster_id, is_canonical=is_canonical)
+            self.index.add(fingerprint, row['url'], cluster_id)
+
+        if is_canonical:
+            self.stats['clusters'] += 1
+        else:
+            self.stats['duplicates'] += 1
+            logger.debug(f"{row['url']} duplicates {match[1]} ({match[0]} bits apart)")
+            if self.drop_content:
+                row['content'] = None
+                if row.get('content_gzip'):
+                    # The full body kept by content_limits.py goes with it
+                    row['content_gzip'] = None
+        return row
+
+    def _select_all(self, table: str, columns: str, query) -> List[Dict[str, Any]]:
+        """Every row of ``table`` matching ``query``, read a page at a time in url order"""
+        rows, offset = [], 0
+        while True:
+            response = query(self.client.table(table).select(columns)) \
+                .order('url') \
+                .range(offset, offset + PAGE_SIZE - 1) \
+                .execute()
+            rows.extend(response.data)
+            if len(response.data) < PAGE_SIZE:
+                return rows
+            offset += PAGE_SIZE
+
+    def promote_orphans(self) -> int:
+        """Make one surviving copy canonical in every recent cluster that lost its canonical row.
+
+        Clusters with a copy in the window are read whole, whatever the age
+        of their rows, so a canonical row older than the window still counts.
+        The earliest copy is promoted. Its fingerprint is cleared so the next
+        incremental run fetches the page again, restoring its content if it
+        was stored as a duplicate without. Returns the number of clusters
+        repaired.
+        """
+        cutoff = (datetime.now() - timedelta(days=self.window_days)).isoformat()
+        columns = 'url,cluster_id,is_canonical,date'
+        promoted = 0
+        try:
+            with self.timer.stage('dedupe'):
+                # Clusters with no canonical copy among their recent rows
+                recent: Dict[str, bool] = {}
+                for table in DEDUPE_TABLES:
+                    for row in self._select_all(table, columns, lambda query: query.gte('date', cutoff)):
+                        if row.get('cluster_id'):
+                            recent[row['cluster_id']] = recent.get(row['cluster_id'], False) \
+                                or row.get('is_canonical') is not False
+                suspects = sorted(cluster_id for cluster_id, has_canonical in recent.items() if not has_canonical)
+
+                members: Dict[str, List[Tuple[str, Dict[str, Any]]]] = defaultdict(list)
+                for start in range(0, len(suspects), CLUSTER_BATCH):
+                    batch = suspects[start:start + CLUSTER_BATCH]
+                    for table in DEDUPE_TABLES:
+                        for row in self._select_all(table, columns, lambda query: query.in_('cluster_id', batch)):
+                            members[row['cluster_id']].append((table, row))
+
+                for cluster_id, copies in members.items():
+                    # Only when no copy of the story, recent or not, is canonical
+                    if any(row.get('is_canonical') is not False for _, row in copies):
+                        continue
+                    table, survivor = min(copies, key=lambda copy: (copy[1].get('date') or '', copy[1]['url']))
+                    new_id = cluster_key(survivor['url'])
+                    self.client.table(table).update({
+                        'cluster_id': new_id, 'is_canonical': True,
+                        'content_hash': None, 'etag': None, 'last_modified': None,
+                    }).eq('url', survivor['url']).execute()
+                    for other in {other_table for other_table, _ in copies}:
+                        self.client.table(other).update({'cluster_id': new_id}).eq('cluster_id', cluster_id).execute()
+                    logger.info(f"Promoted {survivor['url']} to canonical for cluster {cluster_id}, now {new_id}")
+                    promoted += 1
+        except Exception as e:
+            # Left for the next run; the rows written so far are fine as they are
+            logger.warning(f"Could not promote orphaned duplicates: {e}")
+        return promoted
+
+    def summary(self) -> str:
+        return ', '.join(f"{key}={value}" for key, value in self.stats.items())
@@ -0,0 +1,31 @@
+-- Story clustering columns written by dedupe.py.
+-- Apply after incremental_setup.sql (and publish_setup.sql, if used).
+
+-- simhash is a 16-digit hex string; cluster_id is shared by every copy of a
+-- story across both tables, and exactly one copy per cluster is canonical
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS simhash TEXT;
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS cluster_id TEXT;
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS is_canonical BOOLEAN NOT NULL DEFAULT TRUE;
+
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS simhash TEXT;
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS cluster_id TEXT;
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS is_canonical BOOLEAN NOT NULL DEFAULT TRUE;
+
+ALTER TABLE IF EXISTS trending_articles_staging ADD COLUMN IF NOT EXISTS simhash TEXT;
+ALTER TABLE IF EXISTS trending_articles_staging ADD COLUMN IF NOT EXISTS cluster_id TEXT;
+ALTER TABLE IF EXISTS trending_articles_staging ADD COLUMN IF NOT EXISTS is_canonical BOOLEAN NOT NULL DEFAULT TRUE;
+ALTER TABLE IF EXISTS mbs_articles_staging ADD COLUMN IF NOT EXISTS simhash TEXT;
+ALTER TABLE IF EXISTS mbs_articles_staging ADD COLUMN IF NOT EXISTS cluster_id TEXT;
+ALTER TABLE IF EXISTS mbs_articles_staging ADD COLUMN IF NOT EXISTS is_canonical BOOLEAN NOT NULL DEFAULT TRUE;
+
+-- Look up the other copies of a story
+CREATE INDEX IF NOT EXISTS trending_articles_cluster_idx ON trending_articles(cluster_id);
+CREATE INDEX IF NOT EXISTS mbs_articles_cluster_idx ON mbs_articles(cluster_id);
+
+-- One entry per story, newest first, for the frontend
+CREATE OR REPLACE VIEW article_stories AS
+SELECT 'trending' AS source, id, title, url, description, category, date, cluster_id
+FROM trending_articles WHERE is_canonical
+UNION ALL
+SELECT 'mbs' AS source, id, title, url, description, category, date, cluster_id
+FROM mbs_articles WHERE is_canonical;
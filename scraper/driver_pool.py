@@ -0,0 +1,369 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, List, Optional
+from metrics import BROWSER_WAIT_SECONDS, DRIVER_STARTUP_SECONDS
+
+# Selenium and chromedriver_autoinstaller are imported when the first
+# driver starts, so importing this module stays cheap for the API
+if TYPE_CHECKING:
+    from selenium.webdriver.chrome.options import Options
+
+try:
+    import psutil
+except ImportError:  # memory-based recycling is skipped without psutil
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Pool sizing and recycling thresholds, overridable from the environment
+POOL_SIZE = int(os.getenv('DRIVER_POOL_SIZE', '2'))
+POOL_WARM = int(os.getenv('DRIVER_POOL_WARM', '1'))
+MAX_PAGE_LOADS = int(os.getenv('DRIVER_MAX_PAGE_LOADS', '50'))
+MAX_MEMORY_MB = int(os.getenv('DRIVER_MAX_MEMORY_MB', '1024'))
+ACQUIRE_TIMEOUT = float(os.getenv('DRIVER_ACQUIRE_TIMEOUT', '120'))
+
+# A chromedriver binary to use as is; otherwise one matching the installed
+# Chrome is resolved once and remembered in CHROMEDRIVER_CACHE
+CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH')
+CHROMEDRIVER_CACHE = os.getenv(
+    'CHROMEDRIVER_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'next-trend-scraper', 'chromedriver.json'))
+
+# "lean" loads pages eagerly and blocks heavy and third-party resources;
+# "full" loads pages the way a desktop browser would
+BROWSER_PROFILE = os.getenv('BROWSER_PROFILE', 'lean')
+PROFILES = ('lean', 'full')
+
+# URL patterns the lean profile never requests: images, media, fonts and
+# ad/analytics hosts. Extra comma-separated patterns come from BROWSER_BLOCK_EXTRA.
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3', '*.m4a',
+    '*doubleclick.net*', '*googlesyndication.com*', '*googleadservices.com*',
+    '*googletagmanager.com*', '*googletagservices.com*', '*google-analytics.com*',
+    '*adservice.google.*', '*amazon-adsystem.com*', '*adnxs.com*', '*criteo.*',
+    '*taboola.com*', '*outbrain.com*', '*moatads.com*', '*scorecardresearch.com*',
+    '*quantserve.com*', '*chartbeat.*', '*hotjar.com*', '*facebook.net*',
+    '*connect.facebook.*', '*platform.twitter.com*', '*youtube.com/embed*',
+] + [pattern.strip() for pattern in os.getenv('BROWSER_BLOCK_EXTRA', '').split(',') if pattern.strip()]
+
+# Browser features a text scrape never uses
+DISABLED_FEATURES = [
+    'Translate', 'MediaRouter', 'OptimizationHints', 'AutofillServerCommunication',
+    'InterestFeedContentSuggestions', 'CalculateNativeWinOcclusion', 'BackForwardCache',
+]
+
+
+def build_chrome_options(profile: str = BROWSER_PROFILE) -> 'Options':
+    """Chrome options shared by every scraper"""
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    if profile == 'lean':
+        # Hand the page back at DOMContentLoaded instead of waiting for every subresource
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_argument("--no-first-run")
+        chrome_options.add_argument("--disable-sync")
+        chrome_options.add_argument("--disable-default-apps")
+        chrome_options.add_argument("--disable-notifications")
+        chrome_options.add_argument("--disable-background-networking")
+        chrome_options.add_argument("--disable-component-update")
+        chrome_options.add_argument("--disable-domain-reliability")
+        chrome_options.add_argument(f"--disable-features={','.join(DISABLED_FEATURES)}")
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+            'profile.default_content_setting_values.geolocation': 2,
+        })
+    return chrome_options
+
+
+def resolve_chromedriver() -> Optional[str]:
+    """Path to a chromedriver for the installed Chrome, or None to let Selenium find one.
+
+    ``chromedriver_autoinstaller.install()`` may hit the network, so its
+    result is cached on disk keyed by the Chrome version and reused until
+    Chrome is upgraded.
+    """
+    if CHROMEDRIVER_PATH:
+        return CHROMEDRIVER_PATH
+
+    import chromedriver_autoinstaller
+
+    chrome_version = chromedriver_autoinstaller.get_chrome_version()
+    try:
+        with open(CHROMEDRIVER_CACHE) as f:
+            cached = json.load(f)
+        if cached.get('chrome_version') == chrome_version and os.path.isfile(cached.get('path', '')):
+            return cached['path']
+    except (OSError, ValueError):
+        pass
+
+    # Install ChromeDriver that matches the installed Chrome version
+    path = chromedriver_autoinstaller.install()
+    if path and chrome_version:
+        try:
+            os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE), exist_ok=True)
+            with open(CHROMEDRIVER_CACHE, 'w') as f:
+                json.dump({'chrome_version': chrome_version, 'path': path}, f)
+        except OSError as e:
+            logger.warning(f"Could not cache chromedriver path: {str(e)}")
+    return path or None
+
+
+def block_resources(driver, patterns: List[str] = BLOCKED_URL_PATTERNS):
+    """Block matching requests for the life of the driver via the DevTools Network domain"""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
+
+class PooledDriver:
+    """A WebDriver checked out of the pool.
+
+    Attribute access is forwarded to the underlying driver; ``get`` is
+    wrapped so the pool can count page loads.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.page_loads = 0
+        self.created_at = time.monotonic()
+        self.closed = False
+
+    def get(self, url: str):
+        self.page_loads += 1
+        return self.driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def memory_mb(self) -> Optional[float]:
+        """Resident memory of chromedriver and all of its Chrome children"""
+        if psutil is None:
+            return None
+        try:
+            process = psutil.Process(self.driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except Exception:
+            return None
+
+    def is_healthy(self) -> bool:
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def quit(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.error(f"Error closing WebDriver: {str(e)}")
+
+
+class DriverPool:
+    """A bounded pool of long-lived headless Chrome drivers.
+
+    Drivers are health-checked before being handed out and recycled after
+    ``max_page_loads`` page loads or once their process tree exceeds
+    ``max_memory_mb``. ``shutdown`` quits every driver deterministically.
+    Drivers are started with the given browser ``profile``.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, max_page_loads: int = MAX_PAGE_LOADS,
+                 max_memory_mb: int = MAX_MEMORY_MB, acquire_timeout: float = ACQUIRE_TIMEOUT,
+                 profile: str = BROWSER_PROFILE):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown browser profile: {profile}")
+        self.profile = profile
+        self.size = max(1, size)
+        self.max_page_loads = max_page_loads
+        self.max_memory_mb = max_memory_mb
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: "queue.LifoQueue[PooledDriver]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._all: List[PooledDriver] = []
+        self._closed = False
+        self._chromedriver_ready = False
+        self._chromedriver: Optional[str] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def _create(self) -> PooledDriver:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        with self._lock:
+            if not self._chromedriver_ready:
+                self._chromedriver = resolve_chromedriver()
+                self._chromedriver_ready = True
+
+        logger.info(f"Starting headless Chrome ({self.profile} profile) for the driver pool")
+        start = time.monotonic()
+        driver = webdriver.Chrome(service=Service(executable_path=self._chromedriver),
+                                  options=build_chrome_options(self.profile))
+        if self.profile == 'lean':
+            try:
+                block_resources(driver)
+            except Exception as e:
+                logger.warning(f"Could not enable resource blocking: {str(e)}")
+        pooled = PooledDriver(driver)
+        elapsed = time.monotonic() - start
+        DRIVER_STARTUP_SECONDS.observe(elapsed)
+        logger.info(f"Chrome started in {elapsed:.2f}s")
+        with self._lock:
+            # A pool shut down while Chrome was starting would never quit this driver
+            if not self._closed:
+                self._all.append(pooled)
+                return pooled
+        pooled.quit()
+        raise RuntimeError("Driver pool is shut down")
+
+    def _discard(self, pooled: PooledDriver):
+        pooled.quit()
+        with self._lock:
+            if pooled in self._all:
+                self._all.remove(pooled)
+
+    def _needs_recycle(self, pooled: PooledDriver) -> bool:
+        if self.max_page_loads and pooled.page_loads >= self.max_page_loads:
+            logger.info(f"Recycling driver after {pooled.page_loads} page loads")
+            return True
+        memory = pooled.memory_mb()
+        if self.max_memory_mb and memory is not None and memory > self.max_memory_mb:
+            logger.info(f"Recycling driver using {memory:.0f} MB")
+            return True
+        return False
+
+    def warm(self, count: int = POOL_WARM):
+        """Start up to ``count`` idle drivers ahead of time"""
+        count = min(count, self.size)
+        while not self._closed and len(self._all) < count:
+            try:
+                self._idle.put(self._create())
+            except Exception as e:
+                if not self._closed:
+                    logger.error(f"Failed to warm driver pool: {str(e)}")
+                break
+
+    def acquire(self) -> PooledDriver:
+        """Check out a healthy driver, starting one if none is idle"""
+        if self._closed:
+            raise RuntimeError("Driver pool is shut down")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError("Timed out waiting for a WebDriver from the pool")
+
+        try:
+            while True:
+                try:
+                    pooled = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._create()
+                if pooled.is_healthy():
+                    return pooled
+                logger.warning("Discarding unhealthy WebDriver")
+                self._discard(pooled)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, pooled: PooledDriver, discard: bool = False):
+        """Return a driver to the pool, recycling it if it is worn out"""
+        try:
+            if discard or self._closed or self._needs_recycle(pooled):
+                self._discard(pooled)
+            else:
+                self._idle.put(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def driver(self):
+        """Borrow a driver for the duration of a ``with`` block"""
+        pooled = self.acquire()
+        failed = False
+        try:
+            yield pooled
+        except Exception:
+            # A driver that raised may be wedged; check before reusing it
+            failed = not pooled.is_healthy()
+            raise
+        finally:
+            self.release(pooled, discard=failed)
+
+    def render(self, url: str, class_name: str, timeout: int) -> str:
+        """Load a page in a pooled driver and return its source once content has rendered"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        with self.driver() as driver, BROWSER_WAIT_SECONDS.time(element=class_name):
+            driver.get(url)
+
+            # Wait for the page to finish loading and for at least one element of
+            # the given class to contain text, rather than sleeping a fixed time.
+            # The lean profile only needs the DOM, not every subresource.
+            ready = ('interactive', 'complete') if self.profile == 'lean' else ('complete',)
+            WebDriverWait(driver, timeout).until(
+                lambda d: d.execute_script("return document.readyState") in ready
+            )
+            WebDriverWait(driver, timeout).until(
+                lambda d: any(e.text.strip() for e in d.find_elements(By.CLASS_NAME, class_name))
+            )
+            return driver.page_source
+
+    def shutdown(self):
+        """Quit every driver owned by the pool; drivers still starting are quit when they are up"""
+        with self._lock:
+            self._closed = True
+            drivers = list(self._all)
+            self._all.clear()
+        for pooled in drivers:
+            pooled.quit()
+        logger.info(f"Driver pool shut down ({len(drivers)} drivers closed)")
+
+
+_default_pool: Optional[DriverPool] = None
+_default_lock = threading.Lock()
+
+
+def get_pool() -> DriverPool:
+    """Process-wide driver pool shared by the scrapers"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None or _default_pool._closed:
+            _default_pool = DriverPool()
+        return _default_pool
+
+
+def shutdown_pool():
+    """Shut down the process-wide pool, if one was created"""
+    global _default_pool
+    with _default_lock:
+        pool, _default_pool = _default_pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -0,0 +1,207 @@
+import os
+import re
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+from urllib.parse import urlparse
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+from metrics import PARSE_SECONDS
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml  # noqa: F401 - only needed as a BeautifulSoup tree builder
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+logger = logging.getLogger(__name__)
+
+# Parser backend: auto, selectolax, lxml or html.parser
+PARSER_BACKEND = os.getenv('SCRAPER_PARSER', 'auto')
+
+BACKENDS = ['selectolax', 'lxml', 'html.parser']
+
+# Simple "tag.class.class" selectors can be turned into a SoupStrainer
+SIMPLE_SELECTOR = re.compile(r'^([a-zA-Z][a-zA-Z0-9]*)((?:\.[\w-]+)+)$')
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """Pick the fastest installed backend unless one is requested"""
+    backend = backend or PARSER_BACKEND
+    if backend == 'auto':
+        if HTMLParser is not None:
+            return 'selectolax'
+        return 'lxml' if HAS_LXML else 'html.parser'
+    if backend == 'selectolax' and HTMLParser is None:
+        logger.warning("selectolax is not installed, using html.parser")
+        return 'html.parser'
+    if backend == 'lxml' and not HAS_LXML:
+        logger.warning("lxml is not installed, using html.parser")
+        return 'html.parser'
+    return backend
+
+
+def parse_html(html: str, parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """BeautifulSoup tree using lxml when available, optionally limited to a subtree"""
+    return BeautifulSoup(html, 'lxml' if HAS_LXML else 'html.parser', parse_only=parse_only)
+
+
+def text_and_release(soup: BeautifulSoup, read):
+    """``read(soup)``, then decompose the tree.
+
+    Parse trees are full of parent/child reference cycles, so without this a
+    large page stays in memory until the garbage collector next runs.
+    """
+    try:
+        return read(soup)
+    finally:
+        soup.decompose()
+
+
+def class_matcher(classes: Set[str]):
+    """Attribute matcher for elements carrying any of ``classes``.
+
+    While parsing, the class attribute may still be the raw space-separated
+    string, so it is split here rather than relying on SoupStrainer.
+    """
+    def match(value) -> bool:
+        if not value:
+            return False
+        values = value.split() if isinstance(value, str) else value
+        return any(name in classes for name in values)
+    return match
+
+
+def strainer_for(tag: str, *classes: str) -> SoupStrainer:
+    """SoupStrainer for ``tag`` elements carrying any of ``classes``"""
+    return SoupStrainer(tag, class_=class_matcher(set(classes)))
+
+
+def build_strainer(selectors: Iterable[str]) -> Optional[SoupStrainer]:
+    """SoupStrainer matching the outermost element of every selector, if they are all simple"""
+    tags, classes = set(), set()
+    for selector in selectors:
+        match = SIMPLE_SELECTOR.match(selector)
+        if not match:
+            return None
+        tags.add(match.group(1))
+        # Any one class of the selector narrows the parse; the compiled
+        # selector still checks all of them afterwards
+        classes.add(match.group(2).split('.')[1])
+    return SoupStrainer(list(tags), class_=class_matcher(classes))
+
+
+class Extractor:
+    """Selector rules for pulling article text out of one source's pages.
+
+    ``selectors`` are tried in order. With ``paragraphs`` set, only the
+    text of ``<p>`` elements is kept, joined by spaces; otherwise all text
+    in the matched element is concatenated.
+    """
+
+    def __init__(self, name: str, selectors: List[str], domains: Iterable[str] = (),
+                 paragraphs: bool = False):
+        self.name = name
+        self.selectors = selectors
+        self.domains = [domain.lower() for domain in domains]
+        self.paragraphs = paragraphs
+        self.compiled = [soupsieve.compile(selector) for selector in selectors]
+        self.strainer = build_strainer(selectors)
+
+    def _text_from_soup(self, soup: BeautifulSoup) -> Optional[str]:
+        for compiled in self.compiled:
+            element = compiled.select_one(soup)
+            if element is not None:
+                if self.paragraphs:
+                    return ' '.join(p.get_text(strip=True) for p in element.find_all('p'))
+                return element.get_text(strip=True)
+        return None
+
+    def _extract_selectolax(self, html: str) -> Optional[str]:
+        tree = HTMLParser(html)
+        for selector in self.selectors:
+            node = tree.css_first(selector)
+            if node is not None:
+                # BeautifulSoup leaves script and style text out of get_text()
+                node.strip_tags(['script', 'style'])
+                if self.paragraphs:
+                    return ' '.join(p.text(strip=True) for p in node.css('p'))
+                return node.text(separator='', strip=True)
+        return None
+
+    def _extract_soup(self, html: str, builder: str) -> Optional[str]:
+        return text_and_release(BeautifulSoup(html, builder, parse_only=self.strainer), self._text_from_soup)
+
+    def extract_full(self, html: str) -> Optional[str]:
+        """The original path: parse the whole document with html.parser"""
+        return text_and_release(BeautifulSoup(html, 'html.parser'), self._text_from_soup)
+
+    def extract(self, html: str, backend: Optional[str] = None) -> Optional[str]:
+        """Extract text with the chosen backend, falling back to a full html.parser parse"""
+        backend = resolve_backend(backend)
+        start = time.monotonic()
+        try:
+            if backend == 'selectolax':
+                text = self._extract_selectolax(html)
+            else:
+                text = self._extract_soup(html, backend)
+            if text is not None:
+                return text
+        except Exception as e:
+            logger.warning(f"{backend} extraction failed for {self.name}, falling back: {e}")
+        finally:
+            PARSE_SECONDS.observe(time.monotonic() - start, source=self.name, backend=backend)
+        with PARSE_SECONDS.time(source=self.name, backend='fallback'):
+            return self.extract_full(html)
+
+
+_by_source: Dict[str, Extractor] = {}
+_by_domain: Dict[str, Extractor] = {}
+
+
+def register(name: str, selectors: List[str], domains: Iterable[str] = (), paragraphs: bool = False) -> Extractor:
+    """Register extraction rules for a source name and its domains"""
+    extractor = Extractor(name, selectors, domains, paragraphs)
+    _by_source[name] = extractor
+    for domain in extractor.domains:
+        _by_domain[domain] = extractor
+    return extractor
+
+
+def get_extractor(source: Optional[str] = None, url: Optional[str] = None) -> Optional[Extractor]:
+    """Look up an extractor by source name, then by the URL's domain"""
+    if source and source in _by_source:
+        return _by_source[source]
+    if url:
+        host = urlparse(url).netloc.lower().split(':')[0]
+        while host:
+            if host in _by_domain:
+                return _by_domain[host]
+            # Try the parent domain: www.cnbc.com -> cnbc.com
+            host = host.partition('.')[2]
+    return None
+
+
+def extract(html: str, source: Optional[str] = None, url: Optional[str] = None,
+            backend: Optional[str] = None) -> Optional[str]:
+    """Extract article text for a source, or None if no rule matches"""
+    extractor = get_extractor(source, url)
+    if extractor is None:
+        return None
+    return extractor.extract(html, backend)
+
+
+register("CNBC", ['div.PageBuilder-col-9.PageBuilder-col.PageBuilder-article'], ['cnbc.com'])
+register("Calculated Risk Blog", ['div.post.hentry.uncustomized-post-template'], ['calculatedriskblog.com'])
+register("Marketwatch", ['div.column-full.css-j1bzmn'], ['marketwatch.com'])
+register("Eye on Housing", ['div.entry-content'], ['eyeonhousing.org'])
+register("PR Newswire", ['div.release-body'], ['prnewswire.com'])
+register("The Basis Point", ['div.entry-content'], ['thebasispoint.com'])
+register("Federal Reserve", ['div.content'], ['federalreserve.gov'])
+register("Mortgage News Daily", ['div.article-body', 'div.article-content', 'div.article-text'],
+         ['mortgagenewsdaily.com'], paragraphs=True)
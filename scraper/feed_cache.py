@@ -0,0 +1,296 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from supabase_client import get_supabase
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Feed name in the URL -> article table
+FEEDS = {'mbs': 'mbs_articles', 'trending': 'trending_articles'}
+
+# Reload a feed after this many seconds even without an invalidation; a
+# backstop for databases without feed_cache_setup.sql applied
+ARTICLES_CACHE_TTL = float(os.getenv('ARTICLES_CACHE_TTL', '600'))
+# Seconds between checks of a table's write version (feed_cache_setup.sql),
+# which picks up writes from other processes such as the scheduler or backfill.py
+ARTICLES_VERSION_CHECK = float(os.getenv('ARTICLES_VERSION_CHECK', '5'))
+# Rendered pages kept per feed
+ARTICLES_CACHE_ENTRIES = int(os.getenv('ARTICLES_CACHE_ENTRIES', '256'))
+# Seconds browsers may reuse a response without revalidating
+ARTICLES_MAX_AGE = int(os.getenv('ARTICLES_MAX_AGE', '60'))
+ARTICLES_PAGE_SIZE = 50
+ARTICLES_MAX_PAGE_SIZE = 500
+
+# Smaller bodies are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+# Columns kept in the cache and served in feed pages. Article bodies are by far
+# the largest columns, so they stay in the database and are read one article
+# at a time; the fingerprint columns are never served
+LIST_FIELDS = ['id', 'title', 'url', 'description', 'category', 'date', 'last_scraped', 'is_generating',
+               'backfilled', 'cluster_id', 'is_canonical', 'content_bytes', 'truncated']
+# Columns served for a single article
+ARTICLE_FIELDS = LIST_FIELDS + ['content']
+
+# Page size when loading a table
+LOAD_PAGE_SIZE = 1000
+
+# Per-table write counters kept by the triggers in feed_cache_setup.sql
+VERSION_TABLE = 'article_versions'
+
+
+def supported_encodings() -> List[str]:
+    """Content codings in order of preference"""
+    return (['br'] if brotli is not None else []) + ['gzip', 'identity']
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """Best supported coding the client accepts, per the Accept-Encoding q-values"""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    best, best_quality = 'identity', 0.0
+    for encoding in supported_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 1.0 if encoding == 'identity' else 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class Rendered:
+    """One serialized feed page, with its compressed variants built on first use.
+
+    The ETag is a hash of the JSON body, so it stays the same across reloads
+    until the page's data changes. Each content coding gets its own strong
+    tag (``"<hash>"``, ``"<hash>-gzip"``, ``"<hash>-br"``).
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self._encoded: Dict[str, bytes] = {'identity': body}
+        self._lock = threading.Lock()
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        if len(self.body) < COMPRESS_MIN_BYTES:
+            return 'identity'
+        return choose_encoding(accept_encoding)
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}"' if encoding == 'identity' else f'"{self.digest}-{encoding}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """If-None-Match check; any coding of the same body counts as a match"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            tag = tag[2:] if tag.startswith('W/') else tag
+            if tag.strip('"').split('-')[0] == self.digest:
+                return True
+        return False
+
+    def encode(self, encoding: str) -> bytes:
+        with self._lock:
+            if encoding not in self._encoded:
+                if encoding == 'br':
+                    self._encoded[encoding] = brotli.compress(self.body, quality=5)
+                else:
+                    self._encoded[encoding] = gzip.compress(self.body, compresslevel=6)
+            return self._encoded[encoding]
+
+
+class Snapshot:
+    """Every row of one article table, newest first, as of ``loaded_at``"""
+
+    def __init__(self, rows: List[Dict[str, Any]], version: Optional[int] = None):
+        self.rows = rows
+        # Table write version read just before the rows; None if unknown
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.columns = set()
+        for row in rows:
+            self.columns.update(row)
+        self.loaded_at = time.monotonic()
+        self.pages: 'OrderedDict[Tuple, Rendered]' = OrderedDict()
+        self.lock = threading.Lock()
+
+
+class FeedCache:
+    """In-process cache of the article feeds served by ``api.py``.
+
+    Each feed is read from Supabase once and kept until it is invalidated
+    (when a scrape job finishes), the table's write version moves on (checked
+    every ``version_check`` seconds), or it is older than ``ttl`` seconds.
+    Requested pages are rendered to JSON once per snapshot and served from
+    memory.
+    """
+
+    def __init__(self, client=None, ttl: float = ARTICLES_CACHE_TTL, entries: int = ARTICLES_CACHE_ENTRIES,
+                 version_check: float = ARTICLES_VERSION_CHECK):
+        self.client = client
+        self.ttl = ttl
+        self.version_check = version_check
+        self._versions_missing = False
+        self.entries = entries
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._locks = {feed: threading.Lock() for feed in FEEDS}
+        # Bumped on every invalidation so a load that raced with one is not kept
+        self._generation = {feed: 0 for feed in FEEDS}
+
+    def invalidate(self, feed: Optional[str] = None):
+        """Drop one feed, or all of them; the next request reloads from the database"""
+        for name in [feed] if feed else list(FEEDS):
+            self._generation[name] += 1
+            self._snapshots.pop(name, None)
+        logger.info(f"Invalidated article feed cache ({feed or 'all feeds'})")
+
+    def _version(self, feed: str) -> Optional[int]:
+        """Write version of a feed's table, or None where feed_cache_setup.sql is not applied"""
+        try:
+            response = (self.client or get_supabase()).table(VERSION_TABLE) \
+                .select('version') \
+                .eq('table_name', FEEDS[feed]) \
+                .execute()
+        except Exception as e:
+            if not self._versions_missing:
+                logger.warning(f"Cannot read {VERSION_TABLE}, feeds refresh only every {self.ttl:.0f}s: {e}")
+                self._versions_missing = True
+            return None
+        return response.data[0]['version'] if response.data else None
+
+    def _fresh(self, feed: str, snapshot: Optional[Snapshot]) -> bool:
+        if snapshot is None or time.monotonic() - snapshot.loaded_at >= self.ttl:
+            return False
+        if time.monotonic() - snapshot.checked_at < self.version_check:
+            return True
+        # Other requests keep using the snapshot while this one checks
+        snapshot.checked_at = time.monotonic()
+        version = self._version(feed)
+        if version != snapshot.version:
+            logger.info(f"{FEEDS[feed]} changed (version {snapshot.version} -> {version}), reloading")
+            return False
+        return True
+
+    def _load(self, feed: str) -> Snapshot:
+        table = FEEDS[feed]
+        client = self.client or get_supabase()
+        # Read first, so a write that lands during the load still triggers a reload
+        version = self._version(feed)
+        rows, offset = [], 0
+        start = time.monotonic()
+        while True:
+            response = client.table(table) \
+                .select(','.join(LIST_FIELDS)) \
+                .order('date', desc=True) \
+                .range(offset, offset + LOAD_PAGE_SIZE - 1) \
+                .execute()
+            rows.extend(response.data)
+            if len(response.data) < LOAD_PAGE_SIZE:
+                break
+            offset += LOAD_PAGE_SIZE
+        elapsed = time.monotonic() - start
+        metrics.FEED_LOAD_SECONDS.observe(elapsed, feed=feed)
+        logger.info(f"Loaded {len(rows)} rows from {table} into the feed cache in {elapsed:.2f}s")
+        return Snapshot(rows, version)
+
+    def snapshot(self, feed: str) -> Tuple[Snapshot, bool]:
+        """Current snapshot of a feed and whether it came from the cache"""
+        if feed not in FEEDS:
+            raise KeyError(feed)
+        snapshot = self._snapshots.get(feed)
+        if self._fresh(feed, snapshot):
+            return snapshot, True
+        # One loader per feed; concurrent requests wait for it instead of stampeding the database
+        with self._locks[feed]:
+            current = self._snapshots.get(feed)
+            if current is not None and current is not snapshot and self._fresh(feed, current):
+                return current, True
+            generation = self._generation[feed]
+            snapshot = self._load(feed)
+            if generation == self._generation[feed]:
+                self._snapshots[feed] = snapshot
+            return snapshot, False
+
+    def page(self, feed: str, limit: int = ARTICLES_PAGE_SIZE, offset: int = 0,
+             fields: Optional[str] = None, canonical: bool = False) -> Rendered:
+        """Rendered page of a feed.
+
+        ``fields`` is a comma-separated list of columns to return, out of
+        ``LIST_FIELDS``; by default all of them. With ``canonical`` only one
+        row per story cluster is listed. Raises ``KeyError`` for an unknown
+        feed and ``ValueError`` for an unknown field.
+        """
+        snapshot, cached = self.snapshot(feed)
+        if fields:
+            selected = [name.strip() for name in fields.split(',') if name.strip()]
+            unknown = [name for name in selected if name not in LIST_FIELDS]
+            if 'content' in unknown:
+                raise ValueError(f"content is not served in feed pages; request /articles/{feed}/<id> for it")
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        else:
+            selected = sorted(snapshot.columns)
+
+        key = (limit, offset, tuple(selected), canonical)
+        with snapshot.lock:
+            rendered = snapshot.pages.get(key)
+            if rendered is not None:
+                snapshot.pages.move_to_end(key)
+        if rendered is not None:
+            metrics.FEED_REQUESTS.inc(feed=feed, outcome='hit')
+            return rendered
+
+        rows = snapshot.rows
+        if canonical:
+            rows = [row for row in rows if row.get('is_canonical', True)]
+        items = [{name: row.get(name) for name in selected} for row in rows[offset:offset + limit]]
+        body = json.dumps({'items': items, 'total': len(rows), 'limit': limit, 'offset': offset},
+                          separators=(',', ':'), default=str).encode('utf-8')
+        rendered = Rendered(body)
+        with snapshot.lock:
+            snapshot.pages[key] = rendered
+            while len(snapshot.pages) > self.entries:
+                snapshot.pages.popitem(last=False)
+        metrics.FEED_REQUESTS.inc(feed=feed, outcome='render' if cached else 'load')
+        return rendered
+
+    def article(self, feed: str, article_id: int) -> Optional[Dict[str, Any]]:
+        """One article with its content, read from the database; None if there is no such row.
+
+        Raises ``KeyError`` for an unknown feed.
+        """
+        table = FEEDS[feed]
+        client = self.client or get_supabase()
+        response = client.table(table) \
+            .select(','.join(ARTICLE_FIELDS)) \
+            .eq('id', article_id) \
+            .limit(1) \
+            .execute()
+        metrics.FEED_REQUESTS.inc(feed=feed, outcome='article')
+        return response.data[0] if response.data else None
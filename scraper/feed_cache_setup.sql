@@ -0,0 +1,39 @@
+-- Write versions read by feed_cache.py, so the API's article cache reloads
+-- a feed soon after any process writes to its table (a scrape, a publish,
+-- backfill.py or a work queue worker), not only when its own jobs finish.
+-- Apply after supabase_setup.sql.
+
+CREATE TABLE IF NOT EXISTS article_versions (
+  table_name TEXT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Bump the table's version once per writing statement
+CREATE OR REPLACE FUNCTION bump_article_version() RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  INSERT INTO article_versions (table_name, version, updated_at)
+  VALUES (TG_TABLE_NAME, 1, now())
+  ON CONFLICT (table_name) DO UPDATE
+  SET version = article_versions.version + 1, updated_at = now();
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS mbs_articles_version ON mbs_articles;
+CREATE TRIGGER mbs_articles_version
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON mbs_articles
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_article_version();
+
+DROP TRIGGER IF EXISTS trending_articles_version ON trending_articles;
+CREATE TRIGGER trending_articles_version
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON trending_articles
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_article_version();
+
+-- Readable by the API's key; written only by the triggers
+REVOKE ALL ON TABLE article_versions FROM anon, authenticated;
+GRANT SELECT ON TABLE article_versions TO service_role;
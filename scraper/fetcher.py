@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import FETCH_SECONDS, FETCHES
+from request_policy import RETRY_STATUSES, RequestPolicy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+# Concurrency limits, overridable from the environment
+MAX_CONCURRENCY = int(os.getenv('SCRAPER_MAX_CONCURRENCY', '32'))
+PER_HOST_CONCURRENCY = int(os.getenv('SCRAPER_PER_HOST_CONCURRENCY', '4'))
+REQUEST_TIMEOUT = float(os.getenv('SCRAPER_REQUEST_TIMEOUT', '10'))
+# Most bytes read from one response; the rest of a larger page is never downloaded
+MAX_PAGE_BYTES = int(os.getenv('SCRAPER_MAX_PAGE_BYTES', str(5 * 1024 * 1024)))
+
+# Bytes read from the socket at a time
+READ_CHUNK_BYTES = 64 * 1024
+
+
+@dataclass
+class FetchResult:
+    """Outcome of a single page fetch."""
+    url: str
+    status: Optional[int] = None
+    text: Optional[str] = None
+    headers: Mapping[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    # True if the body was cut off at ``max_bytes``
+    truncated: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and 200 <= self.status < 300
+
+    @property
+    def not_modified(self) -> bool:
+        """True when a conditional request came back 304"""
+        return self.status == 304
+
+
+class ConcurrentFetcher:
+    """Fetch many pages over a shared keep-alive session.
+
+    A global cap bounds the number of requests in flight and a per-host cap
+    keeps any single site from being hit with more than a few connections.
+    Every request also goes through a ``RequestPolicy`` for per-host rate
+    limits, retries and circuit breaking; a fetcher lives for one run, and
+    so does its policy. Results of ``fetch_all`` are returned in the same
+    order as the input. Bodies are streamed and cut off at ``max_bytes``.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY,
+                 per_host: int = PER_HOST_CONCURRENCY,
+                 timeout: float = REQUEST_TIMEOUT,
+                 headers: Optional[Dict[str, str]] = None,
+                 policy: Optional[RequestPolicy] = None,
+                 cancel: Optional[threading.Event] = None,
+                 max_bytes: int = MAX_PAGE_BYTES):
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.max_bytes = max(1, max_bytes)
+        self.policy = policy or RequestPolicy()
+        # Once set, pending fetches fail fast instead of starting new requests
+        self.cancel = cancel or threading.Event()
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        # One connection pool per host, sized to the per-host cap so every
+        # in-flight request can reuse a kept-alive connection.
+        adapter = HTTPAdapter(pool_connections=self.max_concurrency, pool_maxsize=self.per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _slot_for(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host)
+                self._host_slots[host] = slot
+            return slot
+
+    def available(self, url: str) -> bool:
+        """False if the circuit for the URL's host is open for this run"""
+        return self.policy.allow(urlparse(url).netloc.lower())
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        """Fetch a single URL under the request policy. Never raises.
+
+        ``headers`` may carry conditional request validators; a 304 reply
+        is returned with ``not_modified`` set and no text. URLs on a host
+        whose circuit is open, or fetched after the run was cancelled, fail
+        straight away without a request.
+        """
+        host = urlparse(url).netloc.lower()
+        attempt = 0
+        while True:
+            if self.cancel.is_set():
+                return FetchResult(url=url, error="Run cancelled")
+            if not self.policy.allow(host):
+                FETCHES.inc(host=host, outcome='skipped')
+                return FetchResult(url=url, error=f"Circuit open for {host}")
+
+            self.policy.wait(host, self.cancel)
+            if self.cancel.is_set():
+                return FetchResult(url=url, error="Run cancelled")
+            with self._slot_for(host):
+                result = self._get(url, headers)
+            FETCH_SECONDS.observe(result.elapsed, host=host)
+            outcome = 'ok' if result.ok else 'not_modified' if result.not_modified else 'error'
+            FETCHES.inc(host=host, outcome=outcome)
+
+            # Only connection errors and retryable statuses count against the host; a
+            # client error such as a 404 or 451 says nothing about its health either way
+            failed = result.error is not None and (result.status is None or result.status in RETRY_STATUSES)
+            if failed:
+                self.policy.record(host, False, result.error)
+            elif result.error is None:
+                self.policy.record(host, True)
+            if not failed:
+                return result
+
+            delay = self.policy.retry_delay(host, result.status, result.headers, attempt)
+            if delay is None:
+                return result
+            attempt += 1
+            logger.debug(f"Retrying {url} in {delay:.2f}s (attempt {attempt + 1}): {result.error}")
+            self.cancel.wait(delay)
+
+    def _read(self, response: requests.Response):
+        """Text of a streamed response read up to ``max_bytes``, and whether it was cut off"""
+        chunks, size, truncated = [], 0, False
+        for chunk in response.iter_content(READ_CHUNK_BYTES):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > self.max_bytes:
+                truncated = True
+                break
+        body = b''.join(chunks)[:self.max_bytes]
+        del chunks
+        if truncated:
+            logger.warning(f"{response.url} is larger than {self.max_bytes} bytes, keeping the start of it")
+        # Decoded like response.text, which would need the whole body in memory first
+        return str(body, response.encoding or 'utf-8', errors='replace'), truncated
+
+    def _get(self, url: str, headers: Optional[Dict[str, str]]) -> FetchResult:
+        start = time.monotonic()
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                text, truncated = self._read(response) if response.status_code != 304 else (None, False)
+                return FetchResult(
+                    url=url,
+                    status=response.status_code,
+                    text=text,
+                    headers=response.headers,
+                    elapsed=time.monotonic() - start,
+                    truncated=truncated
+                )
+        except requests.RequestException as e:
+            if e.response is not None:
+                # Keep the headers so a Retry-After can be honoured
+                return FetchResult(url=url, status=e.response.status_code, headers=e.response.headers,
+                                   error=str(e), elapsed=time.monotonic() - start)
+            return FetchResult(url=url, error=str(e), elapsed=time.monotonic() - start)
+
+    def fetch_all(self, urls: List[str],
+                  headers: Optional[List[Optional[Dict[str, str]]]] = None) -> List[FetchResult]:
+        """Fetch all URLs concurrently, returning results in input order.
+
+        ``headers``, if given, holds per-URL request headers aligned with ``urls``.
+        """
+        if not urls:
+            return []
+        if headers is None:
+            headers = [None] * len(urls)
+
+        start = time.monotonic()
+        workers = min(self.max_concurrency, len(urls))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fetch') as executor:
+            results = list(executor.map(self.fetch, urls, headers))
+
+        failed = sum(1 for r in results if not (r.ok or r.not_modified))
+        logger.debug(f"Fetched {len(urls)} pages in {time.monotonic() - start:.2f}s "
+                     f"({failed} failed; {self.policy.summary()})")
+        return results
@@ -0,0 +1,159 @@
+import os
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+from fetcher import FetchResult
+from timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# "incremental" only writes new or changed rows; "full" truncates and reloads;
+# "publish" stages a complete snapshot and swaps it in atomically (see publish.py)
+SCRAPE_MODE = os.getenv("SCRAPE_MODE", "incremental")
+
+# Columns that make up the per-URL fingerprint stored alongside each row
+FINGERPRINT_COLUMNS = ['url', 'title', 'description', 'content_hash', 'etag', 'last_modified', 'backfilled']
+
+# Row fields that feed the content hash
+HASHED_FIELDS = ['title', 'description', 'category', 'content']
+
+# Page size when reading fingerprints
+PAGE_SIZE = 1000
+
+# URLs per delete request when expiring rows, kept small to bound the query string
+EXPIRE_BATCH = 100
+
+
+def content_hash(row: Dict[str, Any]) -> str:
+    """Stable hash over the fields of a row that matter to readers"""
+    digest = hashlib.sha256()
+    for name in HASHED_FIELDS:
+        digest.update((row.get(name) or '').encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class IncrementalSync:
+    """Change detection for one article table, keyed on ``url``.
+
+    Each row carries a fingerprint: a content hash plus the ETag and
+    Last-Modified validators from the article page. Known URLs whose listing
+    entry is unchanged are revalidated with a conditional GET, or skipped
+    outright when no validators were stored. Only rows whose hash changed
+    are written, and rows that left the listing are expired.
+    """
+
+    def __init__(self, client, table: str, timer: Optional[StageTimer] = None):
+        self.client = client
+        self.table = table
+        self.timer = timer or StageTimer()
+        self.known: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'new': 0, 'changed': 0, 'unchanged': 0, 'skipped': 0, 'empty': 0, 'expired': 0}
+        # plan() and has_changed() may run on different pipeline threads
+        self._lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def load(self):
+        """Read the stored fingerprint of every row in the table"""
+        self.known = {}
+        offset = 0
+        with self.timer.stage('fingerprints'):
+            while True:
+                response = self.client.table(self.table) \
+                    .select(','.join(FINGERPRINT_COLUMNS)) \
+                    .range(offset, offset + PAGE_SIZE - 1) \
+                    .execute()
+                for row in response.data:
+                    self.known[row['url']] = row
+                if len(response.data) < PAGE_SIZE:
+                    break
+                offset += PAGE_SIZE
+        logger.info(f"Loaded {len(self.known)} fingerprints from {self.table}")
+
+    def plan(self, article: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, str]]]:
+        """Decide whether an article page must be fetched.
+
+        Returns ``(fetch, headers)`` where ``headers`` holds conditional
+        request validators for a known URL.
+        """
+        known = self.known.get(article['url'])
+        if known is None or not known.get('content_hash'):
+            # New, or stored without a fingerprint (e.g. a promoted duplicate without content)
+            return True, None
+
+        listing_changed = (known.get('title') != article.get('title')
+                           or known.get('description') != article.get('description'))
+        if listing_changed:
+            return True, None
+
+        headers = {}
+        if known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        if known.get('last_modified'):
+            headers['If-Modified-Since'] = known['last_modified']
+        if not headers:
+            # Nothing to revalidate with and the listing is unchanged
+            self._count('skipped')
+            return False, None
+        return True, headers
+
+    def not_modified(self):
+        """Record a known URL whose conditional GET came back 304"""
+        self._count('skipped')
+
+    def fingerprint(self, row: Dict[str, Any], result: Optional[FetchResult] = None) -> Dict[str, Any]:
+        """Attach the content hash and HTTP validators to a row"""
+        row['content_hash'] = content_hash(row)
+        headers = result.headers if result is not None and result.ok else {}
+        row['etag'] = headers.get('ETag')
+        row['last_modified'] = headers.get('Last-Modified')
+        return row
+
+    def has_changed(self, row: Dict[str, Any]) -> bool:
+        """True if a fingerprinted row is new or differs from the stored one.
+
+        A row without content (its fetch failed or nothing was extracted) is
+        never a change: the stored row is kept and the page is tried again
+        on the next run.
+        """
+        if not row.get('content'):
+            self._count('empty')
+            logger.warning(f"No content for {row['url']}, keeping the stored row")
+            return False
+        known = self.known.get(row['url'])
+        if known is None:
+            self._count('new')
+            return True
+        if known.get('content_hash') != row['content_hash']:
+            self._count('changed')
+            return True
+        # Refresh stored validators if only those moved
+        if known.get('etag') != row['etag'] or known.get('last_modified') != row['last_modified']:
+            self._count('changed')
+            return True
+        self._count('unchanged')
+        return False
+
+    def expire(self, listed_urls: Iterable[str]):
+        """Delete rows whose URL no longer appears in the listing.
+
+        Rows loaded by a backfill are history, not part of the listing, and are kept.
+        """
+        listed = set(listed_urls)
+        if not listed:
+            # An empty listing almost always means the scrape failed
+            logger.warning(f"Empty listing, not expiring rows in {self.table}")
+            return
+        stale = [url for url, known in self.known.items() if url not in listed and not known.get('backfilled')]
+        with self.timer.stage('expire'):
+            for i in range(0, len(stale), EXPIRE_BATCH):
+                batch = stale[i:i + EXPIRE_BATCH]
+                self.client.table(self.table).delete().in_('url', batch).execute()
+        self.stats['expired'] = len(stale)
+
+    def summary(self) -> str:
+        return ', '.join(f"{key}={value}" for key, value in self.stats.items())
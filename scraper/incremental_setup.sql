@@ -0,0 +1,17 @@
+-- Per-URL fingerprint columns used by incremental scraping
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS etag TEXT;
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS last_modified TEXT;
+
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS etag TEXT;
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS last_modified TEXT;
+
+-- Rows loaded by backfill.py; incremental runs never expire them
+ALTER TABLE trending_articles ADD COLUMN IF NOT EXISTS backfilled BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE mbs_articles ADD COLUMN IF NOT EXISTS backfilled BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE IF EXISTS trending_articles_staging ADD COLUMN IF NOT EXISTS backfilled BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE IF EXISTS mbs_articles_staging ADD COLUMN IF NOT EXISTS backfilled BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Upserts are keyed on url, which must be unique in both tables
+CREATE UNIQUE INDEX IF NOT EXISTS mbs_articles_url_key ON mbs_articles(url);
@@ -0,0 +1,220 @@
+import os
+import time
+import uuid
+import queue
+import logging
+import importlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from driver_pool import get_pool
+from cancellation import RunCancelled, start_deadline
+
+logger = logging.getLogger(__name__)
+
+# Number of background worker threads and how many finished jobs to remember
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '1'))
+JOB_HISTORY = int(os.getenv('JOB_HISTORY', '100'))
+# Cancel a run that is still going after this many minutes (0 disables)
+JOB_DEADLINE_MINUTES = float(os.getenv('JOB_DEADLINE_MINUTES', '60'))
+# Backfills resume from their checkpoint, so by default they run to completion
+BACKFILL_DEADLINE_MINUTES = float(os.getenv('BACKFILL_DEADLINE_MINUTES', '0'))
+# Listing pages a backfill reads unless told otherwise; here rather than in
+# backfill.py so the API can use it without importing the database client
+BACKFILL_MAX_PAGES = int(os.getenv('BACKFILL_MAX_PAGES', '50'))
+
+# Scrapers that can be triggered as jobs, by name, as "module:class". The
+# modules are imported on first run so the API starts without them.
+SCRAPERS: Dict[str, str] = {
+    'mbs': 'mbs_scraper:MBSScraper',
+    'trending': 'trending_scraper:TrendingScraper',
+}
+
+
+def load_scraper(name: str) -> Callable:
+    """Scraper class registered under ``name``"""
+    module, _, attr = SCRAPERS[name].partition(':')
+    return getattr(importlib.import_module(module), attr)
+
+
+@dataclass
+class Job:
+    """A queued or finished scrape run or backfill."""
+    id: str
+    scraper: str
+    kind: str = 'scrape'
+    params: Dict[str, Any] = field(default_factory=dict)
+    status: str = 'queued'
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    stages: Dict[str, float] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    # Seconds the run may take before it is cancelled; None for no limit
+    deadline: Optional[float] = None
+    cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def to_dict(self) -> Dict:
+        duration = None
+        if self.started_at is not None:
+            duration = (self.finished_at or time.time()) - self.started_at
+        return {
+            'id': self.id,
+            'scraper': self.scraper,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'duration': duration,
+            'error': self.error,
+            'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            'result': self.result,
+        }
+
+
+def run_scraper(job: Job):
+    """Run one scraper to completion or its deadline, recording its stage timings on the job"""
+    with load_scraper(job.scraper)(pool=get_pool(), cancel=job.cancel) as scraper:
+        timer = start_deadline(job.cancel, job.deadline)
+        try:
+            scraper.update_database()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            job.stages = dict(scraper.timer.stages)
+
+
+def run_backfill_job(job: Job):
+    """Backfill one scraper from its checkpoint, recording the final state on the job"""
+    from backfill import run_backfill
+
+    since = job.params.get('since')
+    timer = start_deadline(job.cancel, job.deadline)
+    try:
+        scraper, job.result = run_backfill(
+            job.scraper,
+            since=datetime.strptime(since, '%Y-%m-%d') if since else None,
+            max_pages=job.params['max_pages'],
+            restart=job.params.get('restart', False),
+            pool=get_pool(),
+            cancel=job.cancel,
+        )
+        job.stages = dict(scraper.timer.stages)
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+
+RUNNERS: Dict[str, Callable[[Job], None]] = {
+    'scrape': run_scraper,
+    'backfill': run_backfill_job,
+}
+
+
+def run_job(job: Job):
+    RUNNERS[job.kind](job)
+
+
+class JobQueue:
+    """Run scrape jobs on background threads, off the event loop.
+
+    Triggering a scraper that already has a queued or running job returns
+    that job instead of starting a second run.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, history: int = JOB_HISTORY,
+                 runner: Callable[[Job], None] = run_job,
+                 deadline_minutes: float = JOB_DEADLINE_MINUTES):
+        self.workers = max(1, workers)
+        self.history = history
+        self.runner = runner
+        self.deadline = deadline_minutes * 60 or None
+        self.backfill_deadline = BACKFILL_DEADLINE_MINUTES * 60 or None
+
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._listeners: List[Callable[[Job], None]] = []
+
+    def on_finish(self, listener: Callable[[Job], None]):
+        """Call ``listener(job)`` on the worker thread whenever a job ends, whatever its status"""
+        self._listeners.append(listener)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Let running jobs finish, then stop the workers"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, scraper: str, kind: str = 'scrape',
+               params: Optional[Dict[str, Any]] = None) -> Tuple[Job, bool]:
+        """Queue a run of ``scraper``; returns the job and whether it was coalesced"""
+        if scraper not in SCRAPERS:
+            raise KeyError(scraper)
+        with self._lock:
+            for job in self._jobs.values():
+                if job.scraper == scraper and job.kind == kind and job.active:
+                    return job, True
+            deadline = self.backfill_deadline if kind == 'backfill' else self.deadline
+            job = Job(id=uuid.uuid4().hex, scraper=scraper, kind=kind, params=params or {}, deadline=deadline)
+            self._jobs[job.id] = job
+            self._trim()
+        self._queue.put(job)
+        logger.info(f"Queued {scraper} {kind} as job {job.id}")
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond the history limit
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = 'running'
+            job.started_at = time.time()
+            logger.info(f"Starting job {job.id} ({job.scraper} {job.kind})")
+            try:
+                self.runner(job)
+                job.status = 'succeeded'
+            except RunCancelled:
+                logger.warning(f"Job {job.id} ({job.scraper}) cancelled: deadline exceeded")
+                job.status = 'cancelled'
+                job.error = 'Deadline exceeded'
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.scraper}) failed: {e}")
+                job.status = 'failed'
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                logger.info(f"Finished job {job.id} ({job.scraper} {job.kind}): {job.status}")
+                for listener in self._listeners:
+                    try:
+                        listener(job)
+                    except Exception as e:
+                        logger.error(f"Job listener failed for {job.id}: {e}")
@@ -1,24 +1,25 @@
 import os
-from datetime import datetime, timedelta
-import time
-import requests
-from bs4 import BeautifulSoup
-from supabase import create_client, Client
-from typing import Dict, List
+from datetime import datetime
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
 import logging
-from ratelimit import limits, sleep_and_retry
 from dotenv import load_dotenv
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import WebDriverException
 import subprocess
-import urllib.request
-import zipfile
-import os
+from fetcher import ConcurrentFetcher, FetchResult
+from incremental import SCRAPE_MODE, IncrementalSync
+from db_writer import BatchWriter
+from publish import SnapshotPublisher
+from dedupe import Deduplicator
+from content_limits import limit_content
+from pipeline import Pipeline
+from timing import StageTimer
+from cancellation import RunCancelled, raise_if_cancelled
+import metrics
+import extractors
+from extractors import parse_html, strainer_for
+from driver_pool import DriverPool, get_pool, shutdown_pool
+from supabase_client import get_supabase
 
 # Load environment variables
 load_dotenv()
@@ -27,15 +28,11 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Supabase setup
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
-
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise Exception("Missing Supabase credentials. Please check your .env file.")
+# Fetch pages over plain HTTP before falling back to headless Chrome
+HTTP_FIRST = os.getenv("MBS_HTTP_FIRST", "true").lower() != "false"
 
-logger.info(f"Connecting to Supabase at {SUPABASE_URL}")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Statuses meaning a listing page does not exist, i.e. we are past the last one
+MISSING_PAGE_STATUSES = (404, 410)
 
 def get_chrome_version():
     try:
@@ -50,196 +47,408 @@ def get_chrome_version():
 
 class MBSScraper:
     BASE_URL = "https://www.mortgagenewsdaily.com/topic/mbs"
+    TABLE = "mbs_articles"
+    # Byline format on the listing, e.g. "Apr 1 2025, 4:00 PM"
+    DATE_FORMAT = "%b %d %Y, %I:%M %p"
     
-    def __init__(self):
-        try:
-            chrome_options = Options()
-            chrome_options.add_argument("--headless=new")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--disable-extensions")
-            chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-            
-            # Download Chrome for Testing
-            logger.info("Setting up Chrome for Testing...")
-            self.driver = webdriver.Chrome(options=chrome_options)
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize Chrome WebDriver: {str(e)}")
-            raise
+    def __init__(self, http_first: bool = HTTP_FIRST, pool: Optional[DriverPool] = None,
+                 base_url: Optional[str] = None, cancel: Optional[threading.Event] = None):
+        # Pages are fetched over plain HTTP first; a pooled Chrome driver is
+        # only borrowed when the static HTML lacks the expected article markup.
+        self.http_first = http_first
+        self.base_url = base_url or self.BASE_URL
+        self.pool = pool or get_pool()
+        # Set by a scheduler deadline; checked between articles
+        self.cancel = cancel or threading.Event()
+        self.fetcher = ConcurrentFetcher(cancel=self.cancel)
+        self.timer = StageTimer(scraper='mbs')
+        self.counts: Dict[str, int] = {}
+        self.extractor = extractors.get_extractor("Mortgage News Daily")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
-    def __del__(self):
-        if hasattr(self, 'driver'):
+    def close(self):
+        """Release the HTTP session; pooled drivers are owned by the pool"""
+        self.fetcher.close()
+    
+    def fetch_static(self, url: str) -> Optional[str]:
+        """Fetch a page over plain HTTP, returning None if it could not be fetched"""
+        result = self.fetcher.fetch(url)
+        if not result.ok:
+            logger.warning(f"HTTP fetch failed for {url}: {result.error}")
+            return None
+        return result.text
+    
+    def parse_article_list(self, html: str) -> Optional[List[Dict]]:
+        """Parse article listings from the MBS page, or None if the markup is missing"""
+        # Only the article blocks are parsed; the rest of the page is skipped
+        soup = parse_html(html, strainer_for('div', 'article'))
+        
+        # Find all article blocks
+        article_blocks = soup.find_all('div', class_='article')
+        if not article_blocks or not soup.find('div', class_='article-body'):
+            soup.decompose()
+            return None
+        logger.debug(f"Found {len(article_blocks)} article blocks")
+        
+        articles = []
+        for article in article_blocks:
             try:
-                self.driver.quit()
+                # Get article title and URL
+                title_elem = article.find('div', class_='article-title').find('a')
+                if not title_elem:
+                    continue
+                    
+                title = title_elem.get_text(strip=True)
+                url = title_elem.get('href', '')
+                if not url.startswith('http'):
+                    url = urljoin(self.base_url, url)
+                
+                # Get article date
+                date_elem = article.find('div', class_='article-byline')
+                date_text = date_elem.get_text(strip=True) if date_elem else ""
+                
+                # Get article description - try multiple class combinations
+                desc_elem = None
+                for class_name in ['article-body hidden-xs', 'article-body', 'article-content']:
+                    desc_elem = article.find('div', class_=class_name)
+                    if desc_elem and desc_elem.get_text(strip=True):
+                        break
+                
+                description = desc_elem.get_text(strip=True) if desc_elem else ""
+                
+                logger.debug(f"Found article: {title}")
+                logger.debug(f"Description: {description[:100]}...")  # Log first 100 chars of description
+                
+                # Only append if we have both title and description
+                if title and description:
+                    articles.append({
+                        'title': title,
+                        'url': url,
+                        'date': date_text,
+                        'description': description
+                    })
             except Exception as e:
-                logger.error(f"Error closing WebDriver: {str(e)}")
+                logger.error(f"Error processing individual article block: {e}")
+                continue
+        
+        # Break the tree's reference cycles so the page is freed now, not at the next GC
+        soup.decompose()
+        return articles
+    
+    def parse_article_content(self, html: str) -> Optional[str]:
+        """Extract paragraph text from an article page, or None if the markup is missing"""
+        return self.extractor.extract(html)
+    
+    def page_url(self, page: int) -> str:
+        """Listing URL for a page of the MBS topic, counting from 1"""
+        if page <= 1:
+            return self.base_url
+        separator = '&' if '?' in self.base_url else '?'
+        return f"{self.base_url}{separator}page={page}"
     
-    def scrape_article_list(self) -> List[Dict]:
-        """Scrape the main MBS page for article listings using Selenium"""
+    def listing_date(self, article: Dict) -> Optional[datetime]:
+        """Publication date from a listing's byline, if it can be parsed"""
+        try:
+            return datetime.strptime(article.get('date', ''), self.DATE_FORMAT)
+        except ValueError:
+            return None
+    
+    def scrape_article_list(self, url: Optional[str] = None) -> List[Dict]:
+        """Scrape an MBS listing page (the first by default) for articles, or [] if it fails"""
+        url = url or self.base_url
         try:
             logger.info("Starting to scrape article list")
-            self.driver.get(self.BASE_URL)
-            logger.info(f"Loading URL: {self.BASE_URL}")
-            
-            # Wait for the news article list to load
-            WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "article"))
-            )
-            
-            # Wait specifically for article descriptions to load
-            WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "article-body"))
-            )
-            
-            # Let the page fully load and render
-            time.sleep(8)  # Increased from 5 to 8 seconds
-            
-            # Get the page source and parse with BeautifulSoup
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            articles = []
-            
-            # Find all article blocks
-            article_blocks = soup.find_all('div', class_='article')
-            logger.info(f"Found {len(article_blocks)} article blocks")
-            
-            for article in article_blocks:
-                try:
-                    # Get article title and URL
-                    title_elem = article.find('div', class_='article-title').find('a')
-                    if not title_elem:
-                        continue
-                        
-                    title = title_elem.get_text(strip=True)
-                    url = title_elem.get('href', '')
-                    if not url.startswith('http'):
-                        url = f"https://www.mortgagenewsdaily.com{url}"
-                    
-                    # Get article date
-                    date_elem = article.find('div', class_='article-byline')
-                    date_text = date_elem.get_text(strip=True) if date_elem else ""
-                    
-                    # Get article description - try multiple class combinations
-                    desc_elem = None
-                    for class_name in ['article-body hidden-xs', 'article-body', 'article-content']:
-                        desc_elem = article.find('div', class_=class_name)
-                        if desc_elem and desc_elem.get_text(strip=True):
-                            break
-                    
-                    description = desc_elem.get_text(strip=True) if desc_elem else ""
-                    
-                    logger.info(f"Found article: {title}")
-                    logger.info(f"Description: {description[:100]}...")  # Log first 100 chars of description
-                    
-                    # Only append if we have both title and description
-                    if title and description:
-                        articles.append({
-                            'title': title,
-                            'url': url,
-                            'date': date_text,
-                            'description': description
-                        })
-                except Exception as e:
-                    logger.error(f"Error processing individual article block: {e}")
-                    continue
-            
-            logger.info(f"Successfully scraped {len(articles)} articles")
-            return articles
-            
+            return self.scrape_listing_page(url)
         except Exception as e:
             logger.error(f"Error scraping article list: {e}")
             return []
 
-    def scrape_article_content(self, url: str) -> str:
-        """Scrape the content from an individual article page using Selenium"""
+    def scrape_article_content(self, url: str, prefetched: Optional[FetchResult] = None) -> str:
+        """Scrape the content from an individual article page, using Selenium only if needed"""
         try:
-            logger.info(f"Scraping content from {url}")
-            self.driver.get(url)
+            logger.debug(f"Scraping content from {url}")
             
-            # Wait for content to load with more specific class
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "article-body"))
-            )
+            content = None
+            if self.http_first:
+                if prefetched is not None:
+                    html = prefetched.text if prefetched.ok else None
+                    # Only the extracted text is kept; drop the page with this call
+                    prefetched.text = None
+                else:
+                    html = self.fetch_static(url)
+                if html:
+                    with self.timer.stage('parse'):
+                        content = self.parse_article_content(html)
             
-            # Let the page fully load
-            time.sleep(2)
+            if not content:
+                # Don't fall back to the browser for a run that is being stopped
+                raise_if_cancelled(self.cancel)
             
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+            if not content and not self.fetcher.available(url):
+                # The host keeps failing; a browser would only wait out the same errors
+                logger.warning(f"Skipping {url}, its host is failing this run")
+                return ""
             
-            # Try different possible content div classes
-            content_div = None
-            for class_name in ['article-body', 'article-content', 'article-text']:
-                content_div = soup.find('div', class_=class_name)
-                if content_div:
-                    break
+            if not content:
+                html = self.pool.render(url, "article-body", 10)
+                with self.timer.stage('parse'):
+                    content = self.parse_article_content(html)
             
-            if not content_div:
+            if content is None:
                 logger.warning(f"No content div found for {url}")
                 return ""
-                
-            # Extract only paragraph text
-            paragraphs = content_div.find_all('p')
-            logger.info(f"Found {len(paragraphs)} paragraphs")
-            content = ' '.join(p.get_text(strip=True) for p in paragraphs)
             
             return content
             
+        except RunCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error scraping article content: {e}")
             return ""
 
+    def scrape_listing_page(self, url: str) -> List[Dict]:
+        """Articles listed on one listing page, using Selenium only if needed.
+        
+        Returns [] only when the page verifiably lists nothing: it does not
+        exist, or it rendered without any articles. Raises if the page could
+        not be loaded or its markup is missing.
+        """
+        logger.info(f"Loading URL: {url}")
+        
+        articles = None
+        if self.http_first:
+            result = self.fetcher.fetch(url)
+            if result.status in MISSING_PAGE_STATUSES:
+                logger.info(f"No listing page at {url} ({result.status})")
+                return []
+            if result.ok:
+                with self.timer.stage('parse'):
+                    articles = self.parse_article_list(result.text)
+            else:
+                logger.warning(f"HTTP fetch failed for {url}: {result.error}")
+            if not articles:
+                logger.info("Article markup missing from static HTML, falling back to Selenium")
+        
+        if not articles:
+            html = self.pool.render(url, "article-body", 20)
+            with self.timer.stage('parse'):
+                articles = self.parse_article_list(html)
+            if articles is None:
+                raise ValueError(f"No article markup in the rendered page at {url}")
+        
+        logger.info(f"Successfully scraped {len(articles)} articles")
+        return articles
+
+    def iter_listings(self, pages: int = 1) -> Iterator[Dict]:
+        """Yield articles from the first ``pages`` listing pages, stopping at an empty page.
+        
+        A page that cannot be read raises, so a failed listing never looks complete.
+        """
+        for page in range(1, pages + 1):
+            articles = self.scrape_listing_page(self.page_url(page))
+            if not articles:
+                return
+            yield from articles
+
+    def fetch_page(self, article: Dict, headers: Optional[Dict[str, str]] = None) -> Optional[FetchResult]:
+        """HTTP fetch of an article page, or None without ``http_first``"""
+        return self.fetcher.fetch(article['url'], headers=headers) if self.http_first else None
+
+    def fetch_row_results(self, articles: List[Dict],
+                          headers: Optional[List[Optional[Dict[str, str]]]] = None) -> List[Tuple[Optional[Dict], Optional[FetchResult]]]:
+        """Fetch article pages concurrently, in listing order.
+        
+        Returns each article's row (None if a conditional GET came back 304)
+        alongside the HTTP fetch result, which is None without ``http_first``.
+        """
+        if self.http_first:
+            results = self.fetcher.fetch_all([article['url'] for article in articles], headers)
+        else:
+            results = [None] * len(articles)
+        fetched = []
+        for article, result in zip(articles, results):
+            raise_if_cancelled(self.cancel)
+            if result is not None and result.not_modified:
+                fetched.append((None, result))
+                continue
+            content = self.scrape_article_content(article['url'], prefetched=result)
+            self.counts['fetched'] = self.counts.get('fetched', 0) + 1
+            fetched.append((self.build_row(article, content, result), result))
+        return fetched
+
+    def fetch_rows(self, articles: List[Dict]) -> List[Dict]:
+        """Fetch article pages concurrently and build their rows, in listing order"""
+        return [row for row, _ in self.fetch_row_results(articles)]
+
     def truncate_table(self):
         """Truncate the mbs_articles table before starting new scrape"""
         try:
             logger.info("Truncating mbs_articles table")
-            result = supabase.table('mbs_articles').delete().neq('id', 0).execute()
+            result = get_supabase().table('mbs_articles').delete().neq('id', 0).execute()
             logger.info("Table truncated successfully")
         except Exception as e:
             logger.error(f"Error truncating table: {e}")
             raise e
 
-    def update_database(self):
-        """Update Supabase with fresh article data"""
+    def build_row(self, article: Dict, content: str, result: Optional[FetchResult] = None) -> Dict:
+        """Database row for a scraped article, with the stored content limit applied"""
+        page_truncated = result is not None and result.truncated
+        return limit_content({
+            'title': article['title'],
+            'url': article['url'],
+            'description': article['description'],
+            'content': content,
+            'category': 'Mortgage',
+            'date': datetime.now().isoformat(),
+            'last_scraped': datetime.now().isoformat(),
+            'is_generating': False
+        }, page_truncated=page_truncated)
+
+    def update_database(self, mode: str = SCRAPE_MODE):
+        """Update Supabase with fresh article data, recording run metrics"""
+        self.counts = {'listed': 0, 'fetched': 0, 'written': 0, 'failed': 0, 'duplicates': 0}
+        with metrics.track_run('mbs', mode, self.timer, self.counts):
+            if mode == "incremental":
+                return self.update_incremental()
+            if mode == "publish":
+                return self.update_publish()
+            return self.update_full()
+
+    def update_full(self):
+        """Truncate the table, then stream a fresh set of articles into it"""
         try:
             logger.info("Starting database update")
             
             # Truncate table first
-            self.truncate_table()
+            with self.timer.stage('truncate'):
+                self.truncate_table()
+            raise_if_cancelled(self.cancel)
             
-            # Get articles from main page
-            articles = self.scrape_article_list()
+            sync = IncrementalSync(get_supabase(), 'mbs_articles', timer=self.timer)
+            dedupe = Deduplicator(get_supabase(), timer=self.timer, exclude='mbs_articles')
+            dedupe.load()
             
-            for article in articles:
-                try:
-                    # Always scrape content since we're starting fresh
-                    logger.info(f"Processing article: {article['title']}")
-                    content = self.scrape_article_content(article['url'])
-                    
-                    # Insert into database
-                    logger.info("Inserting article into database")
-                    result = supabase.table('mbs_articles').insert({
-                        'title': article['title'],
-                        'url': article['url'],
-                        'description': article['description'],
-                        'content': content,
-                        'category': 'Mortgage',
-                        'date': datetime.now().isoformat(),
-                        'last_scraped': datetime.now().isoformat(),
-                        'is_generating': False
-                    }).execute()
-                    logger.info(f"Insert result: {result}")
-                except Exception as e:
-                    logger.error(f"Error processing article {article['url']}: {e}")
-                    continue
+            def parse(article, result):
+                # Always scrape content since we're starting fresh
+                content = self.scrape_article_content(article['url'], prefetched=result)
+                self.counts['fetched'] += 1
+                return sync.fingerprint(self.build_row(article, content, result))
+            
+            pipeline = Pipeline('mbs', timer=self.timer, cancel=self.cancel)
+            writer = BatchWriter(get_supabase(), 'mbs_articles', timer=self.timer)
+            try:
+                with writer:
+                    pipeline.run(self.iter_listings(), self.fetch_page, parse, writer, prepare=dedupe.assign)
+            finally:
+                # Recorded after the final flush, even when the run is cancelled
+                self.counts['listed'] = pipeline.stats['listed']
+                self.counts['duplicates'] = dedupe.stats['duplicates']
+                self.counts['written'] = writer.rows_written
+                self.counts['failed'] = writer.rows_failed
+            logger.info(f"Saved {writer.summary()}")
+            # Stories whose canonical row was truncated away need a new one
+            dedupe.promote_orphans()
                     
+        except RunCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Error updating database: {e}")
+
+    def update_publish(self):
+        """Stream a complete snapshot into staging, then swap it in if it validates"""
+        logger.info("Starting snapshot publish of mbs_articles")
+        
+        sync = IncrementalSync(get_supabase(), 'mbs_articles', timer=self.timer)
+        dedupe = Deduplicator(get_supabase(), timer=self.timer, exclude='mbs_articles')
+        dedupe.load()
+        publisher = SnapshotPublisher(get_supabase(), 'mbs_articles', timer=self.timer)
+        
+        def parse(article, result):
+            content = self.scrape_article_content(article['url'], prefetched=result)
+            self.counts['fetched'] += 1
+            return sync.fingerprint(self.build_row(article, content, result))
+        
+        pipeline = Pipeline('mbs', timer=self.timer, cancel=self.cancel)
+        writer = publisher.begin()
+        try:
+            pipeline.run(self.iter_listings(), self.fetch_page, parse, writer,
+                         prepare=lambda row: publisher.accept(dedupe.assign(row)))
+        finally:
+            self.counts['listed'] = pipeline.stats['listed']
+            self.counts['duplicates'] = dedupe.stats['duplicates']
+            self.counts['failed'] = publisher.rows_rejected
+        
+        # Raises PublishError, leaving the live table as it was, if the snapshot is rejected
+        self.counts['written'] = publisher.swap(writer)
+        dedupe.promote_orphans()
+
+    def update_incremental(self):
+        """Write only new or changed articles and expire ones that left the listing"""
+        try:
+            logger.info("Starting incremental database update")
+            
+            sync = IncrementalSync(get_supabase(), 'mbs_articles', timer=self.timer)
+            sync.load()
+            dedupe = Deduplicator(get_supabase(), timer=self.timer)
+            dedupe.load()
+            listed = []
+            
+            def listings():
+                # Only fetch new URLs, changed listings and known pages that can be revalidated
+                for article in self.iter_listings():
+                    listed.append(article['url'])
+                    should_fetch, headers = sync.plan(article)
+                    if should_fetch:
+                        yield article, headers
+            
+            def parse(item, result):
+                article, _ = item
+                if result is not None and result.not_modified:
+                    sync.not_modified()
+                    return None
+                content = self.scrape_article_content(article['url'], prefetched=result)
+                self.counts['fetched'] += 1
+                row = sync.fingerprint(self.build_row(article, content, result), result)
+                return row if sync.has_changed(row) else None
+            
+            pipeline = Pipeline('mbs', timer=self.timer, cancel=self.cancel)
+            writer = BatchWriter(get_supabase(), 'mbs_articles', timer=self.timer)
+            try:
+                with writer:
+                    pipeline.run(listings(), lambda item: self.fetch_page(*item), parse, writer, prepare=dedupe.assign)
+            finally:
+                # Recorded after the final flush, even when the run is cancelled
+                self.counts['listed'] = len(listed)
+                self.counts['duplicates'] = dedupe.stats['duplicates']
+                self.counts['written'] = writer.rows_written
+                self.counts['failed'] = writer.rows_failed
+            logger.info(f"Saved {writer.summary()}")
+            
+            if not listed:
+                logger.error("No articles found, leaving mbs_articles untouched")
+            elif pipeline.listing_complete:
+                sync.expire(listed)
+                dedupe.promote_orphans()
+            self.counts.update(sync.stats)
+            logger.info(f"Incremental update of mbs_articles finished: {sync.summary()}")
+            
+        except RunCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error updating database: {e}")
 
 def main():
     logger.info("Starting MBS scraper")
-    scraper = MBSScraper()
-    scraper.update_database()
+    try:
+        with MBSScraper() as scraper:
+            scraper.update_database()
+    finally:
+        shutdown_pool()
     logger.info("Scraper finished")
 
 if __name__ == "__main__":
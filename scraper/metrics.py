@@ -0,0 +1,194 @@
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+from cancellation import RunCancelled
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds, from a fast parse up to a stuck page load
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                bucket_labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'scraper_stage_seconds', 'Time spent in each stage of a scrape run', ['scraper', 'stage'])
+RUN_SECONDS = REGISTRY.histogram(
+    'scraper_run_seconds', 'Wall time of a whole scrape run', ['scraper', 'mode'])
+RUNS = REGISTRY.counter(
+    'scraper_runs_total', 'Scrape runs by outcome', ['scraper', 'mode', 'status'])
+ARTICLES = REGISTRY.counter(
+    'scraper_articles_total', 'Articles seen per run step', ['scraper', 'outcome'])
+FETCH_SECONDS = REGISTRY.histogram(
+    'scraper_fetch_seconds', 'HTTP fetch latency per host', ['host'])
+FETCHES = REGISTRY.counter(
+    'scraper_fetches_total', 'HTTP fetches per host by outcome', ['host', 'outcome'])
+FETCH_RETRIES = REGISTRY.counter(
+    'scraper_fetch_retries_total', 'Retried HTTP fetches per host', ['host'])
+BREAKER_TRIPS = REGISTRY.counter(
+    'scraper_breaker_trips_total', 'Hosts skipped for the rest of a run after repeated failures', ['host'])
+PARSE_SECONDS = REGISTRY.histogram(
+    'scraper_parse_seconds', 'Content extraction time per source', ['source', 'backend'])
+DRIVER_STARTUP_SECONDS = REGISTRY.histogram(
+    'scraper_driver_startup_seconds', 'Time to start a headless Chrome driver')
+BROWSER_WAIT_SECONDS = REGISTRY.histogram(
+    'scraper_browser_wait_seconds', 'Time spent loading a page and waiting for it to render', ['element'])
+DB_WRITE_SECONDS = REGISTRY.histogram(
+    'scraper_db_write_seconds', 'Latency of one bulk write', ['table'])
+DB_ROWS = REGISTRY.counter(
+    'scraper_db_rows_total', 'Rows written per table by outcome', ['table', 'outcome'])
+DB_RETRIES = REGISTRY.counter(
+    'scraper_db_retries_total', 'Retried database writes', ['table'])
+WORK_TASKS = REGISTRY.counter(
+    'scraper_work_tasks_total', 'Work queue tasks processed by this worker, by outcome', ['scraper', 'outcome'])
+FEED_REQUESTS = REGISTRY.counter(
+    'scraper_feed_requests_total', 'Article feed API requests by cache outcome', ['feed', 'outcome'])
+FEED_LOAD_SECONDS = REGISTRY.histogram(
+    'scraper_feed_load_seconds', 'Time to load an article table into the feed cache', ['feed'])
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+@contextmanager
+def track_run(scraper: str, mode: str, timer, counts: Dict[str, int]):
+    """Record run metrics and log a single summary line when the run ends"""
+    start = time.monotonic()
+    status = 'failed'
+    try:
+        yield
+        status = 'succeeded'
+    except RunCancelled:
+        status = 'cancelled'
+        raise
+    finally:
+        elapsed = time.monotonic() - start
+        RUN_SECONDS.observe(elapsed, scraper=scraper, mode=mode)
+        RUNS.inc(scraper=scraper, mode=mode, status=status)
+        for outcome, count in counts.items():
+            ARTICLES.inc(count, scraper=scraper, outcome=outcome)
+        totals = ' '.join(f"{outcome}={count}" for outcome, count in counts.items())
+        logger.info(f"{scraper} run {status} in {elapsed:.2f}s ({mode}): {totals} | {timer.summary()}")
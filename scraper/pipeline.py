@@ -0,0 +1,270 @@
+import os
+import queue
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from cancellation import RunCancelled
+from db_writer import BatchWriter
+from timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Items buffered between two stages; bounds memory whatever the list size
+PIPELINE_BUFFER = int(os.getenv('PIPELINE_BUFFER', '16'))
+# Threads running the fetch stage; the fetcher's per-host limits still apply
+PIPELINE_FETCHERS = int(os.getenv('PIPELINE_FETCHERS', '16'))
+# Seconds a row may wait for its batch to fill before a partial batch is written
+PIPELINE_FLUSH_SECONDS = float(os.getenv('PIPELINE_FLUSH_SECONDS', '5'))
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+
+def _label(item) -> str:
+    if isinstance(item, tuple) and item:
+        item = item[0]
+    return item.get('url', str(item)) if isinstance(item, dict) else str(item)
+
+
+class _Aborted(Exception):
+    """A later stage failed or the run was cancelled; upstream stages stop."""
+
+
+class Pipeline:
+    """Run list -> fetch -> parse -> write as overlapping stages.
+
+    ``listings`` is consumed lazily on a producer thread, ``fetch(item)``
+    runs on ``fetchers`` threads, ``parse(item, fetched)`` on one thread
+    (so it may keep unsynchronized state such as an ``IncrementalSync``),
+    and rows are written from the calling thread in the writer's batches,
+    or fewer once the oldest has waited ``flush_seconds`` or the stream
+    ends. Stages are joined by queues of ``buffer`` items, so a slow stage
+    holds back the ones before it instead of letting work pile up in
+    memory.
+
+    An item whose fetch or parse raises is logged and dropped; the rest
+    carry on. If the listing fails part way, whatever it already produced
+    is still written. ``RunCancelled`` from any stage, or from ``cancel``,
+    stops every stage and is re-raised once the rows in hand are written.
+    """
+
+    def __init__(self, name: str, timer: Optional[StageTimer] = None, cancel: Optional[threading.Event] = None,
+                 buffer: int = PIPELINE_BUFFER, fetchers: int = PIPELINE_FETCHERS,
+                 flush_seconds: float = PIPELINE_FLUSH_SECONDS):
+        self.name = name
+        self.timer = timer or StageTimer()
+        self.cancel = cancel or threading.Event()
+        self.buffer = max(1, buffer)
+        self.fetchers = max(1, fetchers)
+        self.flush_seconds = flush_seconds
+        self.stats = {'listed': 0, 'fetched': 0, 'parsed': 0, 'skipped': 0, 'errors': 0}
+        # True once ``listings`` ran to the end, i.e. every listed article was seen
+        self.listing_complete = False
+        # First fetch start and last fetch end; fetches overlap, so the stage is timed as one span
+        self._fetch_span = [None, None]
+        self._abort = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _timed(self, started: float):
+        with self._lock:
+            if self._fetch_span[0] is None:
+                self._fetch_span[0] = started
+            self._fetch_span[1] = time.monotonic()
+
+    def _fail(self, error: BaseException):
+        # Keep the first cancellation or unexpected failure, and stop every stage
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._abort.set()
+
+    def _put(self, q: queue.Queue, item):
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self._abort.is_set():
+                raise _Aborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self.cancel.is_set():
+                    self._fail(RunCancelled(f"{self.name} pipeline cancelled"))
+
+    def _produce(self, listings: Iterable[Any], fetch_queue: queue.Queue):
+        try:
+            iterator = iter(listings)
+            while True:
+                if self.cancel.is_set():
+                    raise RunCancelled(f"{self.name} pipeline cancelled")
+                try:
+                    with self.timer.stage('list_page'):
+                        item = next(iterator)
+                except StopIteration:
+                    self.listing_complete = True
+                    break
+                self._count('listed')
+                self._put(fetch_queue, item)
+        except _Aborted:
+            return
+        except RunCancelled as e:
+            self._fail(e)
+            return
+        except Exception as e:
+            # Keep what was listed so far; it is fetched and written as usual
+            logger.error(f"{self.name} listing failed after {self.stats['listed']} articles: {e}")
+            self._count('errors')
+        try:
+            for _ in range(self.fetchers):
+                self._put(fetch_queue, _DONE)
+        except _Aborted:
+            pass
+
+    def _fetch(self, fetch: Callable, fetch_queue: queue.Queue, parse_queue: queue.Queue):
+        try:
+            while True:
+                item = self._get(fetch_queue)
+                if item is _DONE:
+                    break
+                started = time.monotonic()
+                try:
+                    fetched = fetch(item)
+                except RunCancelled as e:
+                    self._fail(e)
+                    return
+                except Exception as e:
+                    logger.error(f"{self.name} fetch failed for {_label(item)}: {e}")
+                    self._count('errors')
+                    continue
+                finally:
+                    self._timed(started)
+                self._count('fetched')
+                self._put(parse_queue, (item, fetched))
+            self._put(parse_queue, _DONE)
+        except _Aborted:
+            pass
+
+    def _parse(self, parse: Callable, parse_queue: queue.Queue, write_queue: queue.Queue):
+        finished = 0
+        try:
+            while finished < self.fetchers:
+                entry = self._get(parse_queue)
+                if entry is _DONE:
+                    finished += 1
+                    continue
+                item, fetched = entry
+                try:
+                    row = parse(item, fetched)
+                except RunCancelled as e:
+                    self._fail(e)
+                    return
+                except Exception as e:
+                    logger.error(f"{self.name} parse failed for {_label(item)}: {e}")
+                    self._count('errors')
+                    continue
+                if row is None:
+                    # Nothing to write, e.g. an unchanged article
+                    self._count('skipped')
+                    continue
+                self._count('parsed')
+                self._put(write_queue, row)
+            self._put(write_queue, _DONE)
+        except _Aborted:
+            pass
+
+    def _write(self, writer: BatchWriter, row: Dict[str, Any], prepare):
+        if prepare is not None:
+            try:
+                row = prepare(row)
+            except RunCancelled:
+                raise
+            except Exception as e:
+                logger.error(f"{self.name} could not prepare {_label(row)}: {e}")
+                self._count('errors')
+                return
+            if row is None:
+                self._count('skipped')
+                return
+        writer.add(row)
+
+    def _drain(self, write_queue: queue.Queue, writer: BatchWriter, prepare):
+        # Rows already parsed when the pipeline stopped are still worth saving
+        while True:
+            try:
+                row = write_queue.get_nowait()
+            except queue.Empty:
+                return
+            if row is not _DONE:
+                self._write(writer, row, prepare)
+
+    def run(self, listings: Iterable[Any], fetch: Callable[[Any], Any],
+            parse: Callable[[Any, Any], Optional[Dict[str, Any]]], writer: BatchWriter,
+            prepare: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None) -> Dict[str, int]:
+        """Stream ``listings`` through the stages into ``writer``, returning per-stage counts.
+
+        ``prepare``, if given, is applied to each row on the writing thread
+        just before it is buffered; rows it returns None for are skipped.
+        """
+        fetch_queue: queue.Queue = queue.Queue(self.buffer)
+        parse_queue: queue.Queue = queue.Queue(self.buffer)
+        write_queue: queue.Queue = queue.Queue(self.buffer)
+        threads = [threading.Thread(target=self._produce, args=(listings, fetch_queue),
+                                    name=f'{self.name}-list', daemon=True)]
+        threads += [threading.Thread(target=self._fetch, args=(fetch, fetch_queue, parse_queue),
+                                     name=f'{self.name}-fetch-{i}', daemon=True) for i in range(self.fetchers)]
+        threads.append(threading.Thread(target=self._parse, args=(parse, parse_queue, write_queue),
+                                        name=f'{self.name}-parse', daemon=True))
+        for thread in threads:
+            thread.start()
+
+        oldest = None
+        try:
+            while True:
+                try:
+                    row = write_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._abort.is_set():
+                        self._drain(write_queue, writer, prepare)
+                        break
+                    if self.cancel.is_set():
+                        self._fail(RunCancelled(f"{self.name} pipeline cancelled"))
+                else:
+                    if row is _DONE:
+                        break
+                    self._write(writer, row, prepare)
+                # A partial batch goes out once its oldest row has waited long enough
+                if not writer.pending:
+                    oldest = None
+                elif oldest is None:
+                    oldest = time.monotonic()
+                elif time.monotonic() - oldest >= self.flush_seconds:
+                    writer.flush()
+                    oldest = None
+        except BaseException as e:
+            self._fail(e)
+            raise
+        finally:
+            writer.flush()
+            self._abort.set()
+            for thread in threads:
+                thread.join()
+            if self._fetch_span[0] is not None:
+                self.timer.add('article_fetch', self._fetch_span[1] - self._fetch_span[0])
+
+        logger.info(f"{self.name} pipeline finished: " + ', '.join(f"{k}={v}" for k, v in self.stats.items()))
+        if self._error is not None:
+            raise self._error
+        return self.stats
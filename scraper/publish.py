@@ -0,0 +1,83 @@
+import os
+import logging
+from typing import Any, Dict, Optional
+from db_writer import BatchWriter
+from timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# Minimum size of a snapshot, absolute and relative to the live table
+PUBLISH_MIN_ROWS = int(os.getenv('PUBLISH_MIN_ROWS', '10'))
+PUBLISH_MIN_RATIO = float(os.getenv('PUBLISH_MIN_RATIO', '0.5'))
+
+# Fields every published row must have
+REQUIRED_FIELDS = ['title', 'url', 'content', 'date']
+
+# Postgres function from publish_setup.sql that swaps staging into live
+PUBLISH_FUNCTION = 'publish_articles'
+
+
+class PublishError(Exception):
+    """A snapshot failed validation or could not be swapped in; the live table is unchanged."""
+
+
+class SnapshotPublisher:
+    """Publish a complete scrape of one article table at once.
+
+    Rows are written to ``<table>_staging`` and swapped into the live table
+    by a single database function call, so readers see either the previous
+    snapshot or the new one, never a half-built table. A snapshot that is
+    too small or has rows missing required fields is not published.
+    """
+
+    def __init__(self, client, table: str, timer: Optional[StageTimer] = None,
+                 min_rows: int = PUBLISH_MIN_ROWS, min_ratio: float = PUBLISH_MIN_RATIO):
+        self.client = client
+        self.table = table
+        self.staging = f"{table}_staging"
+        self.timer = timer or StageTimer()
+        self.min_rows = min_rows
+        self.min_ratio = min_ratio
+        self.rows_published = 0
+        self.rows_rejected = 0
+
+    def accept(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The row if it has every required field; otherwise None, counted and logged"""
+        missing = [name for name in REQUIRED_FIELDS if not row.get(name)
+                   # Duplicates may be stored without content (see dedupe.py)
+                   and not (name == 'content' and row.get('is_canonical') is False)]
+        if missing:
+            self.rows_rejected += 1
+            logger.warning(f"Not publishing {row.get('url') or row.get('title')}: missing {', '.join(missing)}")
+            return None
+        return row
+
+    def begin(self) -> BatchWriter:
+        """Empty the staging table and return a writer for the new snapshot"""
+        with self.timer.stage('stage_clear'):
+            self.client.table(self.staging).delete().neq('id', 0).execute()
+        return BatchWriter(self.client, self.staging, timer=self.timer)
+
+    def swap(self, writer: BatchWriter) -> int:
+        """Swap a fully staged snapshot into the live table, returning the rows published.
+
+        Raises ``PublishError`` and keeps the live table as it was if the
+        snapshot is incomplete or too small, or the swap fails.
+        """
+        if writer.rows_failed:
+            raise PublishError(f"{writer.rows_failed} rows could not be written to {self.staging}")
+        if writer.rows_written < self.min_rows:
+            raise PublishError(f"Only {writer.rows_written} valid rows for {self.table}, need at least {self.min_rows}")
+        logger.info(f"Staged {writer.summary()}")
+        try:
+            with self.timer.stage('publish'):
+                response = self.client.rpc(PUBLISH_FUNCTION, {
+                    'target': self.table,
+                    'min_rows': self.min_rows,
+                    'min_ratio': self.min_ratio,
+                }).execute()
+        except Exception as e:
+            raise PublishError(f"Could not publish {self.table}: {e}") from e
+        self.rows_published = response.data if isinstance(response.data, int) else writer.rows_written
+        logger.info(f"Published {self.rows_published} rows to {self.table}")
+        return self.rows_published
@@ -0,0 +1,67 @@
+-- Staging tables and the swap function used by SCRAPE_MODE=publish.
+-- Apply after supabase_setup.sql and incremental_setup.sql.
+
+-- Staging tables mirror the live tables, including the url unique index
+-- and the id sequence, so staged rows can be copied over as they are
+CREATE TABLE IF NOT EXISTS mbs_articles_staging (LIKE mbs_articles INCLUDING ALL);
+CREATE TABLE IF NOT EXISTS trending_articles_staging (LIKE trending_articles INCLUDING ALL);
+
+-- Replace the contents of a live article table with its staging table in
+-- one transaction. Readers keep seeing the previous snapshot until commit.
+-- Refuses, leaving the live table untouched, if the staged snapshot has
+-- fewer than min_rows rows, fewer than min_ratio times the live row count,
+-- or rows missing a title or url. Returns the number of rows published.
+CREATE OR REPLACE FUNCTION publish_articles(
+  target TEXT,
+  min_rows INTEGER DEFAULT 1,
+  min_ratio DOUBLE PRECISION DEFAULT 0
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  staging TEXT := target || '_staging';
+  staged INTEGER;
+  live INTEGER;
+  incomplete INTEGER;
+  column_list TEXT;
+BEGIN
+  IF target NOT IN ('mbs_articles', 'trending_articles') THEN
+    RAISE EXCEPTION 'Unknown article table: %', target;
+  END IF;
+
+  -- Block concurrent writers (not readers) for the rest of the transaction
+  EXECUTE format('LOCK TABLE %I IN EXCLUSIVE MODE', target);
+
+  EXECUTE format('SELECT count(*) FROM %I', staging) INTO staged;
+  EXECUTE format('SELECT count(*) FROM %I', target) INTO live;
+  EXECUTE format(
+    'SELECT count(*) FROM %I WHERE coalesce(title, '''') = '''' OR coalesce(url, '''') = ''''',
+    staging) INTO incomplete;
+
+  IF staged < min_rows OR staged < live * min_ratio THEN
+    RAISE EXCEPTION 'Refusing to publish % staged rows into % (% live, need at least %)',
+      staged, target, live, greatest(min_rows, ceil(live * min_ratio));
+  END IF;
+  IF incomplete > 0 THEN
+    RAISE EXCEPTION 'Refusing to publish %: % staged rows lack a title or url', target, incomplete;
+  END IF;
+
+  -- Copy by name so columns added later in a different order still line up
+  SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position) INTO column_list
+  FROM information_schema.columns
+  WHERE table_schema = 'public' AND table_name = target
+    AND column_name IN (SELECT column_name FROM information_schema.columns
+                        WHERE table_schema = 'public' AND table_name = staging);
+
+  EXECUTE format('DELETE FROM %I WHERE true', target);
+  EXECUTE format('INSERT INTO %I (%s) SELECT %s FROM %I', target, column_list, column_list, staging);
+  EXECUTE format('DELETE FROM %I WHERE true', staging);
+  RETURN staged;
+END;
+$$;
+
+-- Only the scraper's service role may publish
+REVOKE ALL ON FUNCTION publish_articles(TEXT, INTEGER, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION publish_articles(TEXT, INTEGER, DOUBLE PRECISION) TO service_role;
@@ -0,0 +1,190 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional, Tuple
+from metrics import BREAKER_TRIPS, FETCH_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Outbound request policy, overridable from the environment
+HOST_RATE = float(os.getenv('SCRAPER_HOST_RATE', '4'))  # requests per second per host
+HOST_BURST = int(os.getenv('SCRAPER_HOST_BURST', '4'))
+FETCH_MAX_RETRIES = int(os.getenv('SCRAPER_FETCH_RETRIES', '2'))
+RETRY_BUDGET = int(os.getenv('SCRAPER_RETRY_BUDGET', '20'))  # retries per run, across all hosts
+RETRY_BACKOFF = float(os.getenv('SCRAPER_RETRY_BACKOFF', '0.5'))
+MAX_RETRY_AFTER = float(os.getenv('SCRAPER_MAX_RETRY_AFTER', '30'))
+BREAKER_THRESHOLD = int(os.getenv('SCRAPER_BREAKER_THRESHOLD', '3'))
+
+# Statuses worth another attempt; anything else is final
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, in either delta or HTTP-date form"""
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel: Optional[threading.Event] = None) -> float:
+        """Block until a token is available, returning the time spent waiting.
+
+        Setting ``cancel`` ends the wait early, without taking a token.
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while cancel is None or not cancel.is_set():
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            if cancel is None:
+                time.sleep(delay)
+            else:
+                cancel.wait(delay)
+            waited += delay
+        return waited
+
+    def set_rate(self, rate: float, burst: int):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.capacity = max(1, burst)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float):
+        """Hold back every caller for ``seconds``, e.g. after a Retry-After"""
+        with self._lock:
+            # Credit the time before the pause first, so none of it counts against the hold
+            self._refill()
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class RequestPolicy:
+    """Rate limits, retries and circuit breaking for one scrape run.
+
+    Each host gets its own token bucket and failure count. Retries back off
+    with jitter, honour ``Retry-After`` and draw from a budget shared by the
+    whole run, so a bad night for one source cannot multiply the request
+    volume. A host that fails ``breaker_threshold`` times in a row is skipped
+    for the rest of the run.
+    """
+
+    def __init__(self, rate: float = HOST_RATE, burst: int = HOST_BURST,
+                 max_retries: int = FETCH_MAX_RETRIES, retry_budget: int = RETRY_BUDGET,
+                 backoff: float = RETRY_BACKOFF, max_retry_after: float = MAX_RETRY_AFTER,
+                 breaker_threshold: int = BREAKER_THRESHOLD):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.breaker_threshold = breaker_threshold
+
+        # Processes sharing each host's rate and burst (see share)
+        self.parts = 1
+        self.retries = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._failures: Dict[str, int] = {}
+        self._open: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(*self._share())
+            return bucket
+
+    def _share(self) -> Tuple[float, int]:
+        return self.rate / self.parts, max(1, self.burst // self.parts)
+
+    def share(self, parts: int):
+        """Keep to ``1/parts`` of each host's rate and burst, as one of ``parts`` processes scraping together"""
+        with self._lock:
+            self.parts = max(1, parts)
+            for bucket in self._buckets.values():
+                bucket.set_rate(*self._share())
+
+    def wait(self, host: str, cancel: Optional[threading.Event] = None) -> float:
+        """Take a token for ``host``, blocking while it is over its rate or until ``cancel`` is set"""
+        return self._bucket(host).acquire(cancel)
+
+    def allow(self, host: str) -> bool:
+        """False once the breaker for ``host`` has tripped"""
+        return host not in self._open
+
+    def record(self, host: str, ok: bool, reason: Optional[str] = None):
+        """Count a finished attempt towards the host's breaker"""
+        with self._lock:
+            if ok:
+                self._failures[host] = 0
+                return
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if failures < self.breaker_threshold or host in self._open:
+                return
+            self._open[host] = reason or 'repeated failures'
+        BREAKER_TRIPS.inc(host=host)
+        logger.warning(f"Circuit open for {host} after {failures} failures, skipping it for the rest of the run: {reason}")
+
+    def retry_delay(self, host: str, status: Optional[int], headers: Mapping[str, str],
+                    attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a failed attempt, or None to give up"""
+        if status is not None and status not in RETRY_STATUSES:
+            return None
+        if attempt >= self.max_retries or not self.allow(host):
+            return None
+        retry_after = retry_after_seconds(headers)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            logger.info(f"{host} asked to retry after {retry_after:.0f}s, giving up instead")
+            return None
+        with self._lock:
+            if self.retries >= self.retry_budget:
+                return None
+            self.retries += 1
+        FETCH_RETRIES.inc(host=host)
+
+        if retry_after is not None:
+            # The server said when; keep every other request to the host back too
+            self._bucket(host).pause(retry_after)
+            return retry_after
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def summary(self) -> str:
+        skipped = ', '.join(sorted(self._open)) or 'none'
+        return f"retries={self.retries}/{self.retry_budget}, open circuits: {skipped}"
@@ -1,25 +1,76 @@
+from dotenv import load_dotenv
+
+# Read .env before the modules below pick up their settings
+load_dotenv()
+
 from apscheduler.schedulers.blocking import BlockingScheduler
-from mbs_scraper import MBSScraper
+from datetime import datetime, timedelta
+from cancellation import RunCancelled
+from driver_pool import get_pool, shutdown_pool
+from jobs import SCRAPERS, JOB_DEADLINE_MINUTES, Job, run_scraper
 import logging
+import uuid
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def scrape_job():
-    logger.info("Starting scheduled scrape job")
-    scraper = MBSScraper()
-    scraper.update_database()
-    logger.info("Completed scheduled scrape job")
+# Hours between runs of each registered scraper, e.g. TRENDING_SCHEDULE_HOURS=2
+DEFAULT_HOURS = {'mbs': 6, 'trending': 2}
+SCHEDULE_HOURS = {
+    name: float(os.getenv(f'{name.upper()}_SCHEDULE_HOURS', str(DEFAULT_HOURS.get(name, 6))))
+    for name in SCRAPERS
+}
+# Minutes a run may take before it is cancelled (0 disables), e.g. MBS_DEADLINE_MINUTES=30
+DEADLINE_MINUTES = {
+    name: float(os.getenv(f'{name.upper()}_DEADLINE_MINUTES', str(JOB_DEADLINE_MINUTES)))
+    for name in SCRAPERS
+}
+# Up to this many seconds of random delay on every run, and the gap
+# between the first runs of consecutive scrapers, so Chrome-heavy jobs
+# don't all start at once
+SCHEDULE_JITTER = int(os.getenv('SCHEDULE_JITTER', '300'))
+SCHEDULE_STAGGER = int(os.getenv('SCHEDULE_STAGGER', '120'))
+
+def scrape_job(name: str):
+    logger.info(f"Starting scheduled {name} scrape job")
+    job = Job(id=uuid.uuid4().hex, scraper=name, deadline=DEADLINE_MINUTES[name] * 60 or None)
+    try:
+        run_scraper(job)
+    except RunCancelled:
+        logger.warning(f"Scheduled {name} scrape cancelled after {DEADLINE_MINUTES[name]:g} minutes")
+        return
+    logger.info(f"Completed scheduled {name} scrape job")
 
 def main():
+    # Start Chrome once up front; every run borrows from the same pool
+    get_pool().warm()
+
     scheduler = BlockingScheduler()
-    # Run every 6 hours
-    scheduler.add_job(scrape_job, 'interval', hours=6)
-    # Also run immediately when started
-    scheduler.add_job(scrape_job)
-    
+    now = datetime.now()
+    for i, name in enumerate(SCRAPERS):
+        # Runs immediately on start (staggered), then on the scraper's own
+        # interval. A run still going when the next one is due makes that one
+        # skip, and missed runs are coalesced into one.
+        scheduler.add_job(
+            scrape_job, 'interval', args=[name], id=name,
+            hours=SCHEDULE_HOURS[name],
+            jitter=SCHEDULE_JITTER,
+            start_date=now + timedelta(seconds=i * SCHEDULE_STAGGER),
+            next_run_time=now + timedelta(seconds=i * SCHEDULE_STAGGER),
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=SCHEDULE_JITTER + 60,
+        )
+        logger.info(f"Scheduled {name} every {SCHEDULE_HOURS[name]:g}h")
+
     logger.info("Starting scheduler...")
-    scheduler.start()
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Scheduler stopped")
+    finally:
+        shutdown_pool()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
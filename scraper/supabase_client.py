@@ -0,0 +1,36 @@
+import os
+import logging
+import threading
+from typing import Any, Optional
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[Any] = None
+_lock = threading.Lock()
+
+
+def get_supabase():
+    """Process-wide Supabase client, created on first use"""
+    global _client
+    with _lock:
+        if _client is None:
+            # Importing supabase pulls in httpx and friends; only pay for it once a run needs the database
+            from supabase import create_client
+
+            load_dotenv()
+            url = os.getenv("SUPABASE_URL")
+            key = os.getenv("SUPABASE_SERVICE_KEY")
+            if not url or not key:
+                raise Exception("Missing Supabase credentials. Please check your .env file.")
+
+            logger.info(f"Connecting to Supabase at {url}")
+            _client = create_client(url, key)
+        return _client
+
+
+def set_supabase(client):
+    """Use ``client`` instead of a real connection, e.g. an offline stand-in"""
+    global _client
+    with _lock:
+        _client = client
@@ -0,0 +1,6 @@
+import os
+import sys
+
+SCRAPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRAPER_DIR)
+sys.path.insert(0, os.path.join(SCRAPER_DIR, 'benchmarks'))
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from backfill import Backfill
+from bench_e2e import LISTING_URLS, NoBrowserPool
+from fake_supabase import FakeSupabase
+from replay_server import ReplayServer
+from supabase_client import set_supabase
+from trending_scraper import TrendingScraper
+
+
+@pytest.fixture
+def setup(tmp_path):
+    client = FakeSupabase()
+    set_supabase(client)
+    with ReplayServer() as server:
+        with TrendingScraper(pool=NoBrowserPool(), base_url=server.url_for(LISTING_URLS['trending'])) as scraper:
+            scraper.counts = {'fetched': 0}
+            listed = [listing['url'] for listing in scraper.scrape_listing_page(scraper.base_url)]
+            # Stored by an earlier scrape of the live listing
+            client.tables['trending_articles'] = [{'id': 1, 'url': listed[0], 'title': 'T', 'content': 'stored body'}]
+            yield client, server, scraper, listed, str(tmp_path / 'state.json')
+
+
+def test_failed_fetches_do_not_blank_stored_rows(setup):
+    client, server, scraper, listed, path = setup
+    # The listing loads, but every article page fails
+    server.default_failure_rate = 1.0
+    server.failure_rate = {'www.mortgagenewsdaily.com': 0.0}
+    state = Backfill(scraper, 'trending', max_pages=1, path=path).run()
+
+    assert state['rows_skipped'] == len(listed)
+    assert client.tables['trending_articles'][0]['content'] == 'stored body'
+
+
+def test_rows_from_the_live_listing_are_not_flagged_backfilled(setup):
+    client, server, scraper, listed, path = setup
+    with open(path, 'w') as f:
+        json.dump({'scraper': 'trending', 'next_page': 2, 'last_page_urls': [], 'rows_written': 0,
+                   'rows_failed': 0, 'finished': False, 'stopped': None}, f)
+    # Page 2 lists the same articles as the live page
+    scraper.page_url = lambda page: scraper.base_url
+    Backfill(scraper, 'trending', max_pages=2, path=path).run()
+
+    rows = {row['url']: row for row in client.tables['trending_articles']}
+    assert rows[listed[0]]['backfilled'] is False
+    assert all(rows[url]['backfilled'] is True for url in listed[1:])
@@ -0,0 +1,26 @@
+from bench_e2e import LISTING_URLS, NoBrowserPool
+from content_limits import limit_content
+from fetcher import ConcurrentFetcher
+from mbs_scraper import MBSScraper
+from replay_server import ReplayServer
+
+
+def test_character_limit_marks_row_truncated():
+    row = limit_content({'url': 'u', 'content': 'word ' * 100}, max_chars=50)
+    assert row['truncated'] is True
+    assert len(row['content']) <= 50
+    assert row['content_bytes'] == 500
+
+
+def test_page_cut_at_the_byte_cap_marks_row_truncated():
+    with ReplayServer() as server, MBSScraper(pool=NoBrowserPool()) as scraper:
+        url = server.url_for(LISTING_URLS['mbs'])
+        result = ConcurrentFetcher(max_bytes=2048).fetch(url)
+        assert result.truncated
+
+        article = {'title': 'T', 'url': url, 'description': ''}
+        row = scraper.build_row(article, scraper.scrape_article_content(url, prefetched=result), result)
+        assert row['truncated'] is True
+
+        whole = ConcurrentFetcher().fetch(url)
+        assert scraper.build_row(article, 'body', whole)['truncated'] is False
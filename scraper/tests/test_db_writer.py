@@ -0,0 +1,31 @@
+from db_writer import BatchWriter
+from fake_supabase import FakeSupabase
+
+
+def test_mixed_key_rows_are_written_in_separate_upserts():
+    client = FakeSupabase()
+    client.tables['mbs_articles'] = [{'id': 1, 'url': 'a', 'title': 'old', 'backfilled': True}]
+    writer = BatchWriter(client, 'mbs_articles', chunk_size=10, max_retries=0)
+
+    # A work queue batch that crosses from page-1 tasks into backfilled ones
+    writer.write([
+        {'url': 'a', 'title': 'A'},
+        {'url': 'b', 'title': 'B', 'backfilled': True},
+        {'url': 'c', 'title': 'C'},
+    ])
+
+    assert writer.rows_failed == 0
+    assert writer.rows_written == 3
+    rows = {row['url']: row for row in client.tables['mbs_articles']}
+    assert rows['a'] == {'id': 1, 'url': 'a', 'title': 'A', 'backfilled': True}
+    assert rows['b']['backfilled'] is True
+    assert 'backfilled' not in rows['c']
+    assert client.calls['upsert'] == 2
+
+
+def test_same_key_rows_share_one_upsert():
+    client = FakeSupabase()
+    writer = BatchWriter(client, 'mbs_articles', chunk_size=10)
+    writer.write([{'url': str(i), 'title': str(i)} for i in range(5)])
+    assert client.calls['upsert'] == 1
+    assert writer.rows_written == 5
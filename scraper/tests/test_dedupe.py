@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from dedupe import Deduplicator, cluster_key
+from fake_supabase import FakeSupabase
+
+
+def days_ago(days):
+    return (datetime.now() - timedelta(days=days)).isoformat()
+
+
+def make_client(canonical_url):
+    client = FakeSupabase()
+    client.tables['mbs_articles'] = [
+        {'url': 'https://a/old', 'cluster_id': cluster_key('https://a/old'), 'date': days_ago(30),
+         'is_canonical': canonical_url == 'https://a/old'},
+    ]
+    client.tables['trending_articles'] = [
+        {'url': 'https://b/new', 'cluster_id': cluster_key('https://a/old'), 'date': days_ago(1),
+         'is_canonical': False, 'content_hash': 'x'},
+    ]
+    return client
+
+
+def test_canonical_row_older_than_the_window_is_kept():
+    client = make_client(canonical_url='https://a/old')
+    assert Deduplicator(client, window_days=14).promote_orphans() == 0
+    canonical = [row for table in client.tables.values() for row in table if row['is_canonical']]
+    assert [row['url'] for row in canonical] == ['https://a/old']
+
+
+def test_orphaned_cluster_promotes_its_earliest_copy():
+    client = make_client(canonical_url=None)
+    assert Deduplicator(client, window_days=14).promote_orphans() == 1
+    old, new = client.tables['mbs_articles'][0], client.tables['trending_articles'][0]
+    assert old['is_canonical'] is True and old['cluster_id'] == cluster_key('https://a/old')
+    assert new['is_canonical'] is False and new['cluster_id'] == old['cluster_id']
@@ -0,0 +1,37 @@
+import threading
+
+import driver_pool
+from driver_pool import DriverPool
+
+
+class SlowChrome:
+    """Chrome stand-in that holds its start-up until ``started`` is set"""
+    starting = threading.Event()
+    started = threading.Event()
+    instances = []
+
+    def __init__(self, service=None, options=None):
+        SlowChrome.instances.append(self)
+        self.quit_called = False
+        SlowChrome.starting.set()
+        SlowChrome.started.wait(5)
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_driver_started_during_shutdown_is_quit(monkeypatch):
+    import selenium.webdriver
+    monkeypatch.setattr(selenium.webdriver, 'Chrome', SlowChrome)
+    monkeypatch.setattr(driver_pool, 'resolve_chromedriver', lambda: None)
+    pool = DriverPool(size=1, profile='full')
+
+    warming = threading.Thread(target=pool.warm, args=(1,))
+    warming.start()
+    assert SlowChrome.starting.wait(5)
+    pool.shutdown()
+    SlowChrome.started.set()
+    warming.join()
+
+    assert [driver.quit_called for driver in SlowChrome.instances] == [True]
+    assert not pool._all
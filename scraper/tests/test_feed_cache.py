@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from fake_supabase import FakeSupabase
+from feed_cache import FeedCache
+
+
+def make_cache():
+    client = FakeSupabase()
+    client.tables['mbs_articles'] = [
+        {'id': i, 'url': f'https://example.com/{i}', 'title': f'Story {i}', 'date': f'2026-01-0{i}',
+         'content': 'body ' * 1000, 'content_hash': 'abc', 'simhash': '0'}
+        for i in range(1, 4)
+    ]
+    return FeedCache(client)
+
+
+def test_feed_cache_does_not_hold_content():
+    cache = make_cache()
+    snapshot, _ = cache.snapshot('mbs')
+    assert 'content' not in snapshot.columns
+    assert 'content_hash' not in snapshot.columns
+
+    items = json.loads(cache.page('mbs').body)['items']
+    assert [item['id'] for item in items] == [3, 2, 1]
+    with pytest.raises(ValueError):
+        cache.page('mbs', fields='url,content')
+
+
+def test_single_article_has_its_content():
+    cache = make_cache()
+    row = cache.article('mbs', 2)
+    assert row['content'].startswith('body')
+    assert 'simhash' not in row
+    assert cache.article('mbs', 99) is None
+    with pytest.raises(KeyError):
+        cache.article('nope', 1)
+
+
+def test_writes_from_other_processes_reload_the_feed():
+    cache = make_cache()
+    cache.version_check = 0
+    client = cache.client
+    client.tables['article_versions'] = [{'table_name': 'mbs_articles', 'version': 1}]
+    cache.snapshot('mbs')
+    assert cache.snapshot('mbs')[1]
+
+    # What the triggers in feed_cache_setup.sql do when, say, backfill.py writes
+    client.tables['mbs_articles'].append({'id': 4, 'url': 'https://example.com/4', 'title': 'Story 4',
+                                          'date': '2026-01-04'})
+    client.tables['article_versions'][0]['version'] = 2
+    snapshot, cached = cache.snapshot('mbs')
+    assert not cached
+    assert len(snapshot.rows) == 4
+    assert cache.snapshot('mbs')[1]
@@ -0,0 +1,29 @@
+from fetcher import ConcurrentFetcher, FetchResult
+from request_policy import RequestPolicy
+
+
+def make_fetcher(statuses):
+    fetcher = ConcurrentFetcher(policy=RequestPolicy(rate=0, max_retries=0, breaker_threshold=2))
+    replies = iter(statuses)
+
+    def get(url, headers):
+        status = next(replies)
+        error = None if status < 400 else f"{status} Error"
+        return FetchResult(url=url, status=status, error=error)
+
+    fetcher._get = get
+    return fetcher
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    fetcher = make_fetcher([451, 451, 451])
+    for _ in range(3):
+        fetcher.fetch('https://example.com/a')
+    assert fetcher.available('https://example.com/b')
+
+
+def test_client_errors_do_not_reset_the_failure_count():
+    fetcher = make_fetcher([503, 404, 503])
+    for _ in range(3):
+        fetcher.fetch('https://example.com/a')
+    assert not fetcher.available('https://example.com/b')
@@ -0,0 +1,31 @@
+import time
+
+from db_writer import BatchWriter
+from fake_supabase import FakeSupabase
+from pipeline import Pipeline
+
+
+def slow_fetch(item):
+    # Slower than the writer's idle poll, so the write queue keeps running dry
+    time.sleep(0.15)
+    return item
+
+
+def run(flush_seconds):
+    client = FakeSupabase()
+    writer = BatchWriter(client, 'mbs_articles', chunk_size=25)
+    pipeline = Pipeline('test', fetchers=1, flush_seconds=flush_seconds)
+    pipeline.run([{'url': str(i)} for i in range(5)], slow_fetch, lambda item, fetched: dict(fetched), writer)
+    return client, writer
+
+
+def test_rows_trickling_in_share_one_write():
+    client, writer = run(flush_seconds=60)
+    assert writer.rows_written == 5
+    assert client.calls['upsert'] == 1
+
+
+def test_partial_batch_is_written_once_it_is_old_enough():
+    client, writer = run(flush_seconds=0.2)
+    assert writer.rows_written == 5
+    assert 1 < client.calls['upsert'] < 5
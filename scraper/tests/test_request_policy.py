@@ -0,0 +1,27 @@
+import threading
+import time
+
+from request_policy import TokenBucket
+
+
+def test_cancel_ends_a_token_wait():
+    bucket = TokenBucket(rate=0.1, burst=1)
+    assert bucket.acquire() == 0.0
+
+    # The next token is ten seconds away; cancelling must not wait for it
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    started = time.monotonic()
+    bucket.acquire(cancel)
+    assert time.monotonic() - started < 1
+
+
+def test_pause_is_waited_out_in_full():
+    bucket = TokenBucket(rate=10, burst=1)
+    bucket.acquire()
+    # The Retry-After arrives a response's latency after the last refill
+    time.sleep(0.3)
+    bucket.pause(0.5)
+    paused = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - paused >= 0.5
@@ -0,0 +1,44 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from request_policy import RequestPolicy
+from work_queue import SQLiteQueue, Worker, WorkQueue
+
+
+def test_work_queue_is_abstract():
+    with pytest.raises(TypeError):
+        WorkQueue()
+
+
+def test_heartbeats_count_live_workers(tmp_path):
+    queue = SQLiteQueue(str(tmp_path / 'queue.db'))
+    assert queue.heartbeat('a') == 1
+    assert queue.heartbeat('b') == 2
+    queue.leave('b')
+    assert queue.heartbeat('a') == 1
+
+    queue.heartbeat('c')
+    time.sleep(0.2)
+    # c has been silent for longer than the ttl
+    assert queue.heartbeat('a', ttl=0.1) == 1
+
+
+def test_workers_split_each_host_rate(tmp_path):
+    queue = SQLiteQueue(str(tmp_path / 'queue.db'))
+    policies = {}
+
+    def factory(name):
+        policies[name] = RequestPolicy(rate=4, burst=4)
+        return SimpleNamespace(fetcher=SimpleNamespace(policy=policies[name]), close=lambda: None)
+
+    queue.heartbeat('other')
+    worker = Worker(queue, name='me', factory=factory)
+    worker.share_hosts()
+    bucket = worker.scraper('mbs').fetcher.policy._bucket('example.com')
+    assert (bucket.rate, bucket.capacity) == (2, 2)
+
+    queue.leave('other')
+    worker.share_hosts()
+    assert (bucket.rate, bucket.capacity) == (4, 4)
@@ -0,0 +1,54 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from metrics import STAGE_SECONDS
+
+
+class StageTimer:
+    """Accumulate wall time per named stage of a scrape run.
+
+    Stages may nest; time spent in an inner stage is not counted towards
+    the enclosing one, so the totals add up to the run time. Each completed
+    stage is also observed in the ``scraper_stage_seconds`` histogram.
+    """
+
+    def __init__(self, scraper: str = ''):
+        self.scraper = scraper
+        self.stages: Dict[str, float] = {}
+        self._local = threading.local()
+        # Stages of one run may be timed from several threads at once
+        self._lock = threading.Lock()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        # Frames are [name, resumed_at, exclusive_seconds_so_far]
+        stack = self._stack()
+        now = time.monotonic()
+        if stack:
+            # Pause the enclosing stage
+            parent = stack[-1]
+            self.add(parent[0], now - parent[1])
+            parent[2] += now - parent[1]
+        stack.append([name, now, 0.0])
+        try:
+            yield
+        finally:
+            now = time.monotonic()
+            current = stack.pop()
+            self.add(current[0], now - current[1])
+            STAGE_SECONDS.observe(current[2] + now - current[1], scraper=self.scraper, stage=name)
+            if stack:
+                stack[-1][1] = now
+
+    def summary(self) -> str:
+        return ', '.join(f"{name}={seconds:.2f}s" for name, seconds in self.stages.items())
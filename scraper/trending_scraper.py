@@ -1,20 +1,23 @@
 import os
-import time
 import logging
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import chromedriver_autoinstaller
-from bs4 import BeautifulSoup
-import re
-import requests
+from fetcher import ConcurrentFetcher, FetchResult
+from driver_pool import DriverPool, get_pool, shutdown_pool
+from supabase_client import get_supabase
+from incremental import SCRAPE_MODE, IncrementalSync
+from db_writer import BatchWriter
+from publish import SnapshotPublisher
+from dedupe import Deduplicator
+from content_limits import limit_content
+from pipeline import Pipeline
+from timing import StageTimer
+from cancellation import raise_if_cancelled
+import metrics
+import extractors
+from extractors import parse_html, strainer_for
 
 # Load environment variables
 load_dotenv()
@@ -23,209 +26,383 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Initialize Supabase client
-supabase: Client = create_client(
-    os.getenv('SUPABASE_URL', ''),
-    os.getenv('SUPABASE_SERVICE_KEY', '')
-)
+# Fetch the listing page over plain HTTP before falling back to headless Chrome
+HTTP_FIRST = os.getenv('TRENDING_HTTP_FIRST', 'true').lower() != 'false'
+
+# Statuses meaning a listing page does not exist, i.e. we are past the last one
+MISSING_PAGE_STATUSES = (404, 410)
 
 class TrendingScraper:
-    def __init__(self):
-        self.base_url = "https://www.mortgagenewsdaily.com/aroundtheweb"
+    BASE_URL = "https://www.mortgagenewsdaily.com/aroundtheweb"
+    TABLE = "trending_articles"
+    # Listing date format, e.g. "Thu, Apr 3 2025, 8:59 AM"
+    DATE_FORMAT = "%a, %b %d %Y, %I:%M %p"
+    
+    def __init__(self, pool: Optional[DriverPool] = None, http_first: bool = HTTP_FIRST,
+                 base_url: Optional[str] = None, cancel: Optional[threading.Event] = None):
+        self.base_url = base_url or self.BASE_URL
+        self.http_first = http_first
         
-        # Install ChromeDriver that matches the installed Chrome version
-        chromedriver_autoinstaller.install()
+        # Chrome drivers are borrowed from the shared pool, which uses the
+        # same setup as the MBS scraper
+        self.pool = pool or get_pool()
         
-        # Initialize Chrome driver with the same setup as MBS scraper
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")  # Run in headless mode
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        # Set by a scheduler deadline; pending fetches are abandoned once it fires
+        self.cancel = cancel or threading.Event()
         
-        self.driver = webdriver.Chrome(options=chrome_options)
+        # Pooled HTTP session used to fetch article bodies concurrently
+        self.fetcher = ConcurrentFetcher(cancel=self.cancel)
+        self.timer = StageTimer(scraper='trending')
+        self.counts: Dict[str, int] = {}
         
-    def __del__(self):
-        if hasattr(self, 'driver'):
-            self.driver.quit()
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        """Release the HTTP session; pooled drivers are owned by the pool."""
+        self.fetcher.close()
 
-    def get_content_by_source(self, url: str, source: str) -> Optional[str]:
-        """Extract content based on the source website."""
+    def extract_content(self, html: str, source: str, url: str) -> Optional[str]:
+        """Extract article content from a fetched page based on the source website."""
+        content = extractors.extract(html, source=source, url=url)
+        
+        if not content:
+            logger.warning(f"Warning: No content found for {source} at {url}")
+            return None
+        
+        return content
+
+    def content_from_result(self, result: FetchResult, source: str) -> Optional[str]:
+        """Turn a fetch result into article content, logging failures."""
+        if not result.ok:
+            logger.error(f"Error fetching content from {result.url}: {result.error}")
+            return None
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            content = ""
-            if source == "CNBC":
-                content_div = soup.select_one('div.PageBuilder-col-9.PageBuilder-col.PageBuilder-article')
-                if content_div:
-                    content = content_div.get_text(strip=True)
-            elif source == "Calculated Risk Blog":
-                content_div = soup.select_one('div.post.hentry.uncustomized-post-template')
-                if content_div:
-                    content = content_div.get_text(strip=True)
-            elif source == "Marketwatch":
-                content_div = soup.select_one('div.column-full.css-j1bzmn')
-                if content_div:
-                    content = content_div.get_text(strip=True)
-            elif source == "Eye on Housing":
-                content_div = soup.select_one('div.entry-content')
-                if content_div:
-                    content = content_div.get_text(strip=True)
-            elif source == "PR Newswire":
-                content_div = soup.select_one('div.release-body')
-                if content_div:
-                    content = content_div.get_text(strip=True)
-            elif source == "The Basis Point":
-                content_div = soup.select_one('div.entry-content')
-                if content_div:
-                    content = content_div.get_text(strip=True)
-            elif source == "Federal Reserve":
-                content_div = soup.select_one('div.content')
-                if content_div:
-                    content = content_div.get_text(strip=True)
-            
-            if not content:
-                logger.warning(f"Warning: No content found for {source} at {url}")
-                return None
-            
-            return content
+            with self.timer.stage('parse'):
+                return self.extract_content(result.text, source, result.url)
         except Exception as e:
-            logger.error(f"Error fetching content from {url}: {e}")
+            logger.error(f"Error parsing content from {result.url}: {e}")
             return None
+        finally:
+            # Only the extracted text is kept; drop the page with this call
+            result.text = None
+
+    def get_content_by_source(self, url: str, source: str) -> Optional[str]:
+        """Fetch a single article and extract content based on the source website."""
+        return self.content_from_result(self.fetcher.fetch(url), source)
             
-    def scrape_article_list(self) -> List[Dict[str, Any]]:
-        """Scrape the list of articles from the Around the Web page."""
-        try:
-            logger.info(f"Navigating to {self.base_url}")
-            self.driver.get(self.base_url)
-            
-            # Wait for the article list to load
-            WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "atw-list-items"))
-            )
-            
-            # Let the page fully load and render
-            time.sleep(8)  # Same delay as MBS scraper
-            
-            # Get the page source and parse with BeautifulSoup
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-            article_items = soup.find('ul', class_='atw-list-items').find_all('li')
-            
-            if not article_items:
-                logger.error("Could not find article items on the page")
-                return []
-                
-            articles = []
-            logger.info(f"Found {len(article_items)} articles")
+    def parse_listings(self, html: str) -> Optional[List[Dict[str, Any]]]:
+        """Parse article listings from the Around the Web page, or None if the list markup is missing."""
+        # Parse only the article list out of the page source
+        soup = parse_html(html, strainer_for('ul', 'atw-list-items'))
+        article_list = soup.find('ul', class_='atw-list-items')
+        if article_list is None:
+            soup.decompose()
+            return None
+        article_items = article_list.find_all('li')
+        
+        if not article_items:
+            logger.error("Could not find article items on the page")
+            soup.decompose()
+            return []
             
-            for item in article_items:
-                try:
-                    # Extract title and URL from the <a> tag
-                    link = item.find('a')
-                    if not link:
-                        continue
-                        
-                    title = link.get_text(strip=True)
-                    url = link.get('href')
-                    
-                    if not url or not title:
-                        continue
-                        
-                    # Extract source and date
-                    source_span = item.find('span', class_='atw-source')
-                    date_span = item.find('span', class_='atw-date')
-                    
-                    source = source_span.get_text(strip=True) if source_span else "Unknown"
-                    date_text = date_span.get_text(strip=True) if date_span else ""
-                    
-                    # Get article content based on source
-                    content = self.get_content_by_source(url, source)
-                    
-                    logger.info(f"Found article: {title}")
-                    logger.info(f"Source: {source}, Date: {date_text}")
-                    
-                    articles.append({
-                        'title': title,
-                        'url': url,
-                        'description': f"From {source}",  # Using source as part of description
-                        'category': source,  # Using source as category
-                        'date': date_text,
-                        'content': content
-                    })
+        listings = []
+        logger.debug(f"Found {len(article_items)} articles")
+        
+        for item in article_items:
+            try:
+                # Extract title and URL from the <a> tag
+                link = item.find('a')
+                if not link:
+                    continue
                     
-                except Exception as e:
-                    logger.error(f"Error processing article: {str(e)}")
+                title = link.get_text(strip=True)
+                url = link.get('href')
+                
+                if not url or not title:
                     continue
                     
-            logger.info(f"Successfully scraped {len(articles)} articles")
-            return articles
-            
+                # Extract source and date
+                source_span = item.find('span', class_='atw-source')
+                date_span = item.find('span', class_='atw-date')
+                
+                source = source_span.get_text(strip=True) if source_span else "Unknown"
+                date_text = date_span.get_text(strip=True) if date_span else ""
+                
+                logger.debug(f"Found article: {title}")
+                logger.debug(f"Source: {source}, Date: {date_text}")
+                
+                listings.append({
+                    'title': title,
+                    'url': url,
+                    'description': f"From {source}",  # Using source as part of description
+                    'category': source,  # Using source as category
+                    'date': date_text
+                })
+                
+            except Exception as e:
+                logger.error(f"Error processing article: {str(e)}")
+                continue
+        
+        # Break the tree's reference cycles so the page is freed now, not at the next GC
+        soup.decompose()
+        return listings
+
+    def page_url(self, page: int) -> str:
+        """Listing URL for a page of Around the Web, counting from 1."""
+        if page <= 1:
+            return self.base_url
+        separator = '&' if '?' in self.base_url else '?'
+        return f"{self.base_url}{separator}page={page}"
+
+    def listing_date(self, listing: Dict[str, Any]) -> Optional[datetime]:
+        """Publication date of a listing, if it can be parsed."""
+        try:
+            return datetime.strptime(listing.get('date', ''), self.DATE_FORMAT)
+        except ValueError:
+            return None
+
+    def scrape_listings(self, url: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Scrape article listings (without content) from an Around the Web page, the first by default, or [] if it fails."""
+        try:
+            return self.scrape_listing_page(url or self.base_url)
         except Exception as e:
             logger.error(f"Error scraping article list: {str(e)}")
             return []
 
+    def iter_listings(self, pages: int = 1) -> Iterator[Dict[str, Any]]:
+        """Yield listings from the first ``pages`` listing pages, stopping at an empty page.
+        
+        A page that cannot be read raises, so a failed listing never looks complete.
+        """
+        for page in range(1, pages + 1):
+            listings = self.scrape_listing_page(self.page_url(page))
+            if not listings:
+                return
+            yield from listings
+
+    def article_from_result(self, listing: Dict[str, Any], result: FetchResult) -> Dict[str, Any]:
+        """A listed article with the content from its fetch result (None after a 304)."""
+        article = dict(listing)
+        article['content'] = None if result.not_modified else self.content_from_result(result, listing['category'])
+        article['page_truncated'] = result.truncated
+        return article
+
+    def fetch_articles(self, listings: List[Dict[str, Any]],
+                       headers: Optional[List[Optional[Dict[str, str]]]] = None) -> List[Tuple[Dict[str, Any], FetchResult]]:
+        """Fetch every listed article body concurrently, keeping list order.
+        
+        Returns each article (with its content) alongside the raw fetch result.
+        """
+        results = self.fetcher.fetch_all([listing['url'] for listing in listings], headers)
+        
+        return [(self.article_from_result(listing, result), result) for listing, result in zip(listings, results)]
+
+    def scrape_article_list(self) -> List[Dict[str, Any]]:
+        """Scrape the list of articles from the Around the Web page, with content."""
+        articles = [article for article, _ in self.fetch_articles(self.scrape_listings())]
+        logger.info(f"Successfully scraped {len(articles)} articles")
+        return articles
+
+    def scrape_listing_page(self, url: str) -> List[Dict[str, Any]]:
+        """Articles listed on one listing page.
+        
+        Returns [] only when the page verifiably lists nothing: it does not
+        exist, or it rendered with an empty article list. Raises if the page
+        could not be loaded or the list markup is missing.
+        """
+        logger.info(f"Navigating to {url}")
+        
+        listings = None
+        if self.http_first:
+            result = self.fetcher.fetch(url)
+            if result.status in MISSING_PAGE_STATUSES:
+                logger.info(f"No listing page at {url} ({result.status})")
+                return []
+            if result.ok:
+                with self.timer.stage('parse'):
+                    listings = self.parse_listings(result.text)
+            if not listings:
+                logger.info("Article list missing from static HTML, falling back to Selenium")
+        
+        if not listings:
+            # Wait for the article list to load and render
+            page_source = self.pool.render(url, "atw-list-items", 20)
+            with self.timer.stage('parse'):
+                listings = self.parse_listings(page_source)
+            if listings is None:
+                raise ValueError(f"No article list in the rendered page at {url}")
+        
+        return listings
+
+    def fetch_row_results(self, listings: List[Dict[str, Any]],
+                          headers: Optional[List[Optional[Dict[str, str]]]] = None) -> List[Tuple[Optional[Dict[str, Any]], FetchResult]]:
+        """Fetch article pages concurrently, in listing order.
+        
+        Returns each article's row (None if a conditional GET came back 304)
+        alongside the raw fetch result.
+        """
+        fetched = self.fetch_articles(listings, headers)
+        self.counts['fetched'] = self.counts.get('fetched', 0) + sum(1 for _, result in fetched if not result.not_modified)
+        return [(None if result.not_modified else self.build_row(article), result) for article, result in fetched]
+
+    def fetch_rows(self, listings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fetch article pages concurrently and build their rows, in listing order."""
+        return [row for row, _ in self.fetch_row_results(listings)]
+
     def truncate_table(self):
         """Truncate the trending_articles table."""
         try:
             logger.info("Truncating trending_articles table")
-            response = supabase.table('trending_articles').delete().neq('id', 0).execute()
+            response = get_supabase().table('trending_articles').delete().neq('id', 0).execute()
             logger.info("Successfully truncated trending_articles table")
         except Exception as e:
             logger.error(f"Error truncating table: {str(e)}")
 
-    def save_to_database(self, articles: List[Dict[str, Any]]):
-        """Save scraped articles to the database."""
-        for article in articles:
-            try:
-                # Parse the date string to a datetime object
-                date_str = article['date']
-                try:
-                    # Example format: "Thu, Apr 3 2025, 8:59 AM"
-                    date_obj = datetime.strptime(date_str, "%a, %b %d %Y, %I:%M %p")
-                except ValueError:
-                    date_obj = datetime.now()
-
-                # Insert new article
-                response = supabase.table('trending_articles').insert({
-                    'title': article['title'],
-                    'url': article['url'],
-                    'description': article['description'],
-                    'category': article['category'],
-                    'content': article['content'],
-                    'date': date_obj.isoformat(),
-                    'last_scraped': datetime.now().isoformat(),
-                    'is_generating': False
-                }).execute()
-                
-                logger.info(f"Inserted new article: {article['title']}")
-                    
-            except Exception as e:
-                logger.error(f"Error saving article to database: {str(e)}")
-                continue
+    def build_row(self, article: Dict[str, Any]) -> Dict[str, Any]:
+        """Database row for a scraped article, with the stored content limit applied."""
+        # Parse the date string to a datetime object
+        date_obj = self.listing_date(article) or datetime.now()
+
+        return limit_content({
+            'title': article['title'],
+            'url': article['url'],
+            'description': article['description'],
+            'category': article['category'],
+            'content': article['content'],
+            'date': date_obj.isoformat(),
+            'last_scraped': datetime.now().isoformat(),
+            'is_generating': False
+        }, page_truncated=article.get('page_truncated', False))
+
+    def update_database(self, mode: str = SCRAPE_MODE):
+        """Refresh trending_articles in the given mode, recording run metrics."""
+        self.counts = {'listed': 0, 'fetched': 0, 'written': 0, 'failed': 0, 'duplicates': 0}
+        with metrics.track_run('trending', mode, self.timer, self.counts):
+            if mode == "incremental":
+                return self.update_incremental()
+            if mode == "publish":
+                return self.update_publish()
+            return self.update_full()
+
+    def update_full(self):
+        """Truncate the table, then stream a fresh set of articles into it."""
+        # Truncate the table before inserting new data
+        with self.timer.stage('truncate'):
+            self.truncate_table()
+        raise_if_cancelled(self.cancel)
+        
+        sync = IncrementalSync(get_supabase(), 'trending_articles', timer=self.timer)
+        dedupe = Deduplicator(get_supabase(), timer=self.timer, exclude='trending_articles')
+        dedupe.load()
+        
+        def parse(listing, result):
+            self.counts['fetched'] += 1
+            return sync.fingerprint(self.build_row(self.article_from_result(listing, result)))
+        
+        pipeline = Pipeline('trending', timer=self.timer, cancel=self.cancel)
+        writer = BatchWriter(get_supabase(), 'trending_articles', timer=self.timer)
+        try:
+            with writer:
+                pipeline.run(self.iter_listings(), lambda listing: self.fetcher.fetch(listing['url']),
+                             parse, writer, prepare=dedupe.assign)
+        finally:
+            # Recorded after the final flush, even when the run is cancelled
+            self.counts['listed'] = pipeline.stats['listed']
+            self.counts['duplicates'] = dedupe.stats['duplicates']
+            self.counts['written'] = writer.rows_written
+            self.counts['failed'] = writer.rows_failed
+        # Stories whose canonical row was truncated away need a new one
+        dedupe.promote_orphans()
+        
+        if not pipeline.stats['listed']:
+            logger.error("No articles found to scrape")
+            return
+        
+        logger.info(f"Scraped and saved {writer.summary()}")
+
+    def update_publish(self):
+        """Stream a complete snapshot into staging, then swap it in if it validates."""
+        sync = IncrementalSync(get_supabase(), 'trending_articles', timer=self.timer)
+        dedupe = Deduplicator(get_supabase(), timer=self.timer, exclude='trending_articles')
+        dedupe.load()
+        publisher = SnapshotPublisher(get_supabase(), 'trending_articles', timer=self.timer)
+        
+        def parse(listing, result):
+            self.counts['fetched'] += 1
+            return sync.fingerprint(self.build_row(self.article_from_result(listing, result)))
+        
+        pipeline = Pipeline('trending', timer=self.timer, cancel=self.cancel)
+        writer = publisher.begin()
+        try:
+            pipeline.run(self.iter_listings(), lambda listing: self.fetcher.fetch(listing['url']),
+                         parse, writer, prepare=lambda row: publisher.accept(dedupe.assign(row)))
+        finally:
+            self.counts['listed'] = pipeline.stats['listed']
+            self.counts['duplicates'] = dedupe.stats['duplicates']
+            self.counts['failed'] = publisher.rows_rejected
+        
+        # Raises PublishError, leaving the live table as it was, if the snapshot is rejected
+        self.counts['written'] = publisher.swap(writer)
+        dedupe.promote_orphans()
+
+    def update_incremental(self):
+        """Write only new or changed articles and expire ones that left the listing."""
+        sync = IncrementalSync(get_supabase(), 'trending_articles', timer=self.timer)
+        sync.load()
+        dedupe = Deduplicator(get_supabase(), timer=self.timer)
+        dedupe.load()
+        listed = []
+        
+        def listings():
+            # Only fetch new URLs, changed listings and known pages that can be revalidated
+            for listing in self.iter_listings():
+                listed.append(listing['url'])
+                should_fetch, headers = sync.plan(listing)
+                if should_fetch:
+                    yield listing, headers
+        
+        def parse(item, result):
+            listing, _ = item
+            if result.not_modified:
+                sync.not_modified()
+                return None
+            self.counts['fetched'] += 1
+            row = sync.fingerprint(self.build_row(self.article_from_result(listing, result)), result)
+            return row if sync.has_changed(row) else None
+        
+        pipeline = Pipeline('trending', timer=self.timer, cancel=self.cancel)
+        writer = BatchWriter(get_supabase(), 'trending_articles', timer=self.timer)
+        try:
+            with writer:
+                pipeline.run(listings(), lambda item: self.fetcher.fetch(item[0]['url'], item[1]),
+                             parse, writer, prepare=dedupe.assign)
+        finally:
+            # Recorded after the final flush, even when the run is cancelled
+            self.counts['listed'] = len(listed)
+            self.counts['duplicates'] = dedupe.stats['duplicates']
+            self.counts['written'] = writer.rows_written
+            self.counts['failed'] = writer.rows_failed
+        logger.info(f"Saved {writer.summary()}")
+        
+        if not listed:
+            logger.error("No articles found, leaving trending_articles untouched")
+        elif pipeline.listing_complete:
+            sync.expire(listed)
+            dedupe.promote_orphans()
+        self.counts.update(sync.stats)
+        logger.info(f"Incremental update of trending_articles finished: {sync.summary()}")
 
 def main():
     logger.info("Starting trending articles scraper")
-    scraper = TrendingScraper()
-    
-    # Truncate the table before inserting new data
-    scraper.truncate_table()
-    
-    # Get articles from main page
-    articles = scraper.scrape_article_list()
-    
-    if not articles:
-        logger.error("No articles found to scrape")
-        return
-        
-    # Save articles to database
-    scraper.save_to_database(articles)
-    
-    logger.info(f"Scraped and saved {len(articles)} articles")
+    try:
+        with TrendingScraper() as scraper:
+            scraper.update_database()
+    finally:
+        shutdown_pool()
     logger.info("Scraper finished")
 
 if __name__ == "__main__":
@@ -0,0 +1,610 @@
+import os
+import json
+import time
+import socket
+import signal
+import logging
+import sqlite3
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from cancellation import RunCancelled
+from db_writer import BatchWriter
+from dedupe import Deduplicator
+from incremental import IncrementalSync
+from supabase_client import get_supabase
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# "supabase" uses the scrape_tasks table and functions from work_queue_setup.sql;
+# "sqlite:///path/to/queue.db" is a single-machine stand-in
+WORK_QUEUE_URL = os.getenv('WORK_QUEUE_URL', 'supabase')
+# Seconds a claimed task stays invisible to other workers before it is reclaimed
+WORK_LEASE_SECONDS = int(os.getenv('WORK_LEASE_SECONDS', '300'))
+# Attempts per task before it is marked dead
+WORK_MAX_ATTEMPTS = int(os.getenv('WORK_MAX_ATTEMPTS', '3'))
+# Tasks claimed at once; their pages are fetched concurrently
+WORK_BATCH = int(os.getenv('WORK_BATCH', '8'))
+# Base delay before a failed task is retried, doubled per attempt
+WORK_RETRY_DELAY = float(os.getenv('WORK_RETRY_DELAY', '30'))
+# Seconds an idle worker waits before polling again
+WORK_POLL_SECONDS = float(os.getenv('WORK_POLL_SECONDS', '5'))
+# Seconds since its last heartbeat after which a worker no longer counts
+# towards splitting the per-host request rate
+WORK_WORKER_TTL = float(os.getenv('WORK_WORKER_TTL', '120'))
+
+ACTIVE_STATUSES = ('queued', 'leased')
+
+# Stored fingerprint fields a worker needs to tell whether a page changed
+KNOWN_FIELDS = ['content_hash', 'etag', 'last_modified']
+
+
+@dataclass
+class Task:
+    """One article URL to fetch, parse and write"""
+    id: int
+    run_id: str
+    scraper: str
+    url: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+    max_attempts: int = WORK_MAX_ATTEMPTS
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'Task':
+        payload = row['payload']
+        return cls(id=row['id'], run_id=row['run_id'], scraper=row['scraper'], url=row['url'],
+                   payload=json.loads(payload) if isinstance(payload, str) else payload,
+                   attempts=row['attempts'], max_attempts=row['max_attempts'])
+
+
+class WorkQueue(ABC):
+    """Durable queue of article tasks shared by any number of workers.
+
+    Claiming a task leases it to one worker for ``lease_seconds``. The
+    worker acks it when done or fails it to schedule a retry; a task whose
+    lease runs out, because its worker crashed or hung, is claimable again.
+    After ``max_attempts`` attempts a task is marked dead. Enqueueing a URL
+    that already has a queued or leased task for the same scraper is a no-op.
+    """
+
+    @abstractmethod
+    def enqueue(self, run_id: str, scraper: str, payloads: List[Dict[str, Any]],
+                max_attempts: int = WORK_MAX_ATTEMPTS) -> int:
+        """Queue one task per payload (each with a ``url``), returning how many were added"""
+
+    @abstractmethod
+    def claim(self, worker: str, batch: int = WORK_BATCH, lease_seconds: int = WORK_LEASE_SECONDS,
+              scrapers: Optional[List[str]] = None) -> List[Task]:
+        """Lease up to ``batch`` claimable tasks, optionally only for ``scrapers``"""
+
+    @abstractmethod
+    def ack(self, task: Task, worker: str) -> bool:
+        """Mark a task done; False if its lease had already passed to another worker"""
+
+    @abstractmethod
+    def fail(self, task: Task, worker: str, error: str, retry_delay: float = WORK_RETRY_DELAY) -> str:
+        """Release a task for a later retry, returning its new status (``queued`` or ``dead``)"""
+
+    @abstractmethod
+    def counts(self, run_id: Optional[str] = None) -> Dict[str, int]:
+        """Tasks per status, for one run or all of them"""
+
+    @abstractmethod
+    def heartbeat(self, worker: str, ttl: float = WORK_WORKER_TTL) -> int:
+        """Mark a worker alive, returning how many workers were seen in the last ``ttl`` seconds"""
+
+    @abstractmethod
+    def leave(self, worker: str):
+        """Stop counting a worker that is shutting down"""
+
+    def close(self):
+        pass
+
+
+class SQLiteQueue(WorkQueue):
+    """Work queue in a local SQLite file, for several processes on one machine.
+
+    SQLite has no row locks; claims take the database write lock for the few
+    milliseconds they need instead.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scrape_tasks (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      run_id TEXT NOT NULL,
+      scraper TEXT NOT NULL,
+      url TEXT NOT NULL,
+      payload TEXT NOT NULL,
+      status TEXT NOT NULL DEFAULT 'queued',
+      attempts INTEGER NOT NULL DEFAULT 0,
+      max_attempts INTEGER NOT NULL,
+      lease_owner TEXT,
+      lease_expires_at REAL,
+      available_at REAL NOT NULL,
+      last_error TEXT,
+      created_at REAL NOT NULL,
+      finished_at REAL,
+      UNIQUE (run_id, url)
+    );
+    CREATE INDEX IF NOT EXISTS scrape_tasks_claim_idx ON scrape_tasks(status, available_at);
+    CREATE INDEX IF NOT EXISTS scrape_tasks_url_idx ON scrape_tasks(scraper, url);
+    CREATE TABLE IF NOT EXISTS scrape_workers (
+      name TEXT PRIMARY KEY,
+      seen_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, run_id, scraper, payloads, max_attempts=WORK_MAX_ATTEMPTS):
+        conn = self._connect()
+        now = time.time()
+        added = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for payload in payloads:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO scrape_tasks "
+                    "(run_id, scraper, url, payload, max_attempts, available_at, created_at) "
+                    "SELECT ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS ("
+                    "  SELECT 1 FROM scrape_tasks WHERE scraper = ? AND url = ? AND status IN ('queued', 'leased'))",
+                    (run_id, scraper, payload['url'], json.dumps(payload), max_attempts, now, now,
+                     scraper, payload['url']))
+                added += cursor.rowcount
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def claim(self, worker, batch=WORK_BATCH, lease_seconds=WORK_LEASE_SECONDS, scrapers=None):
+        conn = self._connect()
+        now = time.time()
+        scraper_filter, params = '', []
+        if scrapers:
+            scraper_filter = f" AND scraper IN ({', '.join('?' * len(scrapers))})"
+            params = list(scrapers)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Expired leases on their last attempt are not handed out again
+            conn.execute(
+                "UPDATE scrape_tasks SET status = 'dead', finished_at = ?, lease_owner = NULL, "
+                "last_error = coalesce(last_error, 'lease expired') "
+                "WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= max_attempts",
+                (now, now))
+            rows = conn.execute(
+                "SELECT id, status FROM scrape_tasks "
+                "WHERE ((status = 'queued' AND available_at <= ?) OR (status = 'leased' AND lease_expires_at < ?))"
+                f"{scraper_filter} ORDER BY id LIMIT ?",
+                [now, now] + params + [batch]).fetchall()
+            ids = [row['id'] for row in rows]
+            if ids:
+                marks = ', '.join('?' * len(ids))
+                conn.execute(
+                    "UPDATE scrape_tasks SET status = 'leased', lease_owner = ?, lease_expires_at = ?, "
+                    f"attempts = attempts + 1 WHERE id IN ({marks})",
+                    [worker, now + lease_seconds] + ids)
+                claimed = conn.execute(f"SELECT * FROM scrape_tasks WHERE id IN ({marks}) ORDER BY id", ids).fetchall()
+            else:
+                claimed = []
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        reclaimed = sum(1 for row in rows if row['status'] == 'leased')
+        if reclaimed:
+            logger.warning(f"{worker} reclaimed {reclaimed} tasks whose lease expired")
+        return [Task.from_row(dict(row)) for row in claimed]
+
+    def ack(self, task, worker):
+        cursor = self._connect().execute(
+            "UPDATE scrape_tasks SET status = 'done', finished_at = ?, lease_owner = NULL "
+            "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            (time.time(), task.id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, task, worker, error, retry_delay=WORK_RETRY_DELAY):
+        now = time.time()
+        dead = task.attempts >= task.max_attempts
+        status = 'dead' if dead else 'queued'
+        self._connect().execute(
+            "UPDATE scrape_tasks SET status = ?, lease_owner = NULL, lease_expires_at = NULL, "
+            "available_at = ?, last_error = ?, finished_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            (status, now + retry_delay * 2 ** max(0, task.attempts - 1), error[:1000],
+             now if dead else None, task.id, worker))
+        return status
+
+    def counts(self, run_id=None):
+        query = "SELECT status, count(*) AS n FROM scrape_tasks"
+        rows = self._connect().execute(query + " WHERE run_id = ? GROUP BY status" if run_id else query + " GROUP BY status",
+                                       (run_id,) if run_id else ()).fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def heartbeat(self, worker, ttl=WORK_WORKER_TTL):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("INSERT OR REPLACE INTO scrape_workers (name, seen_at) VALUES (?, ?)", (worker, now))
+            conn.execute("DELETE FROM scrape_workers WHERE seen_at < ?", (now - ttl,))
+            live = conn.execute("SELECT count(*) FROM scrape_workers").fetchone()[0]
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return live
+
+    def leave(self, worker):
+        self._connect().execute("DELETE FROM scrape_workers WHERE name = ?", (worker,))
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SupabaseQueue(WorkQueue):
+    """Work queue in Postgres, reached through the functions in work_queue_setup.sql.
+
+    Claims use ``FOR UPDATE SKIP LOCKED``, so workers on any number of
+    machines take disjoint tasks without waiting on each other.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+
+    def _rpc(self, name: str, params: Dict[str, Any]):
+        return (self.client or get_supabase()).rpc(name, params).execute().data
+
+    def enqueue(self, run_id, scraper, payloads, max_attempts=WORK_MAX_ATTEMPTS):
+        if not payloads:
+            return 0
+        return self._rpc('enqueue_scrape_tasks', {
+            'run': run_id, 'scraper_name': scraper, 'payloads': payloads, 'max_attempts': max_attempts}) or 0
+
+    def claim(self, worker, batch=WORK_BATCH, lease_seconds=WORK_LEASE_SECONDS, scrapers=None):
+        rows = self._rpc('claim_scrape_tasks', {
+            'worker': worker, 'batch': batch, 'lease_seconds': lease_seconds, 'scrapers': scrapers})
+        return [Task.from_row(row) for row in rows or []]
+
+    def ack(self, task, worker):
+        return bool(self._rpc('ack_scrape_task', {'task_id': task.id, 'worker': worker}))
+
+    def fail(self, task, worker, error, retry_delay=WORK_RETRY_DELAY):
+        return self._rpc('fail_scrape_task', {
+            'task_id': task.id, 'worker': worker, 'error': error[:1000],
+            'retry_seconds': retry_delay * 2 ** max(0, task.attempts - 1)}) or 'queued'
+
+    def counts(self, run_id=None):
+        rows = self._rpc('scrape_task_counts', {'run': run_id})
+        return {row['status']: row['n'] for row in rows or []}
+
+    def heartbeat(self, worker, ttl=WORK_WORKER_TTL):
+        return self._rpc('scrape_worker_heartbeat', {'worker': worker, 'ttl_seconds': ttl}) or 1
+
+    def leave(self, worker):
+        self._rpc('scrape_worker_leave', {'worker': worker})
+
+
+def open_queue(url: str = WORK_QUEUE_URL) -> WorkQueue:
+    if url.startswith('sqlite:///'):
+        return SQLiteQueue(url[len('sqlite:///'):])
+    if url == 'supabase':
+        return SupabaseQueue()
+    raise ValueError(f"Unsupported WORK_QUEUE_URL: {url}")
+
+
+def enqueue_run(queue: WorkQueue, name: str, pages: int = 1, scraper=None) -> Tuple[str, int]:
+    """Coordinator: list ``pages`` listing pages and queue every article that needs fetching.
+
+    Articles are planned as in an incremental run: unchanged listings without
+    validators are skipped, known pages carry their conditional headers and
+    stored fingerprint, and rows that left the listing are expired here.
+    Articles found past the first page are queued as backfilled. Returns the
+    run id and the number of tasks added.
+    """
+    from jobs import load_scraper
+
+    owned = scraper is None
+    scraper = scraper or load_scraper(name)()
+    try:
+        listed = []
+        for page in range(1, pages + 1):
+            try:
+                with scraper.timer.stage('list_page'):
+                    found = scraper.scrape_listing_page(scraper.page_url(page))
+            except Exception as e:
+                # Queue what was listed before the failing page
+                logger.error(f"Could not read {name} listing page {page}: {e}")
+                break
+            if not found:
+                break
+            listed.extend((page, article) for article in found)
+        if not listed:
+            logger.error(f"No {name} articles listed, nothing queued")
+            return '', 0
+
+        sync = IncrementalSync(get_supabase(), scraper.TABLE, timer=scraper.timer)
+        sync.load()
+        payloads = []
+        for page, article in listed:
+            fetch, headers = sync.plan(article)
+            if not fetch:
+                continue
+            known = sync.known.get(article['url'])
+            payloads.append({
+                'url': article['url'],
+                'article': article,
+                'headers': headers,
+                'known': {key: known.get(key) for key in KNOWN_FIELDS} if known else None,
+                'backfilled': page > 1,
+            })
+
+        run_id = f"{name}-{datetime.now():%Y%m%dT%H%M%S}"
+        added = queue.enqueue(run_id, name, payloads)
+        sync.expire(article['url'] for _, article in listed)
+        logger.info(f"Queued {added} of {len(listed)} listed {name} articles as run {run_id} "
+                    f"({len(payloads) - added} already queued, {sync.summary()})")
+        return run_id, added
+    finally:
+        if owned:
+            scraper.close()
+
+
+class Worker:
+    """Claim, fetch and write article tasks until stopped.
+
+    Each worker owns its scrapers, and with them its own HTTP session and
+    the process's browser pool. Workers send a heartbeat to the queue before
+    every claim and keep to an even share of each host's request rate among
+    the workers alive. Claimed tasks for one scraper are fetched
+    concurrently, rows that changed are written in one bulk upsert, and
+    each task is then acked, or failed for a retry if it produced no
+    content or its write failed.
+    """
+
+    def __init__(self, queue: WorkQueue, name: Optional[str] = None, scrapers: Optional[List[str]] = None,
+                 batch: int = WORK_BATCH, lease_seconds: int = WORK_LEASE_SECONDS,
+                 factory: Optional[Callable[[str], Any]] = None, stop: Optional[threading.Event] = None):
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.scrapers = scrapers
+        self.batch = batch
+        self.lease_seconds = lease_seconds
+        self.factory = factory
+        self.stop = stop or threading.Event()
+        self.stats: Counter = Counter()
+        # Live workers splitting each host's request rate, this one included
+        self.workers = 1
+        self._scrapers: Dict[str, Any] = {}
+        self._dedupe: Optional[Deduplicator] = None
+
+    def scraper(self, name: str):
+        if name not in self._scrapers:
+            if self.factory is not None:
+                self._scrapers[name] = self.factory(name)
+            else:
+                from jobs import load_scraper
+                self._scrapers[name] = load_scraper(name)()
+            self._scrapers[name].fetcher.policy.share(self.workers)
+        return self._scrapers[name]
+
+    def share_hosts(self):
+        """Heartbeat, and split each host's request rate evenly over the live workers"""
+        workers = self.queue.heartbeat(self.name)
+        if workers != self.workers:
+            logger.info(f"{self.name}: {workers} live workers, taking 1/{workers} of each host's request rate")
+            self.workers = workers
+            for scraper in self._scrapers.values():
+                scraper.fetcher.policy.share(workers)
+
+    def dedupe(self) -> Deduplicator:
+        # Reloaded whenever the queue runs dry, to see what other workers wrote
+        if self._dedupe is None:
+            self._dedupe = Deduplicator(get_supabase())
+            self._dedupe.load()
+        return self._dedupe
+
+    def _outcome(self, task: Task, outcome: str):
+        self.stats[outcome] += 1
+        metrics.WORK_TASKS.inc(scraper=task.scraper, outcome=outcome)
+
+    def _ack(self, task: Task, outcome: str):
+        if not self.queue.ack(task, self.name):
+            logger.warning(f"Lease on task {task.id} ({task.url}) expired before it was acked")
+        self._outcome(task, outcome)
+
+    def _fail(self, task: Task, error: str):
+        status = self.queue.fail(task, self.name, error)
+        logger.warning(f"Task {task.id} ({task.url}) failed on attempt {task.attempts}: {error} -> {status}")
+        self._outcome(task, 'dead' if status == 'dead' else 'retried')
+
+    def process(self, name: str, tasks: List[Task]):
+        """Fetch, write and ack a batch of tasks for one scraper"""
+        scraper = self.scraper(name)
+        try:
+            fetched = scraper.fetch_row_results([task.payload['article'] for task in tasks],
+                                                [task.payload.get('headers') for task in tasks])
+        except RunCancelled:
+            # Stopping; the leases run out and another worker picks the tasks up
+            raise
+        except Exception as e:
+            for task in tasks:
+                self._fail(task, f"fetch failed: {e}")
+            return
+
+        sync = IncrementalSync(get_supabase(), scraper.TABLE, timer=scraper.timer)
+        sync.known = {task.url: task.payload['known'] for task in tasks if task.payload.get('known')}
+        rows, pending = [], []
+        for task, (row, result) in zip(tasks, fetched):
+            if row is None:
+                self._ack(task, 'not_modified')
+                continue
+            if not row.get('content'):
+                self._fail(task, result.error if result is not None and result.error else 'no content extracted')
+                continue
+            if task.payload.get('backfilled'):
+                published = scraper.listing_date(task.payload['article'])
+                if published is not None:
+                    row['date'] = published.isoformat()
+                row['backfilled'] = True
+            row = sync.fingerprint(row, result)
+            if not sync.has_changed(row):
+                self._ack(task, 'unchanged')
+                continue
+            rows.append(self.dedupe().assign(row))
+            pending.append(task)
+
+        if not rows:
+            return
+        writer = BatchWriter(get_supabase(), scraper.TABLE, timer=scraper.timer)
+        writer.write(rows)
+        for task in pending:
+            if writer.rows_failed:
+                # The writer doesn't say which rows failed; retrying the batch is harmless as writes are upserts
+                self._fail(task, 'database write failed')
+            else:
+                self._ack(task, 'written')
+
+    def run_once(self) -> int:
+        """Claim and process one batch, returning the number of tasks claimed"""
+        tasks = self.queue.claim(self.name, self.batch, self.lease_seconds, self.scrapers)
+        by_scraper: Dict[str, List[Task]] = {}
+        for task in tasks:
+            by_scraper.setdefault(task.scraper, []).append(task)
+        for name, batch in by_scraper.items():
+            self.process(name, batch)
+        return len(tasks)
+
+    def run(self, drain: bool = False, poll: float = WORK_POLL_SECONDS):
+        """Work until stopped, or with ``drain`` until no task is queued or leased"""
+        logger.info(f"Worker {self.name} started")
+        start = time.monotonic()
+        try:
+            while not self.stop.is_set():
+                self.share_hosts()
+                try:
+                    claimed = self.run_once()
+                except RunCancelled:
+                    break
+                if claimed:
+                    continue
+                self._dedupe = None
+                # Tasks leased to other workers may still come back, if their worker dies or fails them
+                if drain and not any(self.queue.counts().get(status) for status in ACTIVE_STATUSES):
+                    break
+                self.stop.wait(poll)
+        finally:
+            self.close()
+        totals = ' '.join(f"{outcome}={count}" for outcome, count in sorted(self.stats.items()))
+        logger.info(f"Worker {self.name} stopped after {time.monotonic() - start:.1f}s: {totals or 'no tasks'}")
+
+    def close(self):
+        for scraper in self._scrapers.values():
+            scraper.close()
+        self._scrapers = {}
+        try:
+            self.queue.leave(self.name)
+        except Exception as e:
+            # Its heartbeat expires after WORK_WORKER_TTL anyway
+            logger.warning(f"Could not deregister worker {self.name}: {e}")
+
+
+def run_worker(url: str, scrapers: Optional[List[str]], drain: bool, batch: int):
+    """Worker process entry point"""
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(process)d - %(levelname)s - %(message)s')
+    from driver_pool import shutdown_pool
+
+    worker = Worker(open_queue(url), scrapers=scrapers, batch=batch)
+    # Finish the current batch on SIGTERM (e.g. a Railway redeploy), then exit
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop.set())
+    try:
+        worker.run(drain=drain)
+    finally:
+        shutdown_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distribute article fetching over worker processes")
+    parser.add_argument('--queue', default=WORK_QUEUE_URL, help='supabase or sqlite:///path/to/queue.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help='list articles and queue the ones to fetch')
+    enqueue.add_argument('scraper', choices=['mbs', 'trending'])
+    enqueue.add_argument('--pages', type=int, default=1, help='listing pages to walk; articles past page 1 are backfilled')
+    enqueue.add_argument('--wait', action='store_true', help='wait until every queued task is done or dead')
+
+    work = commands.add_parser('worker', help='claim and process tasks')
+    work.add_argument('--scraper', action='append', choices=['mbs', 'trending'], help='only this scraper (repeatable)')
+    work.add_argument('--processes', type=int, default=1, help='worker processes to start')
+    work.add_argument('--batch', type=int, default=WORK_BATCH, help='tasks claimed at once')
+    work.add_argument('--drain', action='store_true', help='exit once the queue is empty')
+
+    status = commands.add_parser('status', help='task counts per status')
+    status.add_argument('--run', help='only this run')
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'worker':
+        if args.processes == 1:
+            return run_worker(args.queue, args.scraper, args.drain, args.batch)
+        import multiprocessing
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=run_worker, args=(args.queue, args.scraper, args.drain, args.batch))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+        return
+
+    queue = open_queue(args.queue)
+    if args.command == 'status':
+        print(json.dumps(queue.counts(args.run), indent=2))
+        return
+
+    from driver_pool import shutdown_pool
+    try:
+        run_id, added = enqueue_run(queue, args.scraper, pages=args.pages)
+    finally:
+        shutdown_pool()
+    while args.wait and run_id:
+        counts = queue.counts(run_id)
+        if not any(counts.get(status) for status in ACTIVE_STATUSES):
+            logger.info(f"Run {run_id} finished: {counts}")
+            break
+        time.sleep(WORK_POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+-- Task table and functions used by work_queue.py with WORK_QUEUE_URL=supabase.
+-- Apply after supabase_setup.sql.
+
+CREATE TABLE IF NOT EXISTS scrape_tasks (
+  id BIGSERIAL PRIMARY KEY,
+  run_id TEXT NOT NULL,
+  scraper TEXT NOT NULL,
+  url TEXT NOT NULL,
+  payload JSONB NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'leased', 'done', 'dead')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 3,
+  lease_owner TEXT,
+  lease_expires_at TIMESTAMP WITH TIME ZONE,
+  available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  last_error TEXT,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMP WITH TIME ZONE,
+  UNIQUE (run_id, url)
+);
+
+-- Claimable tasks, oldest first
+CREATE INDEX IF NOT EXISTS scrape_tasks_claim_idx ON scrape_tasks(status, available_at, id);
+-- At most one queued or leased task per URL
+CREATE UNIQUE INDEX IF NOT EXISTS scrape_tasks_active_url_key
+  ON scrape_tasks(scraper, url) WHERE status IN ('queued', 'leased');
+
+-- Queue one task per payload; URLs with an active task are skipped.
+-- Returns the number of tasks added.
+CREATE OR REPLACE FUNCTION enqueue_scrape_tasks(
+  run TEXT,
+  scraper_name TEXT,
+  payloads JSONB,
+  max_attempts INTEGER DEFAULT 3
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  added INTEGER;
+BEGIN
+  INSERT INTO scrape_tasks (run_id, scraper, url, payload, max_attempts)
+  SELECT run, scraper_name, item->>'url', item, enqueue_scrape_tasks.max_attempts
+  FROM jsonb_array_elements(payloads) AS item
+  ON CONFLICT DO NOTHING;
+  GET DIAGNOSTICS added = ROW_COUNT;
+  RETURN added;
+END;
+$$;
+
+-- Lease up to batch claimable tasks to a worker. Queued tasks that are due
+-- and leased tasks whose lease expired (their worker died) are claimable;
+-- SKIP LOCKED lets concurrent workers take disjoint rows without blocking.
+CREATE OR REPLACE FUNCTION claim_scrape_tasks(
+  worker TEXT,
+  batch INTEGER DEFAULT 8,
+  lease_seconds INTEGER DEFAULT 300,
+  scrapers TEXT[] DEFAULT NULL
+) RETURNS SETOF scrape_tasks
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  -- Expired leases on their last attempt are not handed out again
+  UPDATE scrape_tasks
+  SET status = 'dead', finished_at = now(), lease_owner = NULL,
+      last_error = coalesce(last_error, 'lease expired')
+  WHERE status = 'leased' AND lease_expires_at < now() AND attempts >= max_attempts;
+
+  RETURN QUERY
+  UPDATE scrape_tasks t
+  SET status = 'leased',
+      lease_owner = worker,
+      lease_expires_at = now() + make_interval(secs => lease_seconds),
+      attempts = t.attempts + 1
+  WHERE t.id IN (
+    SELECT id FROM scrape_tasks
+    WHERE ((status = 'queued' AND available_at <= now())
+           OR (status = 'leased' AND lease_expires_at < now()))
+      AND (scrapers IS NULL OR scraper = ANY(scrapers))
+    ORDER BY id
+    LIMIT batch
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING t.*;
+END;
+$$;
+
+-- Mark a task done if the worker still holds its lease
+CREATE OR REPLACE FUNCTION ack_scrape_task(task_id BIGINT, worker TEXT) RETURNS BOOLEAN
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE scrape_tasks SET status = 'done', finished_at = now(), lease_owner = NULL
+  WHERE id = task_id AND lease_owner = worker AND status = 'leased';
+  RETURN FOUND;
+END;
+$$;
+
+-- Release a task for a retry after retry_seconds, or mark it dead on its
+-- last attempt. Returns the new status.
+CREATE OR REPLACE FUNCTION fail_scrape_task(
+  task_id BIGINT,
+  worker TEXT,
+  error TEXT,
+  retry_seconds DOUBLE PRECISION DEFAULT 30
+) RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  new_status TEXT;
+BEGIN
+  UPDATE scrape_tasks
+  SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+      lease_owner = NULL,
+      lease_expires_at = NULL,
+      available_at = now() + make_interval(secs => retry_seconds),
+      last_error = error,
+      finished_at = CASE WHEN attempts >= max_attempts THEN now() END
+  WHERE id = task_id AND lease_owner = worker AND status = 'leased'
+  RETURNING status INTO new_status;
+  RETURN new_status;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION scrape_task_counts(run TEXT DEFAULT NULL)
+RETURNS TABLE (status TEXT, n BIGINT)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT t.status, count(*) FROM scrape_tasks t
+  WHERE run IS NULL OR t.run_id = run
+  GROUP BY t.status;
+$$;
+
+-- Workers alive in the last few minutes; they split each host's request rate
+CREATE TABLE IF NOT EXISTS scrape_workers (
+  name TEXT PRIMARY KEY,
+  seen_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Record a worker's heartbeat, forget workers silent for ttl_seconds, and
+-- return how many are left (the caller included)
+CREATE OR REPLACE FUNCTION scrape_worker_heartbeat(
+  worker TEXT,
+  ttl_seconds DOUBLE PRECISION DEFAULT 120
+) RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  live INTEGER;
+BEGIN
+  INSERT INTO scrape_workers (name, seen_at) VALUES (worker, now())
+  ON CONFLICT (name) DO UPDATE SET seen_at = excluded.seen_at;
+  DELETE FROM scrape_workers WHERE seen_at < now() - make_interval(secs => ttl_seconds);
+  SELECT count(*) INTO live FROM scrape_workers;
+  RETURN live;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION scrape_worker_leave(worker TEXT) RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  DELETE FROM scrape_workers WHERE name = worker;
+$$;
+
+-- Only the scraper's service role may use the queue
+REVOKE ALL ON TABLE scrape_tasks FROM anon, authenticated;
+REVOKE ALL ON TABLE scrape_workers FROM anon, authenticated;
+REVOKE ALL ON FUNCTION enqueue_scrape_tasks(TEXT, TEXT, JSONB, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION claim_scrape_tasks(TEXT, INTEGER, INTEGER, TEXT[]) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION ack_scrape_task(BIGINT, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION fail_scrape_task(BIGINT, TEXT, TEXT, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION scrape_task_counts(TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION scrape_worker_heartbeat(TEXT, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION scrape_worker_leave(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION enqueue_scrape_tasks(TEXT, TEXT, JSONB, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION claim_scrape_tasks(TEXT, INTEGER, INTEGER, TEXT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION ack_scrape_task(BIGINT, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION fail_scrape_task(BIGINT, TEXT, TEXT, DOUBLE PRECISION) TO service_role;
+GRANT EXECUTE ON FUNCTION scrape_task_counts(TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION scrape_worker_heartbeat(TEXT, DOUBLE PRECISION) TO service_role;
+GRANT EXECUTE ON FUNCTION scrape_worker_leave(TEXT) TO service_role;